@@ -56,5 +56,6 @@ from . import plugin_method  # noqa: F401
 from . import memory_engine_basic  # noqa: F401
 from . import memory_engine_hippo  # noqa: F401
 from . import memory_engine_emgas  # noqa: F401
+from . import memory_engine_fusion  # noqa: F401
 
 __all__ = ["plugin"]
@@ -58,3 +58,72 @@ def update_edge_weights(edges: dict[str, dict[str, float]], ppmi_scores: dict[tu
         for to_id in list(to_map.keys()):
             if (from_id, to_id) in ppmi_scores:
                 to_map[to_id] = ppmi_scores[(from_id, to_id)]
+
+
+class IncrementalPPMI:
+    """增量维护共现计数与概念边际计数，PPMI 只为受影响的行惰性重算
+
+    add_document / remove_document 只更新该文档内的窗口共现对，代价与语料规模无关；
+    take_dirty_rows 返回自上次取出后计数变化过的行的 PPMI。
+    PPMI 依赖全局共现总数 N，未受影响的行会随 N 变化而略微过时：
+    N 相对上次全量刷新的变化超过 refresh_ratio 倍时返回全部行，偏差不超过 log2(refresh_ratio)。
+    """
+
+    def __init__(self, window_size: int = 5, refresh_ratio: float = 1.1):
+        if window_size < 1:
+            raise ValueError("window_size 必须 >= 1")
+        self.window_size: int = window_size
+        self.refresh_ratio: float = max(1.0, float(refresh_ratio))
+        self.pair_counts: dict[str, dict[str, int]] = {}
+        self.concept_counts: Counter[str] = Counter()
+        self.total_pairs: int = 0
+        self._dirty: set[str] = set()
+        self._refreshed_total: int = 0
+
+    def add_document(self, concepts: list[str]) -> None:
+        self._apply(concepts, 1)
+
+    def remove_document(self, concepts: list[str]) -> None:
+        self._apply(concepts, -1)
+
+    def _apply(self, concepts: list[str], sign: int) -> None:
+        tokens = [token for token in concepts if token]
+        for (concept_a, concept_b), count in build_cooccurrence_matrix([tokens], self.window_size).items():
+            row = self.pair_counts.setdefault(concept_a, {})
+            value = row.get(concept_b, 0) + sign * count
+            if value > 0:
+                row[concept_b] = value
+            else:
+                _ = row.pop(concept_b, None)
+                if not row:
+                    del self.pair_counts[concept_a]
+            self.total_pairs += sign * count
+
+        for token in tokens:
+            self.concept_counts[token] += sign
+            if self.concept_counts[token] <= 0:
+                del self.concept_counts[token]
+        self._dirty.update(tokens)
+
+    def score(self, concept_a: str, concept_b: str) -> float:
+        """与 compute_ppmi 相同的公式：max(0, log2(c_xy · N / (c_x · c_y)))"""
+        pair_count = self.pair_counts.get(concept_a, {}).get(concept_b, 0)
+        count_a = self.concept_counts.get(concept_a, 0)
+        count_b = self.concept_counts.get(concept_b, 0)
+        if pair_count <= 0 or count_a <= 0 or count_b <= 0 or self.total_pairs <= 0:
+            return 0.0
+        return max(0.0, math.log2(pair_count * self.total_pairs / (count_a * count_b)))
+
+    def take_dirty_rows(self) -> dict[str, dict[str, float]]:
+        """取出待重算的行 {concept_a: {concept_b: ppmi}} 并清空脏标记"""
+        total, base = self.total_pairs, self._refreshed_total
+        if base <= 0 or total <= 0 or max(total / base, base / total) > self.refresh_ratio:
+            rows: set[str] = set(self.pair_counts)
+            self._refreshed_total = total
+        else:
+            rows = self._dirty.intersection(self.pair_counts)
+        self._dirty = set()
+        return {
+            concept_a: {concept_b: self.score(concept_a, concept_b) for concept_b in self.pair_counts[concept_a]}
+            for concept_a in rows
+        }
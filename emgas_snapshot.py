@@ -0,0 +1,181 @@
+"""EMGAS 图的紧凑二进制快照：字符串驻留表 + 紧凑数组，原子替换写入"""
+
+from __future__ import annotations
+
+from array import array
+import gc
+import os
+from pathlib import Path
+import struct
+import sys
+
+from .emgas_spreading import EMGASGraph
+from .emgas_store import FREE_KIND, EMGASStore
+
+_MAGIC = b"EMGS"
+_VERSION = 2
+_HEADER = struct.Struct("<4sI")
+_COUNT = struct.Struct("<I")
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """写入临时文件并 fsync 后原子替换，崩溃时旧快照保持完整"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _pack(parts: list[bytes], values: array) -> None:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    parts.append(_COUNT.pack(len(values)))
+    parts.append(values.tobytes())
+
+
+class _Reader:
+    def __init__(self, data: bytes) -> None:
+        self.view = memoryview(data)
+        self.offset = 0
+
+    def count(self) -> int:
+        (value,) = _COUNT.unpack_from(self.view, self.offset)
+        self.offset += _COUNT.size
+        return value
+
+    def array(self, typecode: str) -> array:
+        n = self.count()
+        values = array(typecode)
+        size = n * values.itemsize
+        values.frombytes(self.view[self.offset : self.offset + size])
+        self.offset += size
+        if sys.byteorder != "little":
+            values.byteswap()
+        return values
+
+    def raw(self, size: int) -> bytes:
+        chunk = self.view[self.offset : self.offset + size].tobytes()
+        self.offset += size
+        return chunk
+
+
+def _pack_rows(parts: list[bytes], rows: list[array | None], typecode: str) -> None:
+    """变长行：先写每行长度，再写拼接后的数据"""
+    _pack(parts, array("I", [0 if row is None else len(row) for row in rows]))
+    flat = array(typecode)
+    for row in rows:
+        if row is not None:
+            flat.extend(row)
+    _pack(parts, flat)
+
+
+def _unpack_rows(reader: _Reader, typecode: str) -> list[array | None]:
+    counts = reader.array("I")
+    flat = reader.array(typecode)
+    rows: list[array | None] = []
+    offset = 0
+    for count in counts:
+        if count:
+            rows.append(flat[offset : offset + count])
+            offset += count
+        else:
+            rows.append(None)
+    return rows
+
+
+def encode_graph(graph: EMGASGraph) -> bytes:
+    """序列化为字节串（调用方持有图锁；写文件可在锁外进行）
+
+    布局直接转储 EMGASStore：字符串表（节点名、类型名、passage_id，空槽位为空串）、
+    节点平行数组（类型编码、激活值、参考时间微秒），以及来源、出边、入边、pid 反向索引各自的变长行。
+    行内是节点下标，加载时无需重新驻留或排序。
+    """
+    store = graph._store
+    strings = [name or "" for name in store.names]
+    strings.extend(store.kind_names)
+    strings.extend(name or "" for name in store.pid_names)
+    encoded = [value.encode("utf-8") for value in strings]
+
+    parts: list[bytes] = [_HEADER.pack(_MAGIC, _VERSION)]
+    _pack(parts, array("I", [len(store.names), len(store.kind_names), len(store.pid_names)]))
+    _pack(parts, array("I", [len(value) for value in encoded]))
+    blob = b"".join(encoded)
+    parts.append(_COUNT.pack(len(blob)))
+    parts.append(blob)
+    for values in (store.kinds, store.activations, store.accessed):
+        _pack(parts, values)
+    _pack_rows(parts, store.sources, "I")
+    _pack_rows(parts, store.out_targets, "I")
+    _pack_rows(parts, store.out_weights, "d")
+    _pack_rows(parts, store.in_sources, "I")
+    _pack_rows(parts, store.pid_nodes, "I")
+    return b"".join(parts)
+
+
+def _read_strings(reader: _Reader) -> list[str]:
+    lengths = reader.array("I")
+    blob = reader.raw(reader.count())
+    values: list[str] = []
+    offset = 0
+    for length in lengths:
+        values.append(blob[offset : offset + length].decode("utf-8"))
+        offset += length
+    return values
+
+
+def decode_graph(data: bytes) -> EMGASGraph:
+    magic, version = _HEADER.unpack_from(data, 0)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError("不是可识别的 EMGAS 快照")
+    reader = _Reader(data)
+    reader.offset = _HEADER.size
+    n_nodes, n_kinds, n_pids = reader.array("I")
+    values = _read_strings(reader)
+    store = EMGASStore()
+    store.kind_names = values[n_nodes : n_nodes + n_kinds]
+    store.kind_ids = {name: code for code, name in enumerate(store.kind_names)}
+    store.kinds = reader.array("B")
+    store.activations = reader.array("d")
+    store.accessed = reader.array("q")
+    store.sources = _unpack_rows(reader, "I")
+    store.out_targets = _unpack_rows(reader, "I")
+    store.out_weights = _unpack_rows(reader, "d")
+    store.in_sources = _unpack_rows(reader, "I")
+    store.pid_nodes = _unpack_rows(reader, "I")
+
+    kinds = store.kinds
+    for index, name in enumerate(values[:n_nodes]):
+        if kinds[index] == FREE_KIND:
+            store.names.append(None)
+            store.free.append(index)
+        else:
+            store.names.append(name)
+            store.ids[name] = index
+    for pid, name in enumerate(values[n_nodes + n_kinds : n_nodes + n_kinds + n_pids]):
+        if store.pid_nodes[pid] is None:
+            store.pid_names.append(None)
+            store.pid_free.append(pid)
+        else:
+            store.pid_names.append(name)
+            store.pid_ids[name] = pid
+    return EMGASGraph.from_store(store)
+
+
+def save_snapshot(graph: EMGASGraph, path: Path) -> None:
+    atomic_write_bytes(path, encode_graph(graph))
+
+
+def load_snapshot(path: Path) -> EMGASGraph:
+    data = path.read_bytes()
+    # 批量创建大量节点/边对象时暂停循环 GC，避免分代回收反复扫描新对象
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return decode_graph(data)
+    finally:
+        if gc_enabled:
+            gc.enable()
@@ -1,22 +1,93 @@
+from array import array
 from collections import defaultdict
-from dataclasses import dataclass, field
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass
 from datetime import datetime
+import heapq
 import json
 import math
+from operator import itemgetter
+import os
+import time
 from typing import cast
 
+from .emgas_store import EMGASStore
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy 通常随 mem0 依赖安装
+    np = None
+
+
+# 到期时间按此宽度分桶，桶键构成小根堆；同一桶内的节点在剪枝时逐个核对实际到期时间
+_EXPIRY_BUCKET_SECONDS = 600.0
+
+
+def _now_us() -> int:
+    return time.time_ns() // 1000
+
+
+def _to_us(value: datetime) -> int:
+    return round(value.timestamp() * 1_000_000)
+
+
+def _from_us(value: int) -> datetime:
+    seconds, micros = divmod(value, 1_000_000)
+    return datetime.fromtimestamp(seconds).replace(microsecond=micros)
+
 
-@dataclass
 class EMGASNode:
-    id: str
-    node_type: str
-    base_activation: float = 0.5
-    last_accessed: datetime = field(default_factory=datetime.now)
-    source_passage_ids: set[str] = field(default_factory=set)
+    """节点视图：属性直接读写图的紧凑数组，节点删除后访问抛出 KeyError
 
+    base_activation 是 last_accessed 时刻的激活值；衰减在读取时按经过的时间计算。
+    """
 
-@dataclass
+    __slots__ = ("_graph", "id")
+
+    def __init__(self, graph: "EMGASGraph", node_id: str):
+        self._graph = graph
+        self.id = node_id
+
+    def _index(self) -> int:
+        return self._graph._store.ids[self.id]
+
+    @property
+    def node_type(self) -> str:
+        return self._graph._store.kind_of(self._index())
+
+    @property
+    def base_activation(self) -> float:
+        return self._graph._store.activations[self._index()]
+
+    @base_activation.setter
+    def base_activation(self, value: float) -> None:
+        index = self._index()
+        self._graph._store.activations[index] = float(value)
+        self._graph._schedule(index)
+
+    @property
+    def last_accessed(self) -> datetime:
+        return _from_us(self._graph._store.accessed[self._index()])
+
+    @last_accessed.setter
+    def last_accessed(self, value: datetime) -> None:
+        index = self._index()
+        self._graph._store.accessed[index] = _to_us(value)
+        self._graph._schedule(index)
+
+    @property
+    def source_passage_ids(self) -> set[str]:
+        """来源记忆 id 的副本；增删经由 add_node / remove_memory"""
+        return self._graph._store.source_names(self._index())
+
+    def __repr__(self) -> str:
+        return f"EMGASNode(id={self.id!r}, node_type={self.node_type!r}, base_activation={self.base_activation!r})"
+
+
+@dataclass(frozen=True)
 class EMGASEdge:
+    """边权快照；修改边权经由 EMGASGraph.add_edge / set_edge_weight"""
+
     weight: float = 1.0
 
 
@@ -26,12 +97,266 @@ class SpreadingActivationOptions:
     propagation_decay: float = 0.85
     max_iterations: int = 5
     top_n: int = 20
+    # 存在与当前图版本一致的 CSR 快照时走 NumPy 路径
+    use_csr: bool = True
+
+
+class _NodeMap(Mapping[str, EMGASNode]):
+    __slots__ = ("_graph",)
+
+    def __init__(self, graph: "EMGASGraph"):
+        self._graph = graph
+
+    def __getitem__(self, node_id: str) -> EMGASNode:
+        if node_id not in self._graph._store.ids:
+            raise KeyError(node_id)
+        return EMGASNode(self._graph, node_id)
+
+    def __contains__(self, node_id: object) -> bool:
+        return node_id in self._graph._store.ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._graph._store.ids)
+
+    def __len__(self) -> int:
+        return len(self._graph._store.ids)
+
+
+class _EdgeRow(Mapping[str, EMGASEdge]):
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store: EMGASStore, index: int):
+        self._store = store
+        self._index = index
+
+    def __getitem__(self, to_id: str) -> EMGASEdge:
+        target = self._store.ids.get(to_id)
+        weight = None if target is None else self._store.edge_weight(self._index, target)
+        if weight is None:
+            raise KeyError(to_id)
+        return EMGASEdge(weight=weight)
+
+    def __iter__(self) -> Iterator[str]:
+        names = self._store.names
+        return (cast(str, names[target]) for target in self._store.out_targets[self._index] or ())
+
+    def __len__(self) -> int:
+        return len(self._store.out_targets[self._index] or ())
+
+
+class _EdgeMap(Mapping[str, _EdgeRow]):
+    """from_id -> {to_id: EMGASEdge}，只包含有出边的节点"""
+
+    __slots__ = ("_graph",)
+
+    def __init__(self, graph: "EMGASGraph"):
+        self._graph = graph
+
+    def __getitem__(self, from_id: str) -> _EdgeRow:
+        store = self._graph._store
+        index = store.ids.get(from_id)
+        if index is None or store.out_targets[index] is None:
+            raise KeyError(from_id)
+        return _EdgeRow(store, index)
+
+    def __iter__(self) -> Iterator[str]:
+        store = self._graph._store
+        return (name for name, index in store.ids.items() if store.out_targets[index] is not None)
+
+    def __len__(self) -> int:
+        return sum(1 for row in self._graph._store.out_targets if row is not None)
+
+
+class _RowIndexMap(Mapping[str, set[str]]):
+    """把存储中的 (键 -> 下标, 下标 -> 节点下标行) 呈现为 {键: 节点 id 集合}，只包含非空行"""
+
+    __slots__ = ("_graph", "_keys", "_rows")
+
+    def __init__(self, graph: "EMGASGraph", keys: str, rows: str):
+        self._graph = graph
+        self._keys = keys
+        self._rows = rows
+
+    def _parts(self) -> tuple[dict[str, int], list[array | None]]:
+        store = self._graph._store
+        return getattr(store, self._keys), getattr(store, self._rows)
+
+    def _row(self, key: object) -> array | None:
+        keys, rows = self._parts()
+        index = keys.get(cast(str, key))
+        return None if index is None else rows[index]
+
+    def __getitem__(self, key: str) -> set[str]:
+        row = self._row(key)
+        if row is None:
+            raise KeyError(key)
+        names = self._graph._store.names
+        return {cast(str, names[index]) for index in row}
+
+    def __contains__(self, key: object) -> bool:
+        return self._row(key) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        keys, rows = self._parts()
+        return (key for key, index in keys.items() if rows[index] is not None)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class _CSRGraph:
+    """邻接表的只读 CSR 快照（NumPy 数组，行号即节点下标），由 EMGASGraph.compile() 按图版本构建"""
+
+    __slots__ = ("version", "indptr", "indices", "weights")
+
+    def __init__(self, version: int, store: EMGASStore):
+        assert np is not None
+        self.version = version
+        counts = [0 if row is None else len(row) for row in store.out_targets]
+        self.indptr = np.zeros(len(counts) + 1, dtype=np.int64)
+        _ = np.cumsum(counts, out=self.indptr[1:])
+        # 各行数组首尾拼接即为 CSR 的 indices / data
+        targets = b"".join(row.tobytes() for row in store.out_targets if row is not None)
+        weights = b"".join(row.tobytes() for row in store.out_weights if row is not None)
+        self.indices = np.frombuffer(targets, dtype=np.dtype(f"u{array('I').itemsize}")).astype(np.int64)
+        self.weights = np.frombuffer(weights, dtype=np.float64)
 
 
 class EMGASGraph:
-    def __init__(self):
-        self.nodes: dict[str, EMGASNode] = {}
-        self.edges: dict[str, dict[str, EMGASEdge]] = defaultdict(dict)
+    """EMGAS 图：数据保存在 EMGASStore 的紧凑数组中
+
+    nodes / edges / in_edges / passage_nodes 是只读映射视图：nodes[id] 返回可读写激活属性的节点视图，
+    edges[from_id][to_id] 返回边权快照，in_edges 与 passage_nodes 返回节点 id 集合的副本。
+    结构修改经由 add_node / add_edge / set_edge_weight / remove_node / add_memory / remove_memory。
+    """
+
+    def __init__(self, decay_rate: float = 0.01, prune_threshold: float = 0.05):
+        self._store = EMGASStore()
+        self.nodes = _NodeMap(self)
+        self.edges = _EdgeMap(self)
+        # 反向邻接：to_id -> {from_id}，删除节点时只需访问其邻居
+        self.in_edges = _RowIndexMap(self, "ids", "in_sources")
+        # passage_id -> 来源集合包含它的节点，删除记忆时无需扫描全部节点
+        self.passage_nodes = _RowIndexMap(self, "pid_ids", "pid_nodes")
+        # 节点集合或边权变化时递增，CSR 快照按版本失效
+        self._version = 0
+        self._csr: _CSRGraph | None = None
+        # 惰性衰减：有效激活 = base_activation × e^(-λ × 距 last_accessed 的小时数)
+        self.decay_rate = 0.0
+        self.prune_threshold = 0.0
+        # 每个节点预计跌破剪枝阈值的时刻（epoch 秒，NaN 表示不会到期），按时间分桶，桶键为小根堆；
+        # 节点重新锚定到别的桶后，旧桶中的条目按 _deadlines 判定失效
+        self._deadlines = array("d")
+        self._expiry_buckets: dict[int, array] = {}
+        self._expiry_keys: list[int] = []
+        self._expiry_entries = 0
+        self.configure_decay(decay_rate, prune_threshold)
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def configure_decay(self, decay_rate: float, prune_threshold: float) -> None:
+        """设置衰减率 λ（每小时）与剪枝阈值；参数变化时重建到期索引（O(V)）"""
+        if decay_rate < 0:
+            raise ValueError("decay_rate 必须 >= 0")
+        if decay_rate == self.decay_rate and prune_threshold == self.prune_threshold:
+            return
+        self.decay_rate = float(decay_rate)
+        self.prune_threshold = float(prune_threshold)
+        self._rebuild_expiry()
+
+    def activation(self, node_id: str, now: float | None = None) -> float:
+        """节点在 now（epoch 秒，默认当前时间）的有效激活值"""
+        return self._decayed(self._store.ids[node_id], time.time() if now is None else now)
+
+    def set_activation(self, node_id: str, activation: float) -> None:
+        """把节点激活值锚定为 activation（当前时刻）"""
+        index = self._store.ids[node_id]
+        self._store.activations[index] = float(activation)
+        self._store.accessed[index] = _now_us()
+        self._schedule(index)
+
+    def _decayed(self, index: int, now: float) -> float:
+        activation = self._store.activations[index]
+        if self.decay_rate <= 0:
+            return activation
+        hours = max(0.0, (now - self._store.accessed[index] / 1_000_000) / 3600.0)
+        return activation * math.exp(-self.decay_rate * hours)
+
+    def _anchor(self, index: int, now_us: int, floor: float = 0.0) -> None:
+        """把截至 now 的衰减折算进 base_activation 并以 now 为新的参考时刻"""
+        self._store.activations[index] = max(self._decayed(index, now_us / 1_000_000), floor)
+        self._store.accessed[index] = now_us
+        self._schedule(index)
+
+    def _expiry_time(self, index: int) -> float:
+        activation = self._store.activations[index]
+        reference = self._store.accessed[index] / 1_000_000
+        if activation < self.prune_threshold:
+            return reference
+        if self.decay_rate <= 0 or self.prune_threshold <= 0:
+            return math.nan
+        hours = math.log(activation / self.prune_threshold) / self.decay_rate
+        return reference + hours * 3600.0
+
+    def _schedule(self, index: int) -> None:
+        deadline = self._expiry_time(index)
+        previous = self._deadlines[index]
+        self._deadlines[index] = deadline
+        if math.isnan(deadline):
+            return
+        key = int(deadline // _EXPIRY_BUCKET_SECONDS)
+        if not math.isnan(previous) and int(previous // _EXPIRY_BUCKET_SECONDS) == key:
+            return
+        bucket = self._expiry_buckets.get(key)
+        if bucket is None:
+            self._expiry_buckets[key] = array("I", (index,))
+            heapq.heappush(self._expiry_keys, key)
+        else:
+            bucket.append(index)
+        self._expiry_entries += 1
+        # 重新锚定到别的桶会留下失效条目，超过节点数两倍时压缩
+        if self._expiry_entries > 2 * len(self._store) + 64:
+            self._rebuild_buckets()
+
+    def _rebuild_expiry(self) -> None:
+        deadlines = array("d", (math.nan,)) * len(self._store.names)
+        for index in self._store.live():
+            deadlines[index] = self._expiry_time(index)
+        self._deadlines = deadlines
+        self._rebuild_buckets()
+
+    def _rebuild_buckets(self) -> None:
+        buckets: dict[int, array] = {}
+        entries = 0
+        for index, deadline in enumerate(self._deadlines):
+            if math.isnan(deadline):
+                continue
+            key = int(deadline // _EXPIRY_BUCKET_SECONDS)
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = array("I", (index,))
+            else:
+                bucket.append(index)
+            entries += 1
+        self._expiry_buckets = buckets
+        self._expiry_keys = list(buckets)
+        heapq.heapify(self._expiry_keys)
+        self._expiry_entries = entries
+
+    def rebuild_indexes(self) -> None:
+        """按出边与来源数组重建反向邻接、来源索引与到期索引"""
+        self._version += 1
+        self._store.rebuild_reverse()
+        self._rebuild_expiry()
+
+    def _new_node(self, node_id: str, node_type: str, activation: float, accessed_us: int) -> int:
+        index = self._store.add_node(node_id, node_type, activation, accessed_us)
+        if index == len(self._deadlines):
+            self._deadlines.append(math.nan)
+        self._version += 1
+        return index
 
     def add_node(
         self,
@@ -39,21 +364,41 @@ class EMGASGraph:
         node_type: str = "concept",
         source_passage_ids: set[str] | None = None,
     ) -> None:
-        if node_id not in self.nodes:
-            self.nodes[node_id] = EMGASNode(id=node_id, node_type=node_type)
-        if source_passage_ids:
-            self.nodes[node_id].source_passage_ids.update(source_passage_ids)
-        self.nodes[node_id].last_accessed = datetime.now()
+        now_us = _now_us()
+        index = self._store.ids.get(node_id)
+        if index is None:
+            index = self._new_node(node_id, node_type, 0.5, now_us)
+        for pid in source_passage_ids or ():
+            self._store.add_source(index, pid)
+        self._anchor(index, now_us)
 
     def add_edge(self, from_id: str, to_id: str, weight: float = 1.0) -> None:
-        if from_id not in self.nodes:
+        if from_id not in self._store.ids:
             self.add_node(from_id)
-        if to_id not in self.nodes:
+        if to_id not in self._store.ids:
             self.add_node(to_id)
-        if to_id in self.edges[from_id]:
-            self.edges[from_id][to_id].weight += weight
-        else:
-            self.edges[from_id][to_id] = EMGASEdge(weight=weight)
+        self._store.add_weight(self._store.ids[from_id], self._store.ids[to_id], weight)
+        self._version += 1
+
+    def set_edge_weight(self, from_id: str, to_id: str, weight: float) -> None:
+        """覆盖边权（边不存在时新建）"""
+        source = self._store.ids.get(from_id)
+        target = self._store.ids.get(to_id)
+        if source is None or target is None or self._store.edge_weight(source, target) is None:
+            self.add_edge(from_id, to_id, weight=weight)
+        elif self._store.set_weight(source, target, weight):
+            self._version += 1
+
+    def remove_node(self, node_id: str) -> None:
+        """删除节点及其出入边，代价与节点度数成正比"""
+        index = self._store.ids.get(node_id)
+        if index is not None:
+            self._remove_index(index)
+
+    def _remove_index(self, index: int) -> None:
+        self._store.remove_node(index)
+        self._deadlines[index] = math.nan
+        self._version += 1
 
     def add_memory(self, content: str, passage_id: str, concepts: list[str]) -> None:
         _ = content
@@ -74,71 +419,61 @@ class EMGASGraph:
                 self.add_edge(concept_b, concept_a, weight=1.0)
 
     def remove_memory(self, passage_id: str) -> None:
-        passage_node_id = f"passage::{passage_id}"
-
-        for node in self.nodes.values():
-            node.source_passage_ids.discard(passage_id)
-
-        removable = {passage_node_id}
-        for node_id, node in self.nodes.items():
-            if node.node_type == "concept" and not node.source_passage_ids:
-                removable.add(node_id)
-
-        for node_id in removable:
-            _ = self.nodes.pop(node_id, None)
-            _ = self.edges.pop(node_id, None)
-
-        for from_id in list(self.edges.keys()):
-            for to_id in list(self.edges[from_id].keys()):
-                if to_id in removable:
-                    del self.edges[from_id][to_id]
-            if not self.edges[from_id]:
-                del self.edges[from_id]
+        """删除记忆节点，并删除因此不再有来源记忆的概念节点（只访问引用该记忆的节点）"""
+        store = self._store
+        removable: list[int] = []
+        passage_index = store.ids.get(f"passage::{passage_id}")
+        if passage_index is not None:
+            removable.append(passage_index)
+
+        pid = store.pid_ids.get(passage_id)
+        holders = None if pid is None else store.pid_nodes[pid]
+        if pid is not None and holders is not None:
+            concept = store.kind_ids.get("concept")
+            for index in holders.tolist():
+                store.discard_source(index, pid)
+                if store.kinds[index] == concept and store.sources[index] is None:
+                    removable.append(index)
+
+        for index in dict.fromkeys(removable):
+            if store.names[index] is not None:
+                self._remove_index(index)
+
+    def compile(self) -> _CSRGraph | None:
+        """为当前图版本构建 CSR 快照（O(V + E)，应在维护任务中调用）；无 NumPy 时返回 None"""
+        if np is None:
+            return None
+        if self._csr is None or self._csr.version != self._version:
+            self._csr = _CSRGraph(self._version, self._store)
+        return self._csr
 
     def retrieve_context(
         self,
         seed_concepts: list[str],
         options: SpreadingActivationOptions | None = None,
     ) -> dict[str, float]:
-        opts = options or SpreadingActivationOptions()
-        activations: dict[str, float] = {node_id: 0.0 for node_id in self.nodes}
-        for seed in seed_concepts:
-            if seed in activations:
-                activations[seed] = 1.0
+        """扩散激活检索：只跟踪被激活的节点，代价与激活范围成正比，与图规模无关
 
-        for _ in range(opts.max_iterations):
-            firing_nodes = [
-                n for n, a in activations.items() if a > opts.firing_threshold
-            ]
-            if not firing_nodes:
-                break
-
-            propagated: defaultdict[str, float] = defaultdict(float)
-            for node_id in firing_nodes:
-                current = activations[node_id]
-                for neighbor_id, edge in self.edges.get(node_id, {}).items():
-                    propagated[neighbor_id] += (
-                        current * edge.weight * opts.propagation_decay
-                    )
-                activations[node_id] = current * (1.0 - opts.propagation_decay)
-
-            for node_id, energy in propagated.items():
-                activations[node_id] = activations.get(node_id, 0.0) + energy
-
-        ranked = sorted(activations.items(), key=lambda item: item[1], reverse=True)[
-            : max(0, opts.top_n)
-        ]
-        now = datetime.now()
+        检索路径不会编译 CSR；快照与当前图版本一致时走 NumPy 向量化路径，否则在字典前沿上传播。
+        """
+        opts = options or SpreadingActivationOptions()
+        csr = self._csr
+        if opts.use_csr and np is not None and csr is not None and csr.version == self._version:
+            ranked = self._spread_csr(csr, seed_concepts, opts)
+        else:
+            ranked = self._spread_frontier(seed_concepts, opts)
+        now_us = _now_us()
 
+        store = self._store
         passage_scores: dict[str, float] = {}
         for node_id, act_score in ranked:
             if act_score <= 0:
                 continue
-            node = self.nodes[node_id]
-            for pid in node.source_passage_ids:
-                passage_scores[pid] = max(passage_scores.get(pid, 0.0), act_score)
-            node.last_accessed = now
-            node.base_activation = max(node.base_activation, act_score)
+            index = store.ids[node_id]
+            for pid in store.sources[index] or ():
+                name = cast(str, store.pid_names[pid])
+                passage_scores[name] = max(passage_scores.get(name, 0.0), act_score)
+            self._anchor(index, now_us, floor=act_score)
 
         if not passage_scores:
             return {}
@@ -148,38 +483,146 @@ class EMGASGraph:
             return {pid: 1.0 for pid in passage_scores}
         return {pid: (s - min_s) / (max_s - min_s) for pid, s in passage_scores.items()}
 
-    def apply_decay(self, lambda_rate: float = 0.01) -> None:
-        if lambda_rate < 0:
-            raise ValueError("lambda_rate 必须 >= 0")
-        for node in self.nodes.values():
-            now = (
-                datetime.now(tz=node.last_accessed.tzinfo)
-                if node.last_accessed.tzinfo
-                else datetime.now()
-            )
-            delta_seconds = (now - node.last_accessed).total_seconds()
-            delta_hours = max(0.0, delta_seconds / 3600.0)
-            node.base_activation = float(
-                node.base_activation * math.exp(-lambda_rate * delta_hours)
-            )
+    def _spread_frontier(
+        self, seed_concepts: list[str], opts: SpreadingActivationOptions
+    ) -> list[tuple[str, float]]:
+        store = self._store
+        # 未出现在字典中的节点激活值为 0
+        activations: dict[int, float] = {}
+        for seed in seed_concepts:
+            index = store.ids.get(seed)
+            if index is not None:
+                activations[index] = 1.0
 
-    def prune(self, threshold: float = 0.05) -> None:
-        to_remove = {
-            node_id
-            for node_id, node in self.nodes.items()
-            if node.base_activation < threshold
-        }
+        out_targets, out_weights = store.out_targets, store.out_weights
+        for _ in range(opts.max_iterations):
+            firing_nodes = [
+                n for n, a in activations.items() if a > opts.firing_threshold
+            ]
+            if not firing_nodes:
+                break
+
+            propagated: defaultdict[int, float] = defaultdict(float)
+            for index in firing_nodes:
+                current = activations[index]
+                targets = out_targets[index]
+                if targets is not None:
+                    for neighbor, weight in zip(targets, cast(array, out_weights[index])):
+                        propagated[neighbor] += current * weight * opts.propagation_decay
+                activations[index] = current * (1.0 - opts.propagation_decay)
+
+            for index, energy in propagated.items():
+                activations[index] = activations.get(index, 0.0) + energy
+
+        names = store.names
+        ranked = heapq.nlargest(max(0, opts.top_n), activations.items(), key=itemgetter(1))
+        return [(cast(str, names[index]), score) for index, score in ranked]
+
+    def _spread_csr(
+        self, csr: _CSRGraph, seed_concepts: list[str], opts: SpreadingActivationOptions
+    ) -> list[tuple[str, float]]:
+        assert np is not None
+        ids = self._store.ids
+        seeds = sorted({ids[s] for s in seed_concepts if s in ids})
+        top_n = max(0, opts.top_n)
+        if not seeds or top_n == 0:
+            return []
+        activation = np.zeros(len(csr.indptr) - 1, dtype=np.float64)
+        active = np.asarray(seeds, dtype=np.int64)
+        activation[active] = 1.0
+        for _ in range(opts.max_iterations):
+            firing = active[activation[active] > opts.firing_threshold]
+            if not firing.size:
+                break
+            current = activation[firing]
+            starts = csr.indptr[firing]
+            counts = csr.indptr[firing + 1] - starts
+            activation[firing] = current * (1.0 - opts.propagation_decay)
+            total = int(counts.sum())
+            if not total:
+                continue
+            # 只展开前沿节点的 CSR 行：每条出边的位置 = 行起点 + 行内偏移
+            row_offsets = np.cumsum(counts) - counts
+            positions = np.repeat(starts - row_offsets, counts) + np.arange(total, dtype=np.int64)
+            targets = csr.indices[positions]
+            energy = np.repeat(current * opts.propagation_decay, counts) * csr.weights[positions]
+            touched, inverse = np.unique(targets, return_inverse=True)
+            activation[touched] += np.bincount(inverse, weights=energy, minlength=len(touched))
+            active = np.union1d(active, touched)
+
+        values = activation[active]
+        if len(active) > top_n:
+            keep = np.argpartition(-values, top_n - 1)[:top_n]
+            active, values = active[keep], values[keep]
+        order = np.argsort(-values, kind="stable")
+        names = self._store.names
+        return [(cast(str, names[i]), v) for i, v in zip(active[order].tolist(), values[order].tolist())]
+
+    def prune(self, threshold: float | None = None, now: float | None = None) -> list[str]:
+        """删除有效激活已跌破阈值的节点，返回被删除的节点 id
+
+        只处理已到期的时间桶，代价与到期节点数成正比；threshold 与当前配置不同时先重建到期索引。
+        """
+        if threshold is not None and threshold != self.prune_threshold:
+            self.configure_decay(self.decay_rate, threshold)
+        now = time.time() if now is None else now
+        now_key = int(now // _EXPIRY_BUCKET_SECONDS)
+        removed: list[str] = []
+        keys, deadlines = self._expiry_keys, self._deadlines
+        while keys and keys[0] <= now_key:
+            key = keys[0]
+            bucket = self._expiry_buckets[key]
+            pending = array("I")
+            for index in bucket:
+                deadline = deadlines[index]
+                if math.isnan(deadline) or int(deadline // _EXPIRY_BUCKET_SECONDS) != key:
+                    continue
+                if deadline <= now:
+                    removed.append(cast(str, self._store.names[index]))
+                    self._remove_index(index)
+                else:
+                    pending.append(index)
+            self._expiry_entries -= len(bucket) - len(pending)
+            if pending:
+                # 只有当前时间所在的桶会部分到期
+                self._expiry_buckets[key] = pending
+                break
+            _ = heapq.heappop(keys)
+            del self._expiry_buckets[key]
+        return removed
 
-        for node_id in to_remove:
-            _ = self.nodes.pop(node_id, None)
-            _ = self.edges.pop(node_id, None)
+    @classmethod
+    def from_records(
+        cls,
+        nodes: Iterable[tuple[str, str, float, int, Iterable[str]]],
+        edges: Iterable[tuple[str, Iterable[tuple[str, float]]]],
+    ) -> "EMGASGraph":
+        """由 (id, 类型, 激活值, 参考时间 epoch 微秒, 来源记忆 id) 与 (源, [(目标, 权重)]) 构建图"""
+        graph = cls()
+        store = graph._store
+        for node_id, node_type, activation, accessed_us, passage_ids in nodes:
+            index = store.ids.get(node_id)
+            if index is None:
+                index = graph._new_node(node_id, node_type, activation, accessed_us)
+            for pid in passage_ids:
+                store.add_source(index, pid)
+        for from_id, targets in edges:
+            for to_id, weight in targets:
+                for node_id in (from_id, to_id):
+                    if node_id not in store.ids:
+                        _ = graph._new_node(node_id, "concept", 0.5, _now_us())
+                store.add_weight(store.ids[from_id], store.ids[to_id], weight)
+        graph._rebuild_expiry()
+        return graph
 
-        for from_id in list(self.edges.keys()):
-            for to_id in list(self.edges[from_id].keys()):
-                if to_id in to_remove:
-                    del self.edges[from_id][to_id]
-            if not self.edges[from_id]:
-                del self.edges[from_id]
+    @classmethod
+    def from_store(cls, store: EMGASStore) -> "EMGASGraph":
+        """直接采用已填充的存储（二进制快照加载）"""
+        graph = cls()
+        graph._store = store
+        graph._version += 1
+        graph._rebuild_expiry()
+        return graph
 
     def save(self, filepath: str) -> None:
         payload = {
@@ -198,8 +641,12 @@ class EMGASGraph:
                 for from_id, to_map in self.edges.items()
             },
         }
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
+        tmp_path = f"{filepath}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
 
     @classmethod
     def load(cls, filepath: str) -> "EMGASGraph":
@@ -207,13 +654,12 @@ class EMGASGraph:
             payload_obj = cast(object, json.load(f))
         payload = cast(dict[str, object], payload_obj)
 
-        graph = cls()
-
         nodes_obj = payload.get("nodes", {})
         edges_obj = payload.get("edges", {})
         nodes_map = cast(dict[str, dict[str, object]], nodes_obj)
         edges_map = cast(dict[str, dict[str, float]], edges_obj)
 
+        records: list[tuple[str, str, float, int, Iterable[str]]] = []
         for node_id, raw in nodes_map.items():
             base_activation_raw = raw.get("base_activation", 0.5)
             last_accessed_raw = raw.get("last_accessed", datetime.now().isoformat())
@@ -222,18 +668,20 @@ class EMGASGraph:
                 base_activation = float(base_activation_raw)
             else:
                 base_activation = 0.5
-            graph.nodes[node_id] = EMGASNode(
-                id=str(raw.get("id", node_id)),
-                node_type=str(raw.get("node_type", "concept")),
-                base_activation=base_activation,
-                last_accessed=datetime.fromisoformat(str(last_accessed_raw)),
-                source_passage_ids={str(x) for x in cast(list[object], source_ids_raw)},
+            records.append(
+                (
+                    node_id,
+                    str(raw.get("node_type", "concept")),
+                    base_activation,
+                    _to_us(datetime.fromisoformat(str(last_accessed_raw))),
+                    [str(x) for x in cast(list[object], source_ids_raw)],
+                )
             )
 
-        for from_id, to_map in edges_map.items():
-            graph.edges[from_id] = {
-                to_id: EMGASEdge(weight=float(weight))
-                for to_id, weight in to_map.items()
-            }
-
-        return graph
+        return cls.from_records(
+            records,
+            (
+                (from_id, [(to_id, float(weight)) for to_id, weight in to_map.items()])
+                for from_id, to_map in edges_map.items()
+            ),
+        )
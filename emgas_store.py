@@ -0,0 +1,240 @@
+"""EMGAS 图的紧凑存储：节点 id 驻留为整数下标，属性存放在平行数组中，邻接行是按下标排序的紧凑数组"""
+
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterator
+
+# 空槽位的类型编码（被删除的节点下标留给后续新节点复用）
+FREE_KIND = 255
+
+
+def _row_insert(rows: list[array | None], index: int, value: int) -> int:
+    """在有序行中插入 value，返回插入位置；已存在时返回 -1"""
+    row = rows[index]
+    if row is None:
+        rows[index] = array("I", (value,))
+        return 0
+    pos = bisect_left(row, value)
+    if pos < len(row) and row[pos] == value:
+        return -1
+    row.insert(pos, value)
+    return pos
+
+
+def _row_find(row: array | None, value: int) -> int:
+    if row is None:
+        return -1
+    pos = bisect_left(row, value)
+    if pos < len(row) and row[pos] == value:
+        return pos
+    return -1
+
+
+def _row_remove(rows: list[array | None], index: int, value: int) -> int:
+    """从有序行中删除 value，返回原位置；行变空时释放数组"""
+    row = rows[index]
+    pos = _row_find(row, value)
+    if pos < 0:
+        return -1
+    assert row is not None
+    del row[pos]
+    if not row:
+        rows[index] = None
+    return pos
+
+
+class EMGASStore:
+    """节点与边的紧凑存储
+
+    - 节点：ids（名称 -> 下标）与 names（下标 -> 名称）双向驻留，类型、激活值、参考时间（epoch 微秒）为平行数组；
+    - 边：每个节点一对出边数组（目标下标升序 + 等长权重），即按行拆开的 CSR，插入/删除只移动该行；
+      入边行只存来源下标，删除节点时按行回收；
+    - 来源记忆：passage_id 同样驻留为整数，节点持有有序的下标数组，反向索引 pid_nodes 记录引用它的节点。
+    空行一律为 None，不分配数组。
+    """
+
+    def __init__(self) -> None:
+        self.ids: dict[str, int] = {}
+        self.names: list[str | None] = []
+        self.free: list[int] = []
+        self.kind_names: list[str] = []
+        self.kind_ids: dict[str, int] = {}
+        self.kinds: array = array("B")
+        self.activations: array = array("d")
+        self.accessed: array = array("q")
+        self.sources: list[array | None] = []
+        self.out_targets: list[array | None] = []
+        self.out_weights: list[array | None] = []
+        self.in_sources: list[array | None] = []
+        self.pid_ids: dict[str, int] = {}
+        self.pid_names: list[str | None] = []
+        self.pid_free: list[int] = []
+        self.pid_nodes: list[array | None] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def live(self) -> Iterator[int]:
+        return (i for i, name in enumerate(self.names) if name is not None)
+
+    def kind_code(self, kind: str) -> int:
+        code = self.kind_ids.get(kind)
+        if code is None:
+            code = len(self.kind_names)
+            if code >= FREE_KIND:
+                raise ValueError("EMGAS 节点类型过多")
+            self.kind_ids[kind] = code
+            self.kind_names.append(kind)
+        return code
+
+    def kind_of(self, index: int) -> str:
+        return self.kind_names[self.kinds[index]]
+
+    def add_node(self, name: str, kind: str, activation: float, accessed_us: int) -> int:
+        code = self.kind_code(kind)
+        if self.free:
+            index = self.free.pop()
+            self.names[index] = name
+            self.kinds[index] = code
+            self.activations[index] = activation
+            self.accessed[index] = accessed_us
+        else:
+            index = len(self.names)
+            self.names.append(name)
+            self.kinds.append(code)
+            self.activations.append(activation)
+            self.accessed.append(accessed_us)
+            self.sources.append(None)
+            self.out_targets.append(None)
+            self.out_weights.append(None)
+            self.in_sources.append(None)
+        self.ids[name] = index
+        return index
+
+    def remove_node(self, index: int) -> None:
+        """删除节点及其出入边与来源记录，代价与度数成正比"""
+        targets = self.out_targets[index]
+        if targets is not None:
+            for target in targets:
+                if target != index:
+                    _ = _row_remove(self.in_sources, target, index)
+        sources = self.in_sources[index]
+        if sources is not None:
+            for source in sources:
+                if source == index:
+                    continue
+                pos = _row_remove(self.out_targets, source, index)
+                if pos >= 0:
+                    weights = self.out_weights[source]
+                    assert weights is not None
+                    del weights[pos]
+                    if not weights:
+                        self.out_weights[source] = None
+        pids = self.sources[index]
+        if pids is not None:
+            for pid in pids:
+                self._drop_pid_holder(pid, index)
+        name = self.names[index]
+        if name is not None:
+            del self.ids[name]
+        self.names[index] = None
+        self.kinds[index] = FREE_KIND
+        self.activations[index] = 0.0
+        self.sources[index] = None
+        self.out_targets[index] = None
+        self.out_weights[index] = None
+        self.in_sources[index] = None
+        self.free.append(index)
+
+    # ---- 来源记忆 ----
+
+    def add_source(self, index: int, passage_id: str) -> None:
+        pid = self.pid_ids.get(passage_id)
+        if pid is None:
+            if self.pid_free:
+                pid = self.pid_free.pop()
+                self.pid_names[pid] = passage_id
+            else:
+                pid = len(self.pid_names)
+                self.pid_names.append(passage_id)
+                self.pid_nodes.append(None)
+            self.pid_ids[passage_id] = pid
+        if _row_insert(self.sources, index, pid) >= 0:
+            _ = _row_insert(self.pid_nodes, pid, index)
+
+    def discard_source(self, index: int, pid: int) -> None:
+        if _row_remove(self.sources, index, pid) >= 0:
+            self._drop_pid_holder(pid, index)
+
+    def _drop_pid_holder(self, pid: int, index: int) -> None:
+        _ = _row_remove(self.pid_nodes, pid, index)
+        if self.pid_nodes[pid] is None:
+            name = self.pid_names[pid]
+            if name is not None:
+                del self.pid_ids[name]
+            self.pid_names[pid] = None
+            self.pid_free.append(pid)
+
+    def source_names(self, index: int) -> set[str]:
+        pids = self.sources[index]
+        if pids is None:
+            return set()
+        names = self.pid_names
+        return {name for name in (names[pid] for pid in pids) if name is not None}
+
+    # ---- 边 ----
+
+    def edge_weight(self, source: int, target: int) -> float | None:
+        pos = _row_find(self.out_targets[source], target)
+        if pos < 0:
+            return None
+        weights = self.out_weights[source]
+        assert weights is not None
+        return weights[pos]
+
+    def add_weight(self, source: int, target: int, delta: float) -> None:
+        """边存在时累加权重，否则新建"""
+        weights = self.out_weights[source]
+        pos = _row_find(self.out_targets[source], target)
+        if pos >= 0:
+            assert weights is not None
+            weights[pos] += delta
+            return
+        pos = _row_insert(self.out_targets, source, target)
+        if weights is None:
+            self.out_weights[source] = array("d", (delta,))
+        else:
+            weights.insert(pos, delta)
+        _ = _row_insert(self.in_sources, target, source)
+
+    def set_weight(self, source: int, target: int, weight: float) -> bool:
+        """覆盖已存在边的权重，返回是否发生变化"""
+        pos = _row_find(self.out_targets[source], target)
+        weights = self.out_weights[source]
+        if pos < 0 or weights is None or weights[pos] == weight:
+            return False
+        weights[pos] = weight
+        return True
+
+    def rebuild_reverse(self) -> None:
+        """按出边与来源数组重建入边行和 pid_nodes（只用于一致性修复与校验）"""
+        self.in_sources = [None] * len(self.names)
+        for source, targets in enumerate(self.out_targets):
+            if targets is not None:
+                for target in targets:
+                    row = self.in_sources[target]
+                    if row is None:
+                        self.in_sources[target] = array("I", (source,))
+                    else:
+                        row.append(source)
+        self.pid_nodes = [None] * len(self.pid_names)
+        for index, pids in enumerate(self.sources):
+            if pids is not None:
+                for pid in pids:
+                    row = self.pid_nodes[pid]
+                    if row is None:
+                        self.pid_nodes[pid] = array("I", (index,))
+                    else:
+                        row.append(index)
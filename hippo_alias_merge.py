@@ -1,6 +1,8 @@
-"""实体别名合并：Jaccard 相似度 + Union-Find"""
+"""实体别名合并：Jaccard 相似度 + Union-Find；增量场景使用 MinHash-LSH 索引"""
 
+import random
 from typing import final
+import zlib
 
 
 def char_shingle_set(text: str, k: int = 3) -> set[str]:
@@ -40,24 +42,36 @@ class UnionFind:
         self.parent: list[int] = list(range(n))
         self.rank: list[int] = [0] * n
 
+    def add(self) -> int:
+        """追加一个独立元素，返回其下标"""
+        self.parent.append(len(self.parent))
+        self.rank.append(0)
+        return len(self.parent) - 1
+
     def find(self, x: int) -> int:
-        if self.parent[x] != x:
-            self.parent[x] = self.find(self.parent[x])
-        return self.parent[x]
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
 
-    def union(self, x: int, y: int):
+    def union(self, x: int, y: int) -> int:
+        """合并两个集合，返回合并后的根"""
         rx = self.find(x)
         ry = self.find(y)
         if rx == ry:
-            return
+            return rx
 
         if self.rank[rx] < self.rank[ry]:
             self.parent[rx] = ry
-        elif self.rank[rx] > self.rank[ry]:
+            return ry
+        if self.rank[rx] > self.rank[ry]:
             self.parent[ry] = rx
-        else:
-            self.parent[ry] = rx
-            self.rank[rx] += 1
+            return rx
+        self.parent[ry] = rx
+        self.rank[rx] += 1
+        return rx
 
 
 def consolidate_entity_aliases(entities: list[str], threshold: float = 0.85) -> dict[str, str]:
@@ -104,6 +118,150 @@ def consolidate_entity_aliases(entities: list[str], threshold: float = 0.85) ->
     return alias_map
 
 
+def _preferred_representative(a: str, b: str) -> str:
+    """与 consolidate_entity_aliases 一致：取最长者，等长取字典序最小"""
+    return min(a, b, key=lambda s: (-len(s), s))
+
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+@final
+class EntityAliasIndex:
+    """增量别名索引：MinHash 签名 + LSH 分桶 + 增量并查集
+
+    新实体只与同桶实体比较，并先用 shingle 数量比做上界剪枝（Jaccard ≤ min/max），
+    通过后才计算精确 Jaccard；结果与 consolidate_entity_aliases 的全量两两比较一致（LSH 漏召回概率极低）。
+    add 会修改索引；canonical / canonicalize 为只读查询，可用于检索路径。
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 64, bands: int = 16, k: int = 3, seed: int = 1):
+        self.threshold: float = max(0.0, min(1.0, float(threshold)))
+        self.k: int = k
+        self.bands: int = max(1, min(int(bands), int(num_perm)))
+        self.rows: int = max(1, int(num_perm) // self.bands)
+        rng = random.Random(seed)
+        self._perms: list[tuple[int, int]] = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(self.bands * self.rows)
+        ]
+
+        self._ids: dict[str, int] = {}
+        self._entities: list[str] = []
+        self._shingles: list[set[str]] = []
+        self._uf = UnionFind(0)
+        self._rep: dict[int, str] = {}
+        self._buckets: dict[tuple[int, tuple[int, ...]], list[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entities)
+
+    def __contains__(self, entity: object) -> bool:
+        return isinstance(entity, str) and entity.strip() in self._ids
+
+    def _signature(self, shingles: set[str]) -> list[int]:
+        hashes = [zlib.crc32(sh.encode("utf-8")) for sh in shingles] or [0]
+        return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self._perms]
+
+    def _band_keys(self, signature: list[int]) -> list[tuple[int, tuple[int, ...]]]:
+        r = self.rows
+        return [(band, tuple(signature[band * r : (band + 1) * r])) for band in range(self.bands)]
+
+    def _similar_ids(self, shingles: set[str], band_keys: list[tuple[int, tuple[int, ...]]]) -> list[int]:
+        """返回同桶中相似度达到阈值的实体下标"""
+        size = len(shingles)
+        seen: set[int] = set()
+        matches: list[int] = []
+        for key in band_keys:
+            for idx in self._buckets.get(key, ()):
+                if idx in seen:
+                    continue
+                seen.add(idx)
+                other = self._shingles[idx]
+                small, large = sorted((size, len(other)))
+                if large and small / large < self.threshold:
+                    continue
+                if jaccard_similarity(shingles, other) >= self.threshold:
+                    matches.append(idx)
+        return matches
+
+    def add(self, entity: str) -> str:
+        """加入实体并与相似实体合并，返回其当前代表实体"""
+        clean = (entity or "").strip()
+        if not clean:
+            return clean
+        idx = self._ids.get(clean)
+        if idx is not None:
+            return self._rep[self._uf.find(idx)]
+
+        shingles = char_shingle_set(clean, k=self.k)
+        band_keys = self._band_keys(self._signature(shingles))
+        matches = self._similar_ids(shingles, band_keys)
+
+        idx = self._uf.add()
+        self._ids[clean] = idx
+        self._entities.append(clean)
+        self._shingles.append(shingles)
+        self._rep[idx] = clean
+        for key in band_keys:
+            self._buckets.setdefault(key, []).append(idx)
+        for other in matches:
+            self._union(idx, other)
+        return self._rep[self._uf.find(idx)]
+
+    def _union(self, x: int, y: int) -> None:
+        rx, ry = self._uf.find(x), self._uf.find(y)
+        if rx == ry:
+            return
+        rep = _preferred_representative(self._rep.pop(rx), self._rep.pop(ry))
+        self._rep[self._uf.union(rx, ry)] = rep
+
+    def link(self, entity: str, representative: str) -> None:
+        """强制合并两个实体（用于从持久化的 alias_map 恢复历史合并关系）"""
+        self.add(entity)
+        self.add(representative)
+        a, b = (entity or "").strip(), (representative or "").strip()
+        if a and b:
+            self._union(self._ids[a], self._ids[b])
+
+    def canonical(self, entity: str) -> str:
+        """只读查询代表实体：未入库的实体按 LSH 查找相似实体，找不到则原样返回"""
+        clean = (entity or "").strip()
+        if not clean:
+            return clean
+        idx = self._ids.get(clean)
+        if idx is None:
+            shingles = char_shingle_set(clean, k=self.k)
+            matches = self._similar_ids(shingles, self._band_keys(self._signature(shingles)))
+            if not matches:
+                return clean
+            reps = {self._rep[self._uf.find(m)] for m in matches}
+            return min(reps, key=lambda s: (-len(s), s))
+        return self._rep[self._uf.find(idx)]
+
+    def canonicalize(self, entities: list[str]) -> list[str]:
+        """只读：把实体列表映射到代表实体（去重保序）"""
+        normalized: list[str] = []
+        seen: set[str] = set()
+        for entity in entities:
+            mapped = self.canonical(str(entity))
+            if mapped and mapped not in seen:
+                seen.add(mapped)
+                normalized.append(mapped)
+        return normalized
+
+    def mapping(self) -> dict[str, str]:
+        """导出 {实体: 代表实体}，格式与 consolidate_entity_aliases 相同"""
+        return {entity: self._rep[self._uf.find(idx)] for entity, idx in self._ids.items()}
+
+    @classmethod
+    def from_alias_map(cls, alias_map: dict[str, str], threshold: float = 0.85) -> "EntityAliasIndex":
+        index = cls(threshold=threshold)
+        for entity, rep in alias_map.items():
+            index.link(entity, rep)
+        return index
+
+
 def apply_alias_mapping(entities: list[str], alias_map: dict[str, str]) -> list[str]:
     """应用别名映射，返回规范化后的实体列表（去重）"""
     normalized: list[str] = []
@@ -1,49 +1,142 @@
 """HippoRAG 实体提取模块"""
 
+from collections import OrderedDict
 from collections.abc import Awaitable, Callable
+import hashlib
 import json
 import re
-from typing import cast, final
+import threading
+from typing import NamedTuple, cast, final
+
+
+_NON_WORD_RE = re.compile(r"[^a-z0-9\s\u4e00-\u9fff\u3040-\u30ff\uac00-\ud7a3]")
+_SPACE_RE = re.compile(r"\s+")
+_CJK_RUN_RE = re.compile(r"[\u4e00-\u9fff]{2,}")
+_LATIN_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+_DEFAULT_MAX_ENTITIES = 50
 
 
 def normalize_text(text: str) -> str:
     """文本标准化：小写、去除特殊字符，保留中日韩字符"""
-    normalized = text.lower()
-    normalized = re.sub(r"[^a-z0-9\s\u4e00-\u9fff\u3040-\u30ff\uac00-\ud7a3]", " ", normalized)
-    normalized = re.sub(r"\s+", " ", normalized).strip()
-    return normalized
+    normalized = _NON_WORD_RE.sub(" ", text.lower())
+    return _SPACE_RE.sub(" ", normalized).strip()
 
 
-def extract_entities(text: str, max_entities: int = 50) -> list[str]:
-    """基于规则的实体提取
-    - 中文：连续2+个汉字 ([\u4e00-\u9fff]{2,})
-    - 英文：3+字符非纯数字 token
-    - 返回去重后的实体列表，最多 max_entities 个
-    """
-    if not text or max_entities <= 0:
-        return []
+class TextAnalysis(NamedTuple):
+    """一次分析的结果：标准化文本、空白切分的 token、实体（结果会被缓存共享，请勿修改）"""
+
+    normalized: str
+    tokens: tuple[str, ...]
+    entities: tuple[str, ...]
+
 
+_EMPTY_ANALYSIS = TextAnalysis("", (), ())
+
+
+def _analyze(text: str, max_entities: int) -> TextAnalysis:
     normalized = normalize_text(text)
     if not normalized:
-        return []
+        return _EMPTY_ANALYSIS
 
     entities: list[str] = []
     seen: set[str] = set()
-
-    def _push(entity: str) -> None:
-        if entity and entity not in seen and len(entities) < max_entities:
+    for entity in _CJK_RUN_RE.findall(normalized):
+        if len(entities) >= max_entities:
+            break
+        if entity not in seen:
             seen.add(entity)
             entities.append(entity)
+    for token in _LATIN_TOKEN_RE.findall(normalized):
+        if len(entities) >= max_entities:
+            break
+        if len(token) >= 3 and not token.isdigit() and token not in seen:
+            seen.add(token)
+            entities.append(token)
+    return TextAnalysis(normalized, tuple(normalized.split(" ")), tuple(entities))
+
+
+@final
+class _AnalysisMemo:
+    """按内容哈希缓存分析结果的有界 LRU（写入、检索与候选重算会反复分析相同文本）"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries: int = max(0, int(max_entries))
+        self._entries: OrderedDict[tuple[bytes, int], TextAnalysis] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def analyze(self, text: str, max_entities: int) -> TextAnalysis:
+        if self.max_entries <= 0:
+            return _analyze(text, max_entities)
+        key = (hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest(), max_entities)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+        result = _analyze(text, max_entities)
+        with self._lock:
+            self._entries[key] = result
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def resize(self, max_entries: int) -> None:
+        with self._lock:
+            self.max_entries = max(0, int(max_entries))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
 
-    for match in re.finditer(r"[\u4e00-\u9fff]{2,}", normalized):
-        _push(match.group(0))
 
-    for token_match in re.finditer(r"[a-z0-9]+", normalized):
-        token = token_match.group(0)
-        if len(token) >= 3 and not token.isdigit():
-            _push(token)
+_memo = _AnalysisMemo(4096)
 
-    return entities
+
+def configure_entity_cache(max_entries: int) -> None:
+    """设置实体提取缓存容量（0 关闭缓存）"""
+    _memo.resize(max_entries)
+
+
+def entity_cache_stats() -> dict[str, float]:
+    return _memo.stats()
+
+
+def analyze_text(text: str, max_entities: int = _DEFAULT_MAX_ENTITIES) -> TextAnalysis:
+    """单次扫描得到标准化文本、token 与实体，结果按内容哈希缓存"""
+    if not text or max_entities <= 0:
+        return _EMPTY_ANALYSIS
+    return _memo.analyze(text, max_entities)
+
+
+def extract_entities(text: str, max_entities: int = _DEFAULT_MAX_ENTITIES) -> list[str]:
+    """基于规则的实体提取
+    - 中文：连续2+个汉字 ([\u4e00-\u9fff]{2,})
+    - 英文：3+字符非纯数字 token
+    - 返回去重后的实体列表，最多 max_entities 个
+    """
+    return list(analyze_text(text, max_entities).entities)
+
+
+def extract_entities_batch(texts: list[str], max_entities: int = _DEFAULT_MAX_ENTITIES) -> list[TextAnalysis]:
+    """批量分析多段文本，返回与 texts 等长的结果；批内重复文本只分析一次"""
+    results: dict[str, TextAnalysis] = {}
+    for text in texts:
+        if text not in results:
+            results[text] = analyze_text(text, max_entities)
+    return [results[text] for text in texts]
 
 
 @final
@@ -100,19 +193,65 @@ async def extract_triples_with_llm(llm_invoke_fn: Callable[[str], Awaitable[str]
         payload_obj = cast(object, json.loads(json_text))
         if not isinstance(payload_obj, list):
             return []
-        payload_list = cast(list[object], payload_obj)
-
-        triples: list[Triple] = []
-        for item_obj in payload_list:
-            if not isinstance(item_obj, dict):
-                continue
-            item = cast(dict[str, object], item_obj)
-
-            subject = str(item.get("subject", "")).strip()
-            predicate = str(item.get("predicate", "")).strip()
-            obj = str(item.get("object", "")).strip()
-            if subject and predicate and obj:
-                triples.append(Triple(subject=subject, predicate=predicate, obj=obj))
-        return triples
+        return [triple for _, triple in _parse_triple_items(cast(list[object], payload_obj))]
     except Exception:
         return []
+
+
+def _parse_triple_items(payload_list: list[object]) -> list[tuple[int | None, Triple]]:
+    parsed: list[tuple[int | None, Triple]] = []
+    for item_obj in payload_list:
+        if not isinstance(item_obj, dict):
+            continue
+        item = cast(dict[str, object], item_obj)
+
+        subject = str(item.get("subject", "")).strip()
+        predicate = str(item.get("predicate", "")).strip()
+        obj = str(item.get("object", "")).strip()
+        if not (subject and predicate and obj):
+            continue
+        index: int | None = None
+        raw_index = item.get("passage")
+        if isinstance(raw_index, (int, str)) and str(raw_index).strip().isdigit():
+            index = int(str(raw_index).strip())
+        parsed.append((index, Triple(subject=subject, predicate=predicate, obj=obj)))
+    return parsed
+
+
+async def extract_triples_batch_with_llm(
+    llm_invoke_fn: Callable[[str], Awaitable[str]], texts: list[str]
+) -> list[list[Triple]] | None:
+    """一次 LLM 调用为多段文本抽取三元组
+    - 文本按 1..n 编号，要求每个三元组带 passage 编号
+    - 返回与 texts 等长的列表；调用或解析失败时返回 None（调用方据此决定是否重试/缓存）
+    """
+    if not texts:
+        return []
+
+    numbered = "\n".join(f"[{i}] {text}" for i, text in enumerate(texts, start=1))
+    prompt = (
+        "请从以下编号文本中分别抽取关系三元组，并仅返回 JSON 数组，不要输出任何额外说明。\n"
+        "格式必须是：[{\"passage\": 编号, \"subject\": \"...\", \"predicate\": \"...\", \"object\": \"...\"}]\n"
+        f"文本：\n{numbered}"
+    )
+
+    try:
+        response = await llm_invoke_fn(prompt)
+
+        json_text = _extract_json_text(response)
+        if not json_text:
+            return None
+
+        payload_obj = cast(object, json.loads(json_text))
+        if not isinstance(payload_obj, list):
+            return None
+    except Exception:
+        return None
+
+    results: list[list[Triple]] = [[] for _ in texts]
+    for index, triple in _parse_triple_items(cast(list[object], payload_obj)):
+        if index is None and len(texts) == 1:
+            index = 1
+        if index is not None and 1 <= index <= len(texts):
+            results[index - 1].append(triple)
+    return results
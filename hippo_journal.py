@@ -0,0 +1,139 @@
+"""HippoRAG 状态持久化：追加式操作日志（JSON Lines）+ 周期性快照压缩"""
+
+import json
+import os
+from pathlib import Path
+import shutil
+import threading
+from typing import IO, Any
+
+
+class HippoJournal:
+    """快照 + 预写日志
+
+    - 每次变更追加一行 {"seq": n, "op": ...}，写入成本只与单条变更大小有关；
+    - 压缩时先轮转日志（当前日志并入 .1），再把状态写入临时文件、fsync 后原子替换快照，最后删除 .1；
+    - 启动时读取快照及其记录的 seq，再按顺序重放 .1 与当前日志中 seq 更大的操作，
+      因此压缩中途崩溃也不会丢失或重复应用变更；进程崩溃留下的半行会被截掉。
+    """
+
+    def __init__(self, snapshot_path: Path, compact_every: int = 1000, fsync: bool = False):
+        self.snapshot_path: Path = snapshot_path
+        self.journal_path: Path = snapshot_path.with_name(snapshot_path.stem + ".journal.jsonl")
+        self.rotated_path: Path = snapshot_path.with_name(snapshot_path.stem + ".journal.jsonl.1")
+        self.compact_every: int = max(1, int(compact_every))
+        self.fsync: bool = fsync
+        self.seq: int = 0
+        # 最近一次快照之后追加的操作数
+        self.pending_ops: int = 0
+        self._handle: IO[str] | None = None
+        self._lock = threading.Lock()
+        self._compacting = False
+
+    def load(self) -> tuple[dict[str, Any] | None, list[dict[str, Any]]]:
+        """读取快照与其后的日志操作（按 seq 升序）"""
+        snapshot: dict[str, Any] | None = None
+        snapshot_seq = 0
+        if self.snapshot_path.exists():
+            data = json.loads(self.snapshot_path.read_text(encoding="utf-8"))
+            if isinstance(data, dict):
+                snapshot = data
+                try:
+                    snapshot_seq = int(data.get("seq", 0) or 0)
+                except (TypeError, ValueError):
+                    snapshot_seq = 0
+
+        ops = [
+            op
+            for path in (self.rotated_path, self.journal_path)
+            for op in self._read_journal(path)
+            if op["seq"] > snapshot_seq
+        ]
+        with self._lock:
+            self.seq = max([snapshot_seq, *(op["seq"] for op in ops)])
+            self.pending_ops = len(ops)
+        return snapshot, ops
+
+    @staticmethod
+    def _read_journal(path: Path) -> list[dict[str, Any]]:
+        if not path.exists():
+            return []
+        raw = path.read_bytes()
+        *lines, tail = raw.split(b"\n")
+        if tail:
+            # 最后一行没有换行符：写入时崩溃，截掉半行，后续追加从完整行之后开始
+            with open(path, "r+b") as f:
+                f.truncate(len(raw) - len(tail))
+
+        ops: list[dict[str, Any]] = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                op = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(op, dict) and isinstance(op.get("seq"), int):
+                ops.append(op)
+        return ops
+
+    def append(self, op: dict[str, Any]) -> bool:
+        """追加一条操作，返回是否已达到压缩阈值"""
+        with self._lock:
+            self.seq += 1
+            line = json.dumps({"seq": self.seq, **op}, ensure_ascii=False)
+            if self._handle is None:
+                self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+                self._handle = open(self.journal_path, "a", encoding="utf-8")
+            self._handle.write(line + "\n")
+            self._handle.flush()
+            if self.fsync:
+                os.fsync(self._handle.fileno())
+            self.pending_ops += 1
+            return self.pending_ops >= self.compact_every and not self._compacting
+
+    def rotate(self) -> int | None:
+        """开始一次压缩：轮转日志并返回快照应记录的 seq；已有压缩在进行时返回 None
+
+        调用方需持有状态锁，保证随后导出的状态恰好包含 seq 及之前的全部操作。
+        """
+        with self._lock:
+            if self._compacting:
+                return None
+            self._close_handle()
+            if self.journal_path.exists():
+                if self.rotated_path.exists():
+                    # 上次压缩失败遗留的 .1 尚未被快照覆盖，合并而不是覆盖
+                    with open(self.rotated_path, "ab") as dst, open(self.journal_path, "rb") as src:
+                        shutil.copyfileobj(src, dst)
+                    self.journal_path.unlink()
+                else:
+                    os.replace(self.journal_path, self.rotated_path)
+            self._compacting = True
+            self.pending_ops = 0
+            return self.seq
+
+    def write_snapshot(self, payload: dict[str, Any], seq: int) -> None:
+        """写入快照（临时文件 + 原子替换），成功后删除已被快照包含的轮转日志"""
+        try:
+            path = self.snapshot_path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(path.name + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({**payload, "seq": seq}, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            self.rotated_path.unlink(missing_ok=True)
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def _close_handle(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_handle()
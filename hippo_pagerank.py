@@ -1,19 +1,111 @@
-"""纯 Python Personalized PageRank 实现"""
+"""Personalized PageRank 实现：CSR 压缩快照 + NumPy 向量化迭代（无 NumPy 时退回纯 Python）"""
 
+import heapq
 import json
 import importlib
 from collections.abc import Iterable
-from collections import defaultdict
-from typing import cast
+from collections import OrderedDict, defaultdict, deque
+from operator import itemgetter
+from typing import Any, cast
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy 通常随 mem0 依赖安装
+    np = None
+
+
+# 权重低于此值视为浮点残差，边直接删除
+_EDGE_EPSILON = 1e-9
+
+PPR_METHOD_POWER = "power"
+PPR_METHOD_PUSH = "push"
+
+
+class _CompiledGraph:
+    """邻接表的只读快照：CSR 形式，转移权重已按出度归一化"""
+
+    __slots__ = ("version", "names", "index", "indptr", "indices", "weights", "dangling", "live", "arrays")
+
+    def __init__(
+        self,
+        version: int,
+        names: list[str],
+        index: dict[str, int],
+        indptr: list[int],
+        indices: list[int],
+        weights: list[float],
+        live: list[bool],
+    ):
+        self.version = version
+        self.names = names
+        self.index = index
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.dangling = [indptr[i] == indptr[i + 1] for i in range(len(names))]
+        self.live = live
+        # NumPy 可用时预先展开成 (src, dst, w) 三个数组，迭代中用 bincount 完成稀疏矩阵乘
+        self.arrays: tuple[Any, Any, Any, Any] | None = None
+        if np is not None and names:
+            counts = np.diff(np.asarray(indptr, dtype=np.int64))
+            self.arrays = (
+                np.repeat(np.arange(len(names), dtype=np.int64), counts),
+                np.asarray(indices, dtype=np.int64),
+                np.asarray(weights, dtype=np.float64),
+                np.asarray(self.dangling, dtype=bool),
+            )
 
 
 class HippoGraphIndex:
-    """知识图谱索引，支持 PPR 检索"""
+    """知识图谱索引，支持 PPR 检索
 
-    def __init__(self):
+    PPR 不直接遍历 dict-of-dicts：首次查询时把邻接表编译成 CSR 快照，之后只在图变更后重编译，
+    且只重新归一化变更过的行；节点编号只增不减，未变更行的缓存可以直接复用。
+    PPR 结果按 (种子集合, alpha, 迭代参数, 图版本) 缓存，只保留前 N 个分数；图一变更旧结果整体失效。
+    """
+
+    def __init__(self, ppr_cache_size: int = 128, ppr_cache_top_n: int = 512):
         self.adj: dict[str, dict[str, float]] = defaultdict(dict)
         self.postings: dict[str, set[str]] = defaultdict(set)
         self.passage_entities: dict[str, list[str]] = {}
+        # LLM 抽取的关系三元组：passage_id -> (边权, [(subject, predicate, object)])
+        self.passage_relations: dict[str, tuple[float, list[tuple[str, str, str]]]] = {}
+        # 无向实体对 -> {谓词: 引用次数}
+        self.relation_types: dict[tuple[str, str], dict[str, int]] = {}
+
+        self._version = 0
+        self._compiled: _CompiledGraph | None = None
+        self._node_ids: dict[str, int] = {}
+        self._node_names: list[str] = []
+        self._row_cache: dict[int, tuple[list[int], list[float]]] = {}
+        self._dirty_rows: set[str] = set()
+
+        self._ppr_cache: OrderedDict[tuple[Any, ...], dict[str, float]] = OrderedDict()
+        self._ppr_cache_version = 0
+        self._ppr_cache_size = 0
+        self._ppr_cache_top_n = 0
+        self._ppr_cache_stats: dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        self.configure_ppr_cache(ppr_cache_size, ppr_cache_top_n)
+
+    @property
+    def version(self) -> int:
+        """图版本：共现边每次增删都会递增"""
+        return self._version
+
+    def configure_ppr_cache(self, max_entries: int, top_n: int) -> None:
+        """设置 PPR 结果缓存容量（0 关闭缓存）与每条结果保留的分数个数（0 不截断）"""
+        self._ppr_cache_size = max(0, int(max_entries))
+        self._ppr_cache_top_n = max(0, int(top_n))
+        self._ppr_cache.clear()
+
+    def ppr_cache_stats(self) -> dict[str, float]:
+        hits = self._ppr_cache_stats["hits"]
+        lookups = hits + self._ppr_cache_stats["misses"]
+        return {
+            **self._ppr_cache_stats,
+            "entries": len(self._ppr_cache),
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
 
     @staticmethod
     def _extract_entities(content: str) -> list[str]:
@@ -44,6 +136,88 @@ class HippoGraphIndex:
 
         self.adj[a][b] = self.adj[a].get(b, 0.0) + w
         self.adj[b][a] = self.adj[b].get(a, 0.0) + w
+        self._mark_dirty(a, b)
+
+    def remove_edge(self, entity_a: str, entity_b: str, weight: float = 1.0):
+        """扣减无向边权重（add_edge 的逆操作）；权重归零的边与不再有邻居的实体一并删除"""
+        a = (entity_a or "").strip()
+        b = (entity_b or "").strip()
+        if not a or not b or a == b:
+            return
+
+        w = float(weight)
+        if w <= 0:
+            return
+
+        for src, dst in ((a, b), (b, a)):
+            neighbors = self.adj.get(src)
+            if neighbors is None or dst not in neighbors:
+                continue
+            remaining = neighbors[dst] - w
+            if remaining > _EDGE_EPSILON:
+                neighbors[dst] = remaining
+            else:
+                del neighbors[dst]
+            if not neighbors:
+                del self.adj[src]
+        self._mark_dirty(a, b)
+
+    def _mark_dirty(self, *nodes: str) -> None:
+        self._version += 1
+        self._dirty_rows.update(nodes)
+
+    def _node_id(self, name: str) -> int:
+        node_id = self._node_ids.get(name)
+        if node_id is None:
+            node_id = len(self._node_names)
+            self._node_ids[name] = node_id
+            self._node_names.append(name)
+        return node_id
+
+    def _compile(self) -> _CompiledGraph:
+        """返回与当前图版本一致的 CSR 快照，必要时增量重建"""
+        compiled = self._compiled
+        if compiled is not None and compiled.version == self._version:
+            return compiled
+
+        if compiled is None or len(self._node_names) > 2 * max(16, len(self.adj)):
+            # 首次编译（含直接写 adj 的加载路径）或失效编号过多时全量重建
+            self._node_ids = {}
+            self._node_names = []
+            self._row_cache = {}
+            dirty: Iterable[str] = list(self.adj.keys())
+        else:
+            dirty = self._dirty_rows
+
+        for name in list(self.adj.keys()):
+            self._node_id(name)
+        for name in dirty:
+            node_id = self._node_id(name)
+            neighbors = self.adj.get(name)
+            total = sum(neighbors.values()) if neighbors else 0.0
+            if neighbors is None or total <= 0:
+                self._row_cache.pop(node_id, None)
+                continue
+            self._row_cache[node_id] = (
+                [self._node_id(nbr) for nbr in neighbors],
+                [w / total for w in neighbors.values()],
+            )
+        self._dirty_rows = set()
+
+        names = list(self._node_names)
+        indptr = [0]
+        indices: list[int] = []
+        weights: list[float] = []
+        for node_id in range(len(names)):
+            row = self._row_cache.get(node_id)
+            if row is not None:
+                indices.extend(row[0])
+                weights.extend(row[1])
+            indptr.append(len(indices))
+        live = [name in self.adj for name in names]
+
+        self._compiled = _CompiledGraph(self._version, names, dict(self._node_ids), indptr, indices, weights, live)
+        return self._compiled
 
     def add_memory(self, content: str, passage_id: str, entities: list[str] | None = None):
         """添加记忆到图
@@ -71,11 +245,16 @@ class HippoGraphIndex:
                 self.add_edge(unique_entities[i], unique_entities[j], weight=1.0)
 
     def remove_memory(self, passage_id: str):
-        """移除记忆：清理 postings 和 passage_entities"""
+        """移除记忆：清理 postings 和 passage_entities，并扣减该记忆贡献的共现边
+
+        passage_entities 记录了每条记忆写入时的实体列表，add_memory 为其中每对实体各加 1.0，
+        这里按同样的实体对各减 1.0，因此删除恰好抵消插入，孤立实体随之消失。
+        """
         pid = (passage_id or "").strip()
         if not pid:
             return
 
+        self._remove_relations(pid)
         entities = self.passage_entities.pop(pid, [])
         for entity in entities:
             posting = self.postings.get(entity)
@@ -85,77 +264,282 @@ class HippoGraphIndex:
             if not posting:
                 _ = self.postings.pop(entity, None)
 
-    def ppr(self, seed_entities: list[str], alpha: float = 0.15, max_iter: int = 20) -> dict[str, float]:
-        """Personalized PageRank
-        - 收集所有节点
-        - teleport 均匀分布在种子上
-        - power iteration
-        - dangling node 处理
-        - 归一化
+        n = len(entities)
+        for i in range(n):
+            for j in range(i + 1, n):
+                self.remove_edge(entities[i], entities[j], weight=1.0)
+
+    def add_relations(self, passage_id: str, triples: list[tuple[str, str, str]], weight: float = 1.0):
+        """为已有记忆写入关系三元组：subject/object 之间加带类型的加权边，并把两端实体挂到该记忆的倒排
+
+        重复调用会先撤销该记忆上一次写入的关系，因此日志重放是幂等的；remove_memory 会一并撤销。
         """
-        nodes: set[str] = set(self.adj.keys())
-        for src, neighbors in self.adj.items():
-            nodes.add(src)
-            nodes.update(neighbors.keys())
+        pid = (passage_id or "").strip()
+        if not pid or pid not in self.passage_entities:
+            return
 
-        clean_seeds = [s.strip() for s in seed_entities if s.strip()]
-        for seed in clean_seeds:
-            nodes.add(seed)
+        self._remove_relations(pid)
+        w = float(weight)
+        clean: list[tuple[str, str, str]] = []
+        for subject, predicate, obj in triples:
+            a, p, b = str(subject).strip(), str(predicate).strip(), str(obj).strip()
+            if not a or not p or not b or a == b:
+                continue
+            clean.append((a, p, b))
+            self.add_edge(a, b, weight=w)
+            types = self.relation_types.setdefault((min(a, b), max(a, b)), {})
+            types[p] = types.get(p, 0) + 1
+            self.postings[a].add(pid)
+            self.postings[b].add(pid)
+        if clean:
+            self.passage_relations[pid] = (w, clean)
+
+    def _remove_relations(self, pid: str) -> None:
+        entry = self.passage_relations.pop(pid, None)
+        if entry is None:
+            return
+        weight, triples = entry
+        keep = set(self.passage_entities.get(pid, ()))
+        for a, predicate, b in triples:
+            self.remove_edge(a, b, weight=weight)
+            pair = (min(a, b), max(a, b))
+            types = self.relation_types.get(pair)
+            if types is not None:
+                remaining = types.get(predicate, 0) - 1
+                if remaining > 0:
+                    types[predicate] = remaining
+                else:
+                    types.pop(predicate, None)
+                if not types:
+                    del self.relation_types[pair]
+            for entity in (a, b):
+                if entity in keep:
+                    continue
+                posting = self.postings.get(entity)
+                if posting is not None:
+                    posting.discard(pid)
+                    if not posting:
+                        _ = self.postings.pop(entity, None)
 
-        if not nodes:
-            return {}
+    def relations_between(self, entity_a: str, entity_b: str) -> dict[str, int]:
+        """两实体之间的关系类型及其引用次数（无向）"""
+        a, b = (entity_a or "").strip(), (entity_b or "").strip()
+        return dict(self.relation_types.get((min(a, b), max(a, b)), {}))
+
+    @classmethod
+    def from_passages(cls, passage_entities: dict[str, list[str]], **kwargs: Any) -> "HippoGraphIndex":
+        """由 passage_entities 重建整张图（共现边完全由记忆推导，可修正历史遗留的残留边）"""
+        idx = cls(**kwargs)
+        for pid, entities in passage_entities.items():
+            idx.add_memory("", passage_id=pid, entities=entities)
+        return idx
 
-        node_list = list(nodes)
-        n_nodes = len(node_list)
+    def ppr(
+        self,
+        seed_entities: list[str],
+        alpha: float = 0.15,
+        max_iter: int = 20,
+        tol: float = 1e-6,
+        method: str = PPR_METHOD_POWER,
+        epsilon: float = 1e-4,
+    ) -> dict[str, float]:
+        """Personalized PageRank
+        - teleport 均匀分布在种子上（无种子时均匀分布在全图）
+        - method="power"：power iteration，相邻两轮 L1 差值小于 tol 时提前停止
+        - method="push"：前向推送近似（Andersen–Chung–Lang），只访问种子附近残差不小于 epsilon×度 的节点
+        - dangling node 的质量按 teleport 分布回流
+        - 只返回非零分数（power 结果归一化，push 结果为下界估计）；启用缓存时只返回前 N 个（命中与否结果一致）
+        """
+        clean_seeds = list(dict.fromkeys(s.strip() for s in seed_entities if s and s.strip()))
+        use_push = method == PPR_METHOD_PUSH and bool(clean_seeds) and float(alpha) > 0
+        epsilon = max(1e-12, float(epsilon))
+        if self._ppr_cache_size <= 0:
+            if use_push:
+                return self._push_ppr(clean_seeds, alpha, epsilon)
+            return self._compute_ppr(clean_seeds, alpha, max_iter, tol)
+
+        if self._ppr_cache_version != self._version:
+            if self._ppr_cache:
+                self._ppr_cache_stats["invalidations"] += 1
+                self._ppr_cache.clear()
+            self._ppr_cache_version = self._version
+
+        if use_push:
+            key: tuple[Any, ...] = (frozenset(clean_seeds), round(float(alpha), 6), PPR_METHOD_PUSH, epsilon)
+        else:
+            key = (frozenset(clean_seeds), round(float(alpha), 6), int(max_iter), float(tol))
+        cached = self._ppr_cache.get(key)
+        if cached is not None:
+            self._ppr_cache.move_to_end(key)
+            self._ppr_cache_stats["hits"] += 1
+            return dict(cached)
+
+        self._ppr_cache_stats["misses"] += 1
+        if use_push:
+            scores = self._push_ppr(clean_seeds, alpha, epsilon)
+        else:
+            scores = self._compute_ppr(clean_seeds, alpha, max_iter, tol)
+        if self._ppr_cache_top_n and len(scores) > self._ppr_cache_top_n:
+            scores = dict(heapq.nlargest(self._ppr_cache_top_n, scores.items(), key=itemgetter(1)))
+        self._ppr_cache[key] = scores
+        while len(self._ppr_cache) > self._ppr_cache_size:
+            self._ppr_cache.popitem(last=False)
+            self._ppr_cache_stats["evictions"] += 1
+        return dict(scores)
+
+    def _compute_ppr(self, clean_seeds: list[str], alpha: float, max_iter: int, tol: float) -> dict[str, float]:
+        compiled = self._compile()
+        # 不在图中的种子作为孤立节点追加在快照之后
+        extra_seeds = [s for s in clean_seeds if s not in compiled.index or not compiled.live[compiled.index[s]]]
+        n_graph = len(compiled.names)
+        n_total = n_graph + len(extra_seeds)
+        if n_total == 0:
+            return {}
 
+        teleport_ids: list[int] = []
+        extra_pos = {name: n_graph + i for i, name in enumerate(extra_seeds)}
         if clean_seeds:
-            seed_set = set(clean_seeds)
-            teleport = {node: (1.0 / len(seed_set) if node in seed_set else 0.0) for node in node_list}
+            teleport_ids = [extra_pos[s] if s in extra_pos else compiled.index[s] for s in clean_seeds]
         else:
-            teleport = {node: 1.0 / n_nodes for node in node_list}
+            teleport_ids = [i for i, alive in enumerate(compiled.live) if alive]
+        if not teleport_ids:
+            return {}
 
-        rank = dict(teleport)
+        alpha = max(0.0, min(1.0, float(alpha)))
+        max_iter = max(1, int(max_iter))
+        tol = max(0.0, float(tol))
 
-        alpha = float(alpha)
-        if alpha < 0:
-            alpha = 0.0
-        if alpha > 1:
-            alpha = 1.0
+        if compiled.arrays is not None:
+            rank_pairs = self._ppr_numpy(compiled, n_total, teleport_ids, alpha, max_iter, tol)
+        else:
+            rank_pairs = self._ppr_python(compiled, n_total, teleport_ids, alpha, max_iter, tol)
 
-        max_iter = max(1, int(max_iter))
+        names = compiled.names + extra_seeds
+        total = sum(v for _, v in rank_pairs)
+        if total <= 0:
+            return {}
+        return {names[i]: v / total for i, v in rank_pairs}
 
-        for _ in range(max_iter):
-            next_rank = {node: alpha * teleport[node] for node in node_list}
-            dangling_mass = 0.0
+    def _push_ppr(self, clean_seeds: list[str], alpha: float, epsilon: float) -> dict[str, float]:
+        """前向推送近似 PPR：直接在邻接表上推送残差，工作量约为 O(1 / (epsilon × alpha))，与图规模无关
 
-            for node in node_list:
-                neighbors = self.adj.get(node, {})
-                total_weight = sum(neighbors.values())
-                if total_weight <= 0:
-                    dangling_mass += rank.get(node, 0.0)
-                    continue
+        节点 u 的残差 r(u) ≥ epsilon × deg(u) 时推送：alpha × r(u) 计入估计值，其余按边权分给邻居；
+        结束时每个节点的误差不超过 epsilon × deg(u)，总误差等于剩余残差质量。
+        没有邻居的节点（如图中不存在的种子）与 power iteration 一致，把这部分质量交回种子。
+        """
+        alpha = max(0.0, min(1.0, float(alpha)))
+        share = 1.0 / len(clean_seeds)
+        residual: dict[str, float] = dict.fromkeys(clean_seeds, share)
+        estimate: dict[str, float] = defaultdict(float)
+        queue = deque(clean_seeds)
+        queued = set(clean_seeds)
+        budget = int(len(clean_seeds) + 4.0 / (epsilon * alpha))
+
+        def _threshold(node: str) -> float:
+            return epsilon * (len(self.adj.get(node) or ()) or 1)
+
+        while queue and budget > 0:
+            node = queue.popleft()
+            queued.discard(node)
+            mass = residual.get(node, 0.0)
+            if mass < _threshold(node):
+                continue
+            budget -= 1
+            residual[node] = 0.0
+            estimate[node] += alpha * mass
+            spread = (1.0 - alpha) * mass
+            neighbors = self.adj.get(node)
+            if neighbors:
+                total = sum(neighbors.values())
+                targets = [(nbr, spread * w / total) for nbr, w in neighbors.items()]
+            else:
+                targets = [(seed, spread * share) for seed in clean_seeds]
+            for nbr, amount in targets:
+                value = residual.get(nbr, 0.0) + amount
+                residual[nbr] = value
+                if nbr not in queued and value >= _threshold(nbr):
+                    queue.append(nbr)
+                    queued.add(nbr)
+
+        # 估计值是精确 PPR 的逐点下界，不做归一化：未推送的残差集中在种子附近，归一化会放大种子分数
+        return {node: value for node, value in estimate.items() if value > 0}
 
-                distribute = (1.0 - alpha) * rank.get(node, 0.0)
-                for nbr, w in neighbors.items():
-                    next_rank[nbr] = next_rank.get(nbr, 0.0) + distribute * (w / total_weight)
+    @staticmethod
+    def _ppr_numpy(
+        compiled: _CompiledGraph,
+        n_total: int,
+        teleport_ids: list[int],
+        alpha: float,
+        max_iter: int,
+        tol: float,
+    ) -> list[tuple[int, float]]:
+        assert np is not None and compiled.arrays is not None
+        edge_src, edge_dst, edge_w, dangling_graph = compiled.arrays
+        dangling = np.ones(n_total, dtype=bool)
+        dangling[: len(dangling_graph)] = dangling_graph
+
+        teleport = np.zeros(n_total, dtype=np.float64)
+        teleport[np.asarray(teleport_ids, dtype=np.int64)] = 1.0 / len(teleport_ids)
+        rank = teleport.copy()
+        for _ in range(max_iter):
+            spread = np.bincount(edge_dst, weights=rank[edge_src] * edge_w, minlength=n_total)
+            dangling_mass = float(rank[dangling].sum())
+            next_rank = (1.0 - alpha) * spread + (alpha + (1.0 - alpha) * dangling_mass) * teleport
+            delta = float(np.abs(next_rank - rank).sum())
+            rank = next_rank
+            if delta < tol:
+                break
 
-            if dangling_mass > 0:
-                for node in node_list:
-                    next_rank[node] = next_rank.get(node, 0.0) + (1.0 - alpha) * dangling_mass * teleport[node]
+        nonzero = np.flatnonzero(rank > 0)
+        return list(zip(nonzero.tolist(), rank[nonzero].tolist()))
 
+    @staticmethod
+    def _ppr_python(
+        compiled: _CompiledGraph,
+        n_total: int,
+        teleport_ids: list[int],
+        alpha: float,
+        max_iter: int,
+        tol: float,
+    ) -> list[tuple[int, float]]:
+        n_graph = len(compiled.names)
+        indptr, indices, weights = compiled.indptr, compiled.indices, compiled.weights
+        dangling = compiled.dangling + [True] * (n_total - n_graph)
+
+        share = 1.0 / len(teleport_ids)
+        teleport = [0.0] * n_total
+        for i in teleport_ids:
+            teleport[i] = share
+        rank = list(teleport)
+        for _ in range(max_iter):
+            next_rank = [0.0] * n_total
+            dangling_mass = 0.0
+            for i in range(n_total):
+                mass = rank[i]
+                if mass <= 0:
+                    continue
+                if dangling[i]:
+                    dangling_mass += mass
+                    continue
+                mass *= 1.0 - alpha
+                for k in range(indptr[i], indptr[i + 1]):
+                    next_rank[indices[k]] += mass * weights[k]
+            restart = alpha + (1.0 - alpha) * dangling_mass
+            for i in teleport_ids:
+                next_rank[i] += restart * teleport[i]
+            delta = sum(abs(a - b) for a, b in zip(next_rank, rank))
             rank = next_rank
+            if delta < tol:
+                break
 
-        total = sum(rank.values())
-        if total > 0:
-            rank = {k: v / total for k, v in rank.items()}
-        return rank
+        return [(i, v) for i, v in enumerate(rank) if v > 0]
 
     def get_candidates_by_ppr(self, ppr_scores: dict[str, float], top_entities: int = 10, max_candidates: int = 200) -> set[str]:
         """通过 PPR 高分实体获取候选 passage_ids"""
         if not ppr_scores or top_entities <= 0 or max_candidates <= 0:
             return set()
 
-        ranked_entities = sorted(ppr_scores.items(), key=lambda item: item[1], reverse=True)[:top_entities]
+        ranked_entities = heapq.nlargest(top_entities, ppr_scores.items(), key=itemgetter(1))
         candidates: set[str] = set()
         for entity, _ in ranked_entities:
             for pid in self.postings.get(entity, set()):
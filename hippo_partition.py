@@ -0,0 +1,359 @@
+"""HippoRAG 分区状态：每个记忆作用域独立的图与别名索引，各自持久化；正文存放在共享的 SQLite 正文库"""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+import hashlib
+from pathlib import Path
+from typing import Any
+
+from .hippo_alias_merge import EntityAliasIndex
+from .hippo_journal import HippoJournal
+from .hippo_pagerank import HippoGraphIndex
+from .hippo_passage_store import HippoPassageStore, PassageStoreView
+from .mem0_executor import PRIORITY_MAINTENANCE, get_mem0_executor
+
+ScopeKey = tuple[str | None, str | None, str | None]
+
+DEFAULT_PARTITION = "default"
+
+
+def partition_id_for(scope: ScopeKey) -> str:
+    """作用域 (user_id, agent_id, run_id) 对应的分区 id；无作用域时为 default"""
+    if not any(scope):
+        return DEFAULT_PARTITION
+    raw = "|".join(value or "" for value in scope)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def passage_cost(entities: list[str]) -> int:
+    """粗略估算一条记忆常驻内存的字节数（实体、倒排与共现边；正文在正文库中不计入）"""
+    n = len(entities)
+    return 200 + 120 * n + 200 * n * max(0, n - 1)
+
+
+def _submit_snapshot(journal: HippoJournal, payload: dict[str, Any], seq: int) -> Future | None:
+    try:
+        return get_mem0_executor().submit(PRIORITY_MAINTENANCE, journal.write_snapshot, payload, seq)
+    except RuntimeError:
+        # 线程池已关闭（插件卸载中），直接同步写入
+        journal.write_snapshot(payload, seq)
+        return None
+
+
+def _triples_from_payload(raw: Any) -> list[tuple[str, str, str]]:
+    if not isinstance(raw, list):
+        return []
+    return [(str(t[0]), str(t[1]), str(t[2])) for t in raw if isinstance(t, (list, tuple)) and len(t) == 3]
+
+
+class _JournaledState(ABC):
+    """追加日志 + 后台快照压缩的公共流程；除 release 外所有方法由调用方持有引擎锁后调用"""
+
+    def __init__(self, snapshot_path: Path, compact_every: int):
+        self.journal = HippoJournal(snapshot_path, compact_every=compact_every)
+        self.compaction: Future | None = None
+
+    @abstractmethod
+    def snapshot_payload(self) -> dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def apply_snapshot(self, data: dict[str, Any]) -> None:
+        pass
+
+    @abstractmethod
+    def replay(self, op: dict[str, Any]) -> None:
+        pass
+
+    def load(self) -> None:
+        try:
+            snapshot, ops = self.journal.load()
+        except Exception:
+            return
+        if snapshot is not None:
+            self.apply_snapshot(snapshot)
+        for op in ops:
+            self.replay(op)
+        self.after_load()
+
+    def after_load(self) -> None:
+        return None
+
+    def record(self, op: dict[str, Any]) -> None:
+        """追加日志；达到阈值时轮转日志并把快照写入交给后台维护线程"""
+        if not self.journal.append(op):
+            return
+        seq = self.journal.rotate()
+        if seq is not None:
+            self.compaction = _submit_snapshot(self.journal, self.snapshot_payload(), seq)
+
+    def wait_compaction(self, timeout: float = 30.0) -> None:
+        compaction = self.compaction
+        if compaction is None:
+            return
+        try:
+            compaction.result(timeout=timeout)
+        except Exception:
+            pass
+
+    def release(self) -> None:
+        """分区摘除后在锁外调用：等待进行中的压缩，关闭日志句柄；未压缩的日志留在磁盘，下次加载时重放"""
+        self.wait_compaction()
+        self.journal.close()
+
+    def close(self) -> None:
+        """卸载时调用：把剩余日志压缩进快照"""
+        self.wait_compaction()
+        if self.journal.pending_ops > 0:
+            seq = self.journal.rotate()
+            if seq is not None:
+                self.journal.write_snapshot(self.snapshot_payload(), seq)
+        self.journal.close()
+
+
+class HippoPartition(_JournaledState):
+    """单个作用域的 Hippo 状态
+
+    图与别名索引常驻内存并由日志/快照持久化；正文写入 passage_store（未传入时在快照旁单独建库），
+    memory_store 是该分区在正文库中的视图，检索时按需批量读取。
+    """
+
+    def __init__(
+        self,
+        partition_id: str,
+        snapshot_path: Path,
+        compact_every: int = 1000,
+        graph_options: dict[str, Any] | None = None,
+        passage_store: HippoPassageStore | None = None,
+    ):
+        super().__init__(snapshot_path, compact_every)
+        self.partition_id = partition_id
+        self.graph_options: dict[str, Any] = dict(graph_options or {})
+        self.graph = HippoGraphIndex(**self.graph_options)
+        self.alias_index = EntityAliasIndex(threshold=0.85)
+        self._owns_store = passage_store is None
+        if passage_store is None:
+            passage_store = HippoPassageStore(snapshot_path.with_name(snapshot_path.stem + ".passages.sqlite3"))
+        self.memory_store = PassageStoreView(passage_store, partition_id)
+        self.approx_bytes = 0
+        self._migrated_store = False
+
+    @property
+    def alias_map(self) -> dict[str, str]:
+        return self.alias_index.mapping()
+
+    def normalize_entities(self, entities: list[str]) -> list[str]:
+        """写入路径：新实体并入别名索引（只与 LSH 同桶实体比较），再映射到代表实体"""
+        clean_entities = [str(entity).strip() for entity in entities if str(entity).strip()]
+        for entity in clean_entities:
+            self.alias_index.add(entity)
+        return self.alias_index.canonicalize(clean_entities)
+
+    def canonical_entities(self, entities: list[str]) -> list[str]:
+        """检索路径：只读映射，不修改别名索引"""
+        clean_entities = [str(entity).strip() for entity in entities if str(entity).strip()]
+        return self.alias_index.canonicalize(clean_entities)
+
+    def add(self, passage_id: str, content: str, entities: list[str], raw_entities: list[str]) -> None:
+        self.apply_add(passage_id, content, entities)
+        self.record(
+            {
+                "op": "add",
+                "pid": passage_id,
+                "entities": entities,
+                "raw_entities": raw_entities,
+            }
+        )
+
+    def remove(self, passage_id: str) -> bool:
+        if passage_id not in self.graph.passage_entities:
+            return False
+        self.apply_remove(passage_id)
+        self.record({"op": "remove", "pid": passage_id})
+        return True
+
+    def add_relations(self, passage_id: str, triples: list[tuple[str, str, str]], weight: float) -> int:
+        """写入 LLM 抽取的关系三元组（两端实体先经别名归一），返回实际写入的条数"""
+        if passage_id not in self.graph.passage_entities:
+            return 0
+        normalized: list[tuple[str, str, str]] = []
+        for subject, predicate, obj in triples:
+            ends = self.normalize_entities([subject, obj])
+            if len(ends) == 2 and str(predicate).strip():
+                normalized.append((ends[0], str(predicate).strip(), ends[1]))
+        if not normalized:
+            return 0
+        self.graph.add_relations(passage_id, normalized, weight=weight)
+        self.record(
+            {
+                "op": "relations",
+                "pid": passage_id,
+                "weight": weight,
+                "triples": [list(triple) for triple in normalized],
+                "raw_entities": sorted({str(e).strip() for t in triples for e in (t[0], t[2]) if str(e).strip()}),
+            }
+        )
+        return len(normalized)
+
+    def apply_add(self, passage_id: str, content: str | None, entities: list[str]) -> None:
+        """content 为 None 时只重建图（日志重放：正文已在正文库中）"""
+        self._forget(passage_id)
+        if content is not None:
+            self.memory_store.put(passage_id, content, entities)
+        self.graph.add_memory("", passage_id=passage_id, entities=entities)
+        self.approx_bytes += passage_cost(entities)
+
+    def apply_remove(self, passage_id: str) -> None:
+        self._forget(passage_id)
+        self.memory_store.delete([passage_id])
+
+    def _forget(self, passage_id: str) -> None:
+        entities = self.graph.passage_entities.get(passage_id)
+        if entities is None:
+            return
+        self.approx_bytes -= passage_cost(entities)
+        self.graph.remove_memory(passage_id)
+
+    def apply_snapshot(self, data: dict[str, Any]) -> None:
+        try:
+            graph_payload = data.get("graph")
+            if isinstance(graph_payload, dict):
+                # 共现边与倒排都由 passage_entities 推导；按记忆重建可清除旧版本删除记忆后残留的边
+                passage_entities = graph_payload.get("passage_entities", {})
+                restored: dict[str, list[str]] = {}
+                if isinstance(passage_entities, dict):
+                    for pid, entities in passage_entities.items():
+                        if isinstance(entities, list):
+                            restored[str(pid)] = [str(e) for e in entities]
+
+                self.graph = HippoGraphIndex.from_passages(restored, **self.graph_options)
+                passage_relations = graph_payload.get("passage_relations", {})
+                if isinstance(passage_relations, dict):
+                    for pid, entry in passage_relations.items():
+                        if isinstance(entry, dict):
+                            self.graph.add_relations(
+                                str(pid), _triples_from_payload(entry.get("triples")), float(entry.get("weight", 1.0))
+                            )
+
+            alias_map = data.get("alias_map", {})
+            if isinstance(alias_map, dict):
+                self.alias_index = EntityAliasIndex.from_alias_map(
+                    {str(k): str(v) for k, v in alias_map.items()}, threshold=0.85
+                )
+
+            memory_store = data.get("memory_store")
+            if isinstance(memory_store, dict):
+                # 旧版快照内嵌正文：迁移到正文库，下次压缩后快照不再包含正文
+                self.memory_store.put_many(
+                    (
+                        str(pid),
+                        str(record.get("content", "")),
+                        [str(e) for e in record.get("entities", []) if str(e).strip()],
+                    )
+                    for pid, record in memory_store.items()
+                    if isinstance(record, dict)
+                )
+                self._migrated_store = True
+        except Exception:
+            pass
+        self.approx_bytes = sum(passage_cost(entities) for entities in self.graph.passage_entities.values())
+
+    def after_load(self) -> None:
+        """对齐图与正文库：正文先于日志提交，崩溃可能留下一侧多出的记忆"""
+        stored = set(self.memory_store)
+        orphans = stored.difference(self.graph.passage_entities)
+        if orphans:
+            self.memory_store.delete(orphans)
+        for pid in [pid for pid in self.graph.passage_entities if pid not in stored]:
+            self._forget(pid)
+        if self._migrated_store:
+            self._migrated_store = False
+            seq = self.journal.rotate()
+            if seq is not None:
+                self.journal.write_snapshot(self.snapshot_payload(), seq)
+
+    def release(self) -> None:
+        super().release()
+        if self._owns_store:
+            self.memory_store.store.close()
+
+    def close(self) -> None:
+        super().close()
+        if self._owns_store:
+            self.memory_store.store.close()
+
+    def replay(self, op: dict[str, Any]) -> None:
+        pid = str(op.get("pid") or "")
+        if not pid:
+            return
+        if op.get("op") == "add":
+            for entity in op.get("raw_entities") or []:
+                self.alias_index.add(str(entity))
+            entities = [str(e) for e in op.get("entities") or [] if str(e).strip()]
+            # 旧版日志携带正文，新版正文只写正文库
+            content = op.get("content")
+            self.apply_add(pid, str(content) if content is not None else None, entities)
+        elif op.get("op") == "remove":
+            self.apply_remove(pid)
+        elif op.get("op") == "relations":
+            for entity in op.get("raw_entities") or []:
+                self.alias_index.add(str(entity))
+            self.graph.add_relations(pid, _triples_from_payload(op.get("triples")), float(op.get("weight", 1.0)))
+
+    def snapshot_payload(self) -> dict[str, Any]:
+        """导出快照内容：只复制容器，序列化在锁外进行
+
+        共现边与倒排可由 passage_entities（及 passage_relations）重建，快照中不再保存；正文在正文库中。
+        """
+        return {
+            "graph": {
+                "passage_entities": {
+                    pid: list(entities) for pid, entities in self.graph.passage_entities.items()
+                },
+                "passage_relations": {
+                    pid: {"weight": weight, "triples": [list(triple) for triple in triples]}
+                    for pid, (weight, triples) in self.graph.passage_relations.items()
+                },
+            },
+            "alias_map": self.alias_index.mapping(),
+        }
+
+
+class HippoPassageDirectory(_JournaledState):
+    """passage_id -> 分区 id 的目录，删除记忆时无需加载所有分区即可定位"""
+
+    def __init__(self, snapshot_path: Path, compact_every: int = 1000):
+        super().__init__(snapshot_path, compact_every)
+        self.passages: dict[str, str] = {}
+
+    def get(self, passage_id: str) -> str | None:
+        return self.passages.get(passage_id)
+
+    def set(self, passage_id: str, partition_id: str) -> None:
+        if self.passages.get(passage_id) == partition_id:
+            return
+        self.passages[passage_id] = partition_id
+        self.record({"op": "add", "pid": passage_id, "partition": partition_id})
+
+    def discard(self, passage_id: str) -> None:
+        if self.passages.pop(passage_id, None) is not None:
+            self.record({"op": "remove", "pid": passage_id})
+
+    def apply_snapshot(self, data: dict[str, Any]) -> None:
+        passages = data.get("passages", {})
+        if isinstance(passages, dict):
+            self.passages = {str(pid): str(partition) for pid, partition in passages.items()}
+
+    def replay(self, op: dict[str, Any]) -> None:
+        pid = str(op.get("pid") or "")
+        if not pid:
+            return
+        if op.get("op") == "add" and op.get("partition"):
+            self.passages[pid] = str(op["partition"])
+        elif op.get("op") == "remove":
+            self.passages.pop(pid, None)
+
+    def snapshot_payload(self) -> dict[str, Any]:
+        return {"passages": dict(self.passages)}
@@ -0,0 +1,136 @@
+"""HippoRAG 记忆正文存储：SQLite 按 (分区, passage_id) 索引，检索时只加载需要返回的记忆"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+import json
+from pathlib import Path
+import sqlite3
+import threading
+from typing import Any
+
+# 单条 IN 查询的参数上限（SQLite 默认 999）
+_IN_CHUNK = 500
+
+
+class HippoPassageStore:
+    """一个 memory_id 的全部分区共用一个数据库文件
+
+    正文不再常驻内存，也不写入 JSON 快照；图状态（实体、边）仍在内存中，
+    写入按条提交（WAL），因此正文的持久性不依赖 Hippo 日志。
+    """
+
+    def __init__(self, path: Path):
+        self.path: Path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS passages ("
+            "partition TEXT NOT NULL, pid TEXT NOT NULL, content TEXT NOT NULL, entities TEXT NOT NULL, "
+            "PRIMARY KEY (partition, pid)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            raise RuntimeError(f"passage store {self.path} is closed")
+        return self._conn
+
+    def put(self, partition: str, pid: str, content: str, entities: list[str]) -> None:
+        self.put_many(partition, [(pid, content, entities)])
+
+    def put_many(self, partition: str, rows: Iterable[tuple[str, str, list[str]]]) -> None:
+        with self._lock:
+            conn = self._db()
+            conn.executemany(
+                "INSERT OR REPLACE INTO passages (partition, pid, content, entities) VALUES (?, ?, ?, ?)",
+                [(partition, pid, content, json.dumps(entities, ensure_ascii=False)) for pid, content, entities in rows],
+            )
+            conn.commit()
+
+    def delete(self, partition: str, pids: Iterable[str]) -> None:
+        keys = [(partition, pid) for pid in pids]
+        if not keys:
+            return
+        with self._lock:
+            conn = self._db()
+            conn.executemany("DELETE FROM passages WHERE partition = ? AND pid = ?", keys)
+            conn.commit()
+
+    def get_many(self, partition: str, pids: Iterable[str]) -> dict[str, dict[str, Any]]:
+        """批量读取 {pid: {"content", "entities"}}，不存在的 pid 不出现在结果中"""
+        wanted = list(dict.fromkeys(pids))
+        records: dict[str, dict[str, Any]] = {}
+        with self._lock:
+            conn = self._db()
+            for start in range(0, len(wanted), _IN_CHUNK):
+                chunk = wanted[start : start + _IN_CHUNK]
+                rows = conn.execute(
+                    f"SELECT pid, content, entities FROM passages WHERE partition = ? AND pid IN ({','.join('?' * len(chunk))})",
+                    (partition, *chunk),
+                ).fetchall()
+                for pid, content, entities in rows:
+                    records[pid] = {"content": content, "entities": json.loads(entities)}
+        return records
+
+    def pids(self, partition: str) -> list[str]:
+        with self._lock:
+            rows = self._db().execute("SELECT pid FROM passages WHERE partition = ?", (partition,)).fetchall()
+        return [row[0] for row in rows]
+
+    def count(self, partition: str) -> int:
+        with self._lock:
+            row = self._db().execute("SELECT COUNT(*) FROM passages WHERE partition = ?", (partition,)).fetchone()
+        return int(row[0])
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.commit()
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+            self._conn = None
+
+
+class PassageStoreView:
+    """单个分区的正文视图，读取接口与原先的 memory_store 字典一致"""
+
+    def __init__(self, store: HippoPassageStore, partition_id: str):
+        self.store = store
+        self.partition_id = partition_id
+
+    def get(self, pid: str, default: Any = None) -> Any:
+        return self.store.get_many(self.partition_id, [pid]).get(pid, default)
+
+    def get_many(self, pids: Iterable[str]) -> dict[str, dict[str, Any]]:
+        return self.store.get_many(self.partition_id, pids)
+
+    def put(self, pid: str, content: str, entities: list[str]) -> None:
+        self.store.put(self.partition_id, pid, content, entities)
+
+    def put_many(self, rows: Iterable[tuple[str, str, list[str]]]) -> None:
+        self.store.put_many(self.partition_id, rows)
+
+    def delete(self, pids: Iterable[str]) -> None:
+        self.store.delete(self.partition_id, pids)
+
+    def __getitem__(self, pid: str) -> dict[str, Any]:
+        record = self.get(pid)
+        if record is None:
+            raise KeyError(pid)
+        return record
+
+    def __contains__(self, pid: object) -> bool:
+        return isinstance(pid, str) and self.get(pid) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.store.pids(self.partition_id))
+
+    def __len__(self) -> int:
+        return self.store.count(self.partition_id)
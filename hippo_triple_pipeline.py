@@ -0,0 +1,188 @@
+"""HippoRAG 后台三元组抽取：写入路径只入队，后台协程按批调用 LLM，结果按内容哈希缓存"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+import hashlib
+from typing import Any, Awaitable, Callable, Hashable
+
+from .hippo_entity_extraction import Triple, extract_triples_batch_with_llm
+
+LLMInvoke = Callable[[str], Awaitable[str]]
+# (tag, content_hash, triples)，在事件循环线程中回调
+ResultCallback = Callable[[Hashable, str, list[Triple]], None]
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256((content or "").strip().encode("utf-8")).hexdigest()
+
+
+def build_chat_invoke(config: Any) -> LLMInvoke:
+    """使用 MEMORY_MANAGE_MODEL 模型组构造 LLM 调用函数（与被动记忆提取相同的调用方式）"""
+
+    async def _invoke(prompt: str) -> str:
+        from .utils import get_model_group_info
+        import httpx
+
+        llm_group = get_model_group_info(config.MEMORY_MANAGE_MODEL, expected_type="chat")
+        async with httpx.AsyncClient(timeout=60.0) as http_client:
+            response = await http_client.post(
+                f"{llm_group.BASE_URL}/chat/completions",
+                headers={"Authorization": f"Bearer {llm_group.API_KEY}"},
+                json={
+                    "model": llm_group.CHAT_MODEL,
+                    "messages": [{"role": "user", "content": prompt}],
+                    "temperature": 0.0,
+                },
+            )
+            response.raise_for_status()
+            return str(response.json()["choices"][0]["message"]["content"])
+
+    return _invoke
+
+
+class TripleExtractionPipeline:
+    """有界并发、微批的三元组抽取队列
+
+    - submit 可在任意线程调用，只把任务投递到事件循环，永不阻塞写入路径；队列满时丢弃并计数；
+    - 分发协程攒批：取到首条后在 batch_window 秒内最多再取 batch_size - 1 条，一次 LLM 调用处理整批；
+      同时在途的批次受 concurrency 信号量限制，未拿到名额时新写入继续在队列中累积成更大的批；
+    - 结果按内容 sha256 做 LRU 缓存，排队或在途的相同内容只抽取一次；调用失败不缓存。
+    必须在事件循环中构造。
+    """
+
+    def __init__(
+        self,
+        llm_invoke: LLMInvoke,
+        on_result: ResultCallback,
+        *,
+        concurrency: int = 2,
+        batch_size: int = 8,
+        batch_window: float = 0.5,
+        cache_size: int = 4096,
+        queue_size: int = 1024,
+    ):
+        self.llm_invoke = llm_invoke
+        self.on_result = on_result
+        self.batch_size = max(1, int(batch_size))
+        self.batch_window = max(0.0, float(batch_window))
+        self.cache_size = max(0, int(cache_size))
+        self.loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue[tuple[str, str]] = asyncio.Queue(maxsize=max(1, int(queue_size)))
+        self._slots = asyncio.Semaphore(max(1, int(concurrency)))
+        self._cache: OrderedDict[str, list[Triple]] = OrderedDict()
+        # 排队或在途的内容哈希 -> 等待结果的 tag
+        self._inflight: dict[str, list[Hashable]] = {}
+        self._tasks: set[asyncio.Task[None]] = set()
+        self.stats: dict[str, int] = {
+            "submitted": 0,
+            "cache_hits": 0,
+            "dropped": 0,
+            "batches": 0,
+            "failures": 0,
+            "triples": 0,
+        }
+        self._closed = False
+        self._dispatcher = self.loop.create_task(self._dispatch())
+
+    def submit(self, tag: Hashable, content: str) -> bool:
+        """线程安全地提交一条记忆；返回是否成功投递"""
+        if self._closed or not (content or "").strip():
+            return False
+        try:
+            self.loop.call_soon_threadsafe(self._enqueue, tag, content, content_hash(content))
+        except RuntimeError:
+            # 事件循环已关闭
+            return False
+        return True
+
+    def _enqueue(self, tag: Hashable, content: str, digest: str) -> None:
+        if self._closed:
+            return
+        self.stats["submitted"] += 1
+        cached = self._cache_get(digest)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            self._deliver(tag, digest, cached)
+            return
+        waiting = self._inflight.get(digest)
+        if waiting is not None:
+            waiting.append(tag)
+            return
+        try:
+            self._queue.put_nowait((content, digest))
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            return
+        self._inflight[digest] = [tag]
+
+    async def _dispatch(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self.loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                timeout = deadline - self.loop.time()
+                try:
+                    if timeout <= 0:
+                        batch.append(self._queue.get_nowait())
+                    else:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+            await self._slots.acquire()
+            task = self.loop.create_task(self._process(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, batch: list[tuple[str, str]]) -> None:
+        try:
+            self.stats["batches"] += 1
+            results = await extract_triples_batch_with_llm(self.llm_invoke, [content for content, _ in batch])
+            if results is None:
+                self.stats["failures"] += 1
+            for index, (_, digest) in enumerate(batch):
+                tags = self._inflight.pop(digest, [])
+                if results is None:
+                    continue
+                self._cache_put(digest, results[index])
+                for tag in tags:
+                    self._deliver(tag, digest, results[index])
+        finally:
+            self._slots.release()
+            for _ in batch:
+                self._queue.task_done()
+
+    def _deliver(self, tag: Hashable, digest: str, triples: list[Triple]) -> None:
+        self.stats["triples"] += len(triples)
+        try:
+            self.on_result(tag, digest, triples)
+        except Exception:
+            return
+
+    def _cache_get(self, digest: str) -> list[Triple] | None:
+        triples = self._cache.get(digest)
+        if triples is not None:
+            self._cache.move_to_end(digest)
+        return triples
+
+    def _cache_put(self, digest: str, triples: list[Triple]) -> None:
+        if self.cache_size <= 0:
+            return
+        self._cache[digest] = triples
+        self._cache.move_to_end(digest)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def drain(self) -> None:
+        """等待已入队的记忆全部处理完毕"""
+        await asyncio.sleep(0)
+        await self._queue.join()
+
+    def close(self) -> None:
+        """停止分发与在途批次；尚未处理的记忆被丢弃（三元组是可选增强，不影响已写入的共现图）"""
+        self._closed = True
+        self._dispatcher.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+        self._inflight.clear()
@@ -0,0 +1,416 @@
+"""
+mem0 嵌入复用：同一请求内的多层/多作用域检索共享一次查询向量，
+并通过两级缓存（进程内 LRU + 可选 SQLite）跨请求复用文本向量
+"""
+
+import functools
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from nekro_agent.core import logger
+
+from .mem0_executor import PRIORITY_WRITE, run_mem0_io
+
+
+def normalize_embedding_text(text: str) -> str:
+    """归一化嵌入文本（去首尾空白、折叠连续空白），用作复用键。"""
+    return " ".join(str(text).split())
+
+
+class _EmbeddingMemo:
+    """请求级向量表：同一文本并发请求时只有一个线程真正调用嵌入模型，其余等待复用。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._vectors: Dict[str, Any] = {}
+        self._inflight: Dict[str, threading.Event] = {}
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._vectors:
+                return self._vectors[key]
+            event = self._inflight.get(key)
+            owner = event is None
+            if owner:
+                event = threading.Event()
+                self._inflight[key] = event
+
+        if not owner:
+            event.wait()
+            with self._lock:
+                if key in self._vectors:
+                    return self._vectors[key]
+            # 首个计算者失败：自行计算，错误由调用方按原逻辑处理
+            return compute()
+
+        try:
+            vector = compute()
+            with self._lock:
+                self._vectors[key] = vector
+            return vector
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def peek(self, key: str) -> Any:
+        with self._lock:
+            return self._vectors.get(key)
+
+    def store(self, key: str, vector: Any) -> None:
+        with self._lock:
+            self._vectors[key] = vector
+
+
+class EmbeddingCache:
+    """两级嵌入缓存：进程内 LRU + 可选 SQLite 持久层。
+
+    缓存键为 (嵌入模型组, 维度, 归一化文本哈希)，切换模型或维度不会误用旧向量。
+    """
+
+    # 每写入多少条磁盘记录执行一次过期清理与容量裁剪
+    _DISK_TRIM_EVERY = 256
+
+    def __init__(
+        self,
+        model: str,
+        dims: int,
+        max_entries: int = 2048,
+        ttl_seconds: float = 0,
+        persist_path: Optional[Path] = None,
+        disk_max_entries: int = 50000,
+    ) -> None:
+        self.namespace = f"{model}|{int(dims)}"
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = max(0.0, float(ttl_seconds))
+        self.disk_max_entries = max(1, int(disk_max_entries))
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disk_writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if persist_path is not None:
+            self._open_disk(Path(persist_path))
+
+    def _open_disk(self, path: Path) -> None:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embeddings_created ON embeddings(created_at)"
+            )
+            conn.commit()
+            self._conn = conn
+        except Exception as exc:
+            logger.warning(f"[Memory] 嵌入缓存持久层不可用，仅使用内存缓存: {exc}")
+            self._conn = None
+
+    def make_key(self, text: str) -> str:
+        raw = f"{self.namespace}\n{normalize_embedding_text(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, created_at: float, vector: List[float]) -> None:
+        self._memory[key] = (created_at, vector)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, text: str) -> Optional[List[float]]:
+        key = self.make_key(text)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._memory[key]
+
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT vector, created_at FROM embeddings WHERE key = ?", (key,)
+                    ).fetchone()
+                except sqlite3.Error as exc:
+                    logger.debug(f"[Memory] 读取嵌入缓存失败: {exc}")
+                    row = None
+                if row is not None and not self._expired(row[1], now):
+                    vector = array("d", row[0]).tolist()
+                    self._remember(key, row[1], vector)
+                    self.disk_hits += 1
+                    return vector
+
+            self.misses += 1
+            return None
+
+    def put(self, text: str, vector: Any) -> None:
+        try:
+            values = [float(v) for v in vector]
+        except (TypeError, ValueError):
+            return
+        key = self.make_key(text)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, values)
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, created_at) VALUES (?, ?, ?)",
+                    (key, array("d", values).tobytes(), now),
+                )
+                self._disk_writes += 1
+                if self._disk_writes % self._DISK_TRIM_EVERY == 0:
+                    self._trim_disk(now)
+                self._conn.commit()
+            except sqlite3.Error as exc:
+                logger.debug(f"[Memory] 写入嵌入缓存失败: {exc}")
+
+    def _trim_disk(self, now: float) -> None:
+        assert self._conn is not None
+        if self.ttl_seconds > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            "SELECT key FROM embeddings ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.disk_max_entries,),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "namespace": self.namespace,
+                "entries": len(self._memory),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "persistent": self._conn is not None,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.commit()
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+            self._conn = None
+
+
+# 由 embedding_scope() 建立，随 create_task / to_thread 复制的上下文共享同一个表
+_REQUEST_EMBEDDINGS: ContextVar[Optional[_EmbeddingMemo]] = ContextVar(
+    "nekro_mem0_request_embeddings", default=None
+)
+
+
+class SharedEmbedder:
+    """包装 mem0 的 embedding_model：请求作用域内按文本复用向量，跨请求经 EmbeddingCache 复用。
+
+    插件固定使用 openai 兼容嵌入，memory_action 不影响输出，因此复用键不区分 add/search/update。
+    """
+
+    def __init__(self, embedder: Any, cache: Optional[EmbeddingCache] = None) -> None:
+        self._embedder = embedder
+        self.cache = cache
+
+    @property
+    def wrapped(self) -> Any:
+        return self._embedder
+
+    def _embed_cached(self, text: str, memory_action: Optional[str]) -> Any:
+        cache = self.cache
+        if cache is None:
+            return self._embedder.embed(text, memory_action)
+        vector = cache.get(text)
+        if vector is None:
+            vector = self._embedder.embed(text, memory_action)
+            cache.put(text, vector)
+        return vector
+
+    def embed(self, text: Any, memory_action: Optional[str] = None) -> Any:
+        if not isinstance(text, str):
+            return self._embedder.embed(text, memory_action)
+        memo = _REQUEST_EMBEDDINGS.get()
+        if memo is None:
+            return self._embed_cached(text, memory_action)
+        return memo.get_or_compute(
+            normalize_embedding_text(text),
+            lambda: self._embed_cached(text, memory_action),
+        )
+
+    def embed_many(self, texts: List[str], memory_action: Optional[str] = None) -> List[Any]:
+        """批量嵌入：缓存未命中的文本合并为一次嵌入请求，结果写回缓存与请求作用域。"""
+        vectors: List[Any] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+        memo = _REQUEST_EMBEDDINGS.get()
+        for index, text in enumerate(texts):
+            key = normalize_embedding_text(text)
+            vector = memo.peek(key) if memo is not None else None
+            if vector is None and self.cache is not None:
+                vector = self.cache.get(text)
+            if vector is None:
+                missing.setdefault(key, []).append(index)
+            else:
+                vectors[index] = vector
+
+        if missing:
+            batch_texts = [texts[indexes[0]] for indexes in missing.values()]
+            batch_vectors = self._embed_batch(batch_texts, memory_action)
+            for (key, indexes), text, vector in zip(
+                missing.items(), batch_texts, batch_vectors
+            ):
+                if self.cache is not None:
+                    self.cache.put(text, vector)
+                if memo is not None:
+                    memo.store(key, vector)
+                for index in indexes:
+                    vectors[index] = vector
+        return vectors
+
+    def _embed_batch(self, texts: List[str], memory_action: Optional[str]) -> List[Any]:
+        # mem0 的 openai 嵌入器只接受单条文本；直接用其底层客户端一次请求多条，失败时逐条回退
+        client = getattr(self._embedder, "client", None)
+        config = getattr(self._embedder, "config", None)
+        create = getattr(getattr(client, "embeddings", None), "create", None)
+        model = getattr(config, "model", None)
+        if callable(create) and model:
+            request: Dict[str, Any] = {
+                "input": [text.replace("\n", " ") for text in texts],
+                "model": model,
+            }
+            dims = getattr(config, "embedding_dims", None)
+            if dims:
+                request["dimensions"] = dims
+            try:
+                response: Any = create(**request)
+                data = sorted(response.data, key=lambda item: getattr(item, "index", 0))
+                if len(data) == len(texts):
+                    return [item.embedding for item in data]
+            except Exception as exc:
+                logger.debug(f"[Memory] 批量嵌入失败，逐条回退: {exc}")
+        return [self._embedder.embed(text, memory_action) for text in texts]
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._embedder, name)
+
+
+def install_shared_embedder(client: Any, cache: Optional[EmbeddingCache] = None) -> None:
+    """为本地 mem0 Memory 实例挂载共享嵌入包装（托管 MemoryClient 无 embedding_model，直接跳过）。"""
+    embedder = getattr(client, "embedding_model", None)
+    if embedder is None:
+        return
+    if isinstance(embedder, SharedEmbedder):
+        embedder.cache = cache
+        return
+    client.embedding_model = SharedEmbedder(embedder, cache)
+
+
+async def prime_embeddings(client: Any, texts: List[str]) -> bool:
+    """批量预计算文本向量（写入优先级），后续逐条写入/检索命中缓存或请求作用域。
+
+    既未启用缓存又不在 embedding_scope 内时，预计算的向量无处复用，直接跳过。
+    """
+    embedder = getattr(client, "embedding_model", None)
+    if not isinstance(embedder, SharedEmbedder):
+        return False
+    if embedder.cache is None and _REQUEST_EMBEDDINGS.get() is None:
+        return False
+    texts = [text for text in texts if isinstance(text, str) and text.strip()]
+    if not texts:
+        return False
+    try:
+        await run_mem0_io(PRIORITY_WRITE, embedder.embed_many, texts, "add")
+    except Exception as exc:
+        logger.warning(f"[Memory] 批量预计算向量失败，将逐条嵌入: {exc}")
+        return False
+    return True
+
+
+_EMBEDDING_CACHE: Optional[EmbeddingCache] = None
+_EMBEDDING_CACHE_PATH = Path("data") / "chatluna" / "long-memory" / "embedding_cache.sqlite3"
+
+
+def configure_embedding_cache(config: Any, model: str) -> Optional[EmbeddingCache]:
+    """按插件配置重建全局嵌入缓存（mem0 客户端重建时调用），未启用时返回 None。"""
+    global _EMBEDDING_CACHE
+    close_embedding_cache()
+    if not getattr(config, "EMBEDDING_CACHE_ENABLED", True):
+        return None
+    _EMBEDDING_CACHE = EmbeddingCache(
+        model=model,
+        dims=getattr(config, "EMBEDDING_DIMS", 0),
+        max_entries=getattr(config, "EMBEDDING_CACHE_MAX_ENTRIES", 2048),
+        ttl_seconds=getattr(config, "EMBEDDING_CACHE_TTL_SECONDS", 0),
+        persist_path=(
+            _EMBEDDING_CACHE_PATH
+            if getattr(config, "EMBEDDING_CACHE_PERSIST", False)
+            else None
+        ),
+        disk_max_entries=getattr(config, "EMBEDDING_CACHE_DISK_MAX_ENTRIES", 50000),
+    )
+    return _EMBEDDING_CACHE
+
+
+def get_embedding_cache_stats() -> Optional[Dict[str, Any]]:
+    """返回当前嵌入缓存的命中统计，未启用时返回 None。"""
+    if _EMBEDDING_CACHE is None:
+        return None
+    return _EMBEDDING_CACHE.stats()
+
+
+def close_embedding_cache() -> None:
+    global _EMBEDDING_CACHE
+    if _EMBEDDING_CACHE is not None:
+        _EMBEDDING_CACHE.close()
+        _EMBEDDING_CACHE = None
+
+
+def bind_embedding_scope(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """把可调用绑定到当前请求级向量表：写入管线稍后在其他任务中执行时仍复用作用域内的向量。"""
+    if _REQUEST_EMBEDDINGS.get() is None:
+        return fn
+    return functools.partial(copy_context().run, fn)
+
+
+@contextmanager
+def embedding_scope() -> Iterator[None]:
+    """开启请求级向量复用作用域；嵌套调用沿用外层作用域。
+
+    作用域内创建的任务与线程池调用共享同一向量表，同一查询文本只嵌入一次。
+    """
+    if _REQUEST_EMBEDDINGS.get() is not None:
+        yield
+        return
+    token = _REQUEST_EMBEDDINGS.set(_EmbeddingMemo())
+    try:
+        yield
+    finally:
+        _REQUEST_EMBEDDINGS.reset(token)
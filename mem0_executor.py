@@ -0,0 +1,222 @@
+"""
+mem0 / 向量库 I/O 专用线程池：按优先级调度（交互读取 > 写入 > 后台维护）
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_WRITE = "write"
+PRIORITY_MAINTENANCE = "maintenance"
+
+# 调度顺序即优先级：空闲线程总是先取更高优先级的任务
+PRIORITY_ORDER: Tuple[str, ...] = (
+    PRIORITY_INTERACTIVE,
+    PRIORITY_WRITE,
+    PRIORITY_MAINTENANCE,
+)
+
+
+# 工作线程标记：池内任务再向池提交并同步等待时，线程占满会互相饿死，调用方据此改走其他线程
+_WORKER_STATE = threading.local()
+
+
+def in_mem0_worker() -> bool:
+    """当前线程是否为 mem0 专用线程池的工作线程"""
+    return bool(getattr(_WORKER_STATE, "active", False))
+
+
+class _ClassMetrics:
+    __slots__ = ("submitted", "completed", "failed", "cancelled", "total_wait", "max_wait")
+
+    def __init__(self) -> None:
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+
+class _Job:
+    __slots__ = ("future", "call", "enqueued_at")
+
+    def __init__(self, call: Callable[[], Any]) -> None:
+        self.future: Future = Future()
+        self.call = call
+        self.enqueued_at = time.perf_counter()
+
+
+class PriorityExecutor:
+    """固定线程数的优先级线程池。
+
+    每个优先级类有独立的并发上限：写入与维护的上限之和小于线程数时，
+    始终留有线程给交互读取，后台清理无法挤占预搜索。
+    """
+
+    def __init__(
+        self,
+        workers: int = 8,
+        limits: Optional[Dict[str, int]] = None,
+        name: str = "mem0-io",
+    ) -> None:
+        self.workers = max(1, int(workers))
+        limits = limits or {}
+        self._limits: Dict[str, int] = {
+            cls: max(1, min(self.workers, int(limits.get(cls, self.workers))))
+            for cls in PRIORITY_ORDER
+        }
+        self._cond = threading.Condition()
+        self._queues: Dict[str, Deque[_Job]] = {cls: deque() for cls in PRIORITY_ORDER}
+        self._running: Dict[str, int] = {cls: 0 for cls in PRIORITY_ORDER}
+        self._metrics: Dict[str, _ClassMetrics] = {cls: _ClassMetrics() for cls in PRIORITY_ORDER}
+        self._shutdown = False
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"{name}-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, priority: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """提交任务；调用方的 contextvars 会随任务带入工作线程（与 asyncio.to_thread 一致）。"""
+        if priority not in self._queues:
+            raise ValueError(f"unknown priority class: {priority}")
+        ctx = contextvars.copy_context()
+        job = _Job(lambda: ctx.run(fn, *args, **kwargs))
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("executor has been shut down")
+            self._queues[priority].append(job)
+            self._metrics[priority].submitted += 1
+            self._cond.notify()
+        return job.future
+
+    async def run(self, priority: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """在池中执行并等待结果；协程被取消时，尚未开始的任务直接出队作废。"""
+        return await asyncio.wrap_future(self.submit(priority, fn, *args, **kwargs))
+
+    def _take_job(self) -> Optional[Tuple[str, _Job]]:
+        for cls in PRIORITY_ORDER:
+            queue = self._queues[cls]
+            if queue and self._running[cls] < self._limits[cls]:
+                return cls, queue.popleft()
+        return None
+
+    def _worker(self) -> None:
+        _WORKER_STATE.active = True
+        while True:
+            with self._cond:
+                picked = self._take_job()
+                while picked is None:
+                    if self._shutdown:
+                        return
+                    self._cond.wait()
+                    picked = self._take_job()
+                cls, job = picked
+                metrics = self._metrics[cls]
+                if not job.future.set_running_or_notify_cancel():
+                    metrics.cancelled += 1
+                    continue
+                self._running[cls] += 1
+                waited = time.perf_counter() - job.enqueued_at
+                metrics.total_wait += waited
+                metrics.max_wait = max(metrics.max_wait, waited)
+
+            try:
+                result = job.call()
+            except BaseException as exc:
+                job.future.set_exception(exc)
+                failed = True
+            else:
+                job.future.set_result(result)
+                failed = False
+
+            with self._cond:
+                self._running[cls] -= 1
+                if failed:
+                    metrics.failed += 1
+                else:
+                    metrics.completed += 1
+                # 释放了一个并发名额，可能有被上限挡住的任务可以开始
+                self._cond.notify_all()
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """各优先级类的排队深度、运行数与等待时间统计"""
+        with self._cond:
+            snapshot: Dict[str, Dict[str, Any]] = {}
+            for cls in PRIORITY_ORDER:
+                m = self._metrics[cls]
+                started = m.completed + m.failed + self._running[cls]
+                snapshot[cls] = {
+                    "queue_depth": len(self._queues[cls]),
+                    "running": self._running[cls],
+                    "limit": self._limits[cls],
+                    "submitted": m.submitted,
+                    "completed": m.completed,
+                    "failed": m.failed,
+                    "cancelled": m.cancelled,
+                    "avg_wait_ms": (m.total_wait / started * 1000.0) if started else 0.0,
+                    "max_wait_ms": m.max_wait * 1000.0,
+                }
+            return snapshot
+
+    def shutdown(self, wait: bool = True, timeout: float = 5.0) -> None:
+        """停止接收新任务；已排队任务执行完毕后线程退出。"""
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if wait:
+            deadline = time.monotonic() + timeout
+            for thread in self._threads:
+                thread.join(max(0.0, deadline - time.monotonic()))
+
+
+_EXECUTOR: Optional[PriorityExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def configure_mem0_executor(config: Any) -> PriorityExecutor:
+    """按插件配置（重新）创建专用线程池，旧线程池在排空后退出。"""
+    global _EXECUTOR
+    workers = int(getattr(config, "MEM0_EXECUTOR_WORKERS", 8))
+    limits = {
+        PRIORITY_WRITE: int(getattr(config, "MEM0_EXECUTOR_WRITE_LIMIT", 4)),
+        PRIORITY_MAINTENANCE: int(getattr(config, "MEM0_EXECUTOR_MAINTENANCE_LIMIT", 1)),
+    }
+    with _EXECUTOR_LOCK:
+        previous = _EXECUTOR
+        _EXECUTOR = PriorityExecutor(workers=workers, limits=limits)
+    if previous is not None:
+        previous.shutdown(wait=False)
+    return _EXECUTOR
+
+
+def get_mem0_executor() -> PriorityExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        with _EXECUTOR_LOCK:
+            if _EXECUTOR is None:
+                _EXECUTOR = PriorityExecutor(
+                    limits={PRIORITY_WRITE: 4, PRIORITY_MAINTENANCE: 1}
+                )
+    return _EXECUTOR
+
+
+async def run_mem0_io(priority: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """在 mem0 专用线程池中按优先级执行阻塞调用（替代 asyncio.to_thread）。"""
+    return await get_mem0_executor().run(priority, fn, *args, **kwargs)
+
+
+def shutdown_mem0_executor(wait: bool = True) -> None:
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        executor = _EXECUTOR
+        _EXECUTOR = None
+    if executor is not None:
+        executor.shutdown(wait=wait)
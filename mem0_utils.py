@@ -8,6 +8,7 @@ from typing import Any, Optional
 from urllib.parse import urlparse
 
 from nekro_agent.api.core import get_qdrant_config, logger
+from .mem0_embedding import configure_embedding_cache, install_shared_embedder
 from .plugin import PluginConfig, get_memory_config, plugin
 from .utils import get_model_group_info
 
@@ -280,6 +281,11 @@ async def get_mem0_client() -> Optional[Any]:
                 _mem0_instance = await asyncio.to_thread(
                     runtime["Memory"], config=memory_config
                 )
+                # 同一请求内多层检索复用查询向量，跨请求经嵌入缓存复用（见 mem0_embedding）
+                install_shared_embedder(
+                    _mem0_instance,
+                    configure_embedding_cache(plugin_config, embedding_group.CHAT_MODEL),
+                )
 
             _last_config_hash = current_config_hash
             logger.success("✓ mem0客户端实例创建成功")
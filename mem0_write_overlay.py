@@ -0,0 +1,145 @@
+"""
+读己之写：在后台写入落库前，把待写入的记忆与删除墓碑叠加到读取结果上
+"""
+
+import asyncio
+import itertools
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+ScopeIds = Tuple[Optional[str], Optional[str], Optional[str]]
+
+_SCOPE_KEYS = ("user_id", "agent_id", "run_id")
+
+
+def _normalize_text(text: Any) -> str:
+    return " ".join(str(text or "").split())
+
+
+def _bigrams(text: str) -> set:
+    compact = "".join(text.lower().split())
+    if len(compact) < 2:
+        return {compact} if compact else set()
+    return {compact[i : i + 2] for i in range(len(compact) - 1)}
+
+
+def lexical_relevance(query: str, text: str) -> float:
+    """字符二元组覆盖率：待写入记忆尚无向量，用它粗略判断是否与查询相关。"""
+    query_grams = _bigrams(query)
+    if not query_grams:
+        return 0.0
+    return len(query_grams & _bigrams(text)) / len(query_grams)
+
+
+class WriteOverlay:
+    """进程内写入叠加层。
+
+    - 待写入的新增按作用域保存，读取匹配作用域时附加到结果（标记 pending，无 memory_id）；
+    - 待执行的更新按 memory_id 覆盖结果中的内容；
+    - 待执行的删除作为墓碑，从结果中剔除。
+    后端写入完成（成功、失败或取消）后对应条目自动移除。所有操作都在事件循环线程内进行。
+    """
+
+    def __init__(self) -> None:
+        self._sequence = itertools.count()
+        self._adds: Dict[int, Dict[str, Any]] = {}
+        self._updates: Dict[str, Tuple[int, str]] = {}
+        self._tombstones: Dict[str, int] = {}
+
+    def track_add(
+        self,
+        future: "asyncio.Future[Any]",
+        scope_ids: ScopeIds,
+        memory: str,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        token = next(self._sequence)
+        record: Dict[str, Any] = {
+            "memory": str(memory),
+            "metadata": dict(metadata or {}),
+            "pending": True,
+        }
+        for key, value in zip(_SCOPE_KEYS, scope_ids):
+            if value is not None:
+                record[key] = value
+        self._adds[token] = record
+        future.add_done_callback(lambda _: self._adds.pop(token, None))
+
+    def track_update(self, future: "asyncio.Future[Any]", memory_id: str, memory: str) -> None:
+        version = next(self._sequence)
+        self._updates[memory_id] = (version, str(memory))
+
+        def _clear(_: Any) -> None:
+            current = self._updates.get(memory_id)
+            # 合并后的更新共享同一个 Future，只由最新版本负责清除
+            if current is not None and current[0] <= version:
+                self._updates.pop(memory_id, None)
+
+        future.add_done_callback(_clear)
+
+    def track_delete(self, future: "asyncio.Future[Any]", memory_id: str) -> None:
+        version = next(self._sequence)
+        self._tombstones[memory_id] = version
+        self._updates.pop(memory_id, None)
+
+        def _clear(_: Any) -> None:
+            if self._tombstones.get(memory_id) == version:
+                self._tombstones.pop(memory_id, None)
+
+        future.add_done_callback(_clear)
+
+    def pending_count(self) -> int:
+        return len(self._adds) + len(self._updates) + len(self._tombstones)
+
+    def pending_adds(self, scope_ids: ScopeIds) -> List[Dict[str, Any]]:
+        """同一作用域（user/agent/run 完全一致）内尚未落库的新增，供写入前去重。"""
+        return list(self._pending_adds_for(dict(zip(_SCOPE_KEYS, scope_ids))))
+
+    def _pending_adds_for(self, scope_kwargs: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+        # 与后端过滤语义一致：读取条件中的每个作用域字段都必须与写入时一致
+        for record in self._adds.values():
+            if all(record.get(key) == value for key, value in scope_kwargs.items()):
+                yield record
+
+    def apply(
+        self,
+        records: List[Dict[str, Any]],
+        scope_kwargs: Dict[str, Any],
+        query: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """把叠加层合并进一次读取的结果；query 非空时只附加与查询相关的待写入记忆。"""
+        if not (self._adds or self._updates or self._tombstones):
+            return records
+
+        merged: List[Dict[str, Any]] = []
+        seen_texts = set()
+        for item in records:
+            memory_id = str(item.get("id") or item.get("memory_id") or "")
+            if memory_id and memory_id in self._tombstones:
+                continue
+            if memory_id and memory_id in self._updates:
+                item = {**item, "memory": self._updates[memory_id][1], "pending": True}
+            seen_texts.add(_normalize_text(item.get("memory") or item.get("text")))
+            merged.append(item)
+
+        if not scope_kwargs:
+            return merged
+        for record in self._pending_adds_for(scope_kwargs):
+            text = _normalize_text(record["memory"])
+            if text in seen_texts:
+                continue
+            pending = dict(record)
+            if query:
+                relevance = lexical_relevance(query, text)
+                if relevance <= 0:
+                    continue
+                pending["score"] = relevance
+            seen_texts.add(text)
+            merged.append(pending)
+        return merged
+
+
+_OVERLAY = WriteOverlay()
+
+
+def get_write_overlay() -> WriteOverlay:
+    return _OVERLAY
@@ -0,0 +1,384 @@
+"""
+mem0 写入管线：按作用域/记忆分片的顺序写入，支持更新合并、有界队列背压、抖动重试与关闭前排空
+"""
+
+import asyncio
+import random
+import time
+import zlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from nekro_agent.core import logger
+
+from .mem0_executor import PRIORITY_WRITE, run_mem0_io
+from .plugin import get_memory_config
+
+# 参数/类型错误重试无意义，直接失败
+_NON_RETRYABLE = (TypeError, ValueError)
+# 非幂等写入（如 client.add）只重试可确认请求未送达的错误；超时等情况下服务端可能已写入，重试会产生重复记忆
+_NOT_DELIVERED = (ConnectionRefusedError,)
+
+
+def scope_shard_key(
+    user_id: Optional[str] = None,
+    agent_id: Optional[str] = None,
+    run_id: Optional[str] = None,
+) -> str:
+    """作用域写入的分片键：同一 (user, agent, run) 的写入落在同一分片并按序执行。"""
+    return f"scope::{user_id or ''}|{agent_id or ''}|{run_id or ''}"
+
+
+def memory_shard_key(memory_id: str) -> str:
+    """单条记忆写入（更新/删除）的分片键：同一 memory_id 的操作按序执行。"""
+    return f"memory::{memory_id}"
+
+
+class _WriteOp:
+    __slots__ = (
+        "call",
+        "description",
+        "coalesce_key",
+        "idempotent",
+        "shard_key",
+        "enqueued_at",
+        "future",
+        "merged",
+    )
+
+    def __init__(
+        self,
+        call: Callable[[], Awaitable[Any]],
+        description: str,
+        coalesce_key: Optional[str],
+        future: asyncio.Future,
+        idempotent: bool = True,
+        shard_key: str = "",
+    ) -> None:
+        self.call = call
+        self.description = description
+        self.coalesce_key = coalesce_key
+        self.idempotent = idempotent
+        self.shard_key = shard_key
+        self.enqueued_at = time.monotonic()
+        self.future = future
+        self.merged = 0
+
+
+class _Shard:
+    def __init__(self, queue_size: int) -> None:
+        self.queue: "asyncio.Queue[_WriteOp]" = asyncio.Queue(maxsize=queue_size)
+        # 尚未开始执行、仍可被后续同键更新覆盖的操作
+        self.pending: Dict[str, _WriteOp] = {}
+        # 有新写入入队（或管线关闭）时置位，用于提前结束合并窗口
+        self.arrival = asyncio.Event()
+        self.worker: Optional[asyncio.Task] = None
+
+
+def _consume_future_exception(future: asyncio.Future) -> None:
+    # 调用方通常不等待写入结果，失败已记录日志，这里避免 "exception was never retrieved"
+    if not future.cancelled():
+        future.exception()
+
+
+class WritePipeline:
+    """分片写入管线。
+
+    - 同一分片键的写入严格按提交顺序执行，不同分片并行；
+    - 带 coalesce_key 的写入（如同一记忆的内容更新）在窗口期内只执行最后一次；
+      窗口内若有其他写入排到其后则立即执行，不阻塞分片；
+    - 队列满时 submit 会等待，形成对调用方的背压；
+    - 失败按指数退避加抖动重试，耗尽后记录错误；非幂等写入只在请求确定未送达时重试。
+    """
+
+    def __init__(
+        self,
+        shards: int = 4,
+        queue_size: int = 256,
+        coalesce_window: float = 0.1,
+        max_retries: int = 3,
+        retry_base_delay: float = 0.2,
+    ) -> None:
+        self.coalesce_window = max(0.0, float(coalesce_window))
+        self.max_retries = max(0, int(max_retries))
+        self.retry_base_delay = max(0.0, float(retry_base_delay))
+        self.loop = asyncio.get_running_loop()
+        self._shards: List[_Shard] = [
+            _Shard(max(1, int(queue_size))) for _ in range(max(1, int(shards)))
+        ]
+        self._closing = False
+        self._metrics: Dict[str, int] = {
+            "submitted": 0,
+            "coalesced": 0,
+            "completed": 0,
+            "failed": 0,
+            "retried": 0,
+        }
+        for index, shard in enumerate(self._shards):
+            shard.worker = self.loop.create_task(
+                self._run_shard(shard), name=f"mem0-write-{index}"
+            )
+
+    def _shard_for(self, shard_key: str) -> _Shard:
+        return self._shards[zlib.crc32(shard_key.encode("utf-8")) % len(self._shards)]
+
+    async def submit(
+        self,
+        shard_key: str,
+        call: Callable[[], Awaitable[Any]],
+        *,
+        description: str = "write",
+        coalesce_key: Optional[str] = None,
+        barrier_key: Optional[str] = None,
+        idempotent: bool = True,
+    ) -> asyncio.Future:
+        """提交写入，返回完成时给出结果的 Future（调用方可不等待）。
+
+        coalesce_key：同键且尚未开始的写入会被本次覆盖（最后一次生效）。
+        barrier_key：阻断该键上的合并，保证之后的更新不会越过本次写入。
+        idempotent：重复执行是否安全；为 False 时（如新增记忆）只重试请求未送达的错误。
+        """
+        if self._closing:
+            raise RuntimeError("write pipeline is shutting down")
+        shard = self._shard_for(shard_key)
+        self._metrics["submitted"] += 1
+
+        if barrier_key is not None:
+            shard.pending.pop(barrier_key, None)
+
+        if coalesce_key is not None:
+            existing = shard.pending.get(coalesce_key)
+            if existing is not None:
+                existing.call = call
+                existing.description = description
+                existing.merged += 1
+                self._metrics["coalesced"] += 1
+                return existing.future
+
+        future: asyncio.Future = self.loop.create_future()
+        future.add_done_callback(_consume_future_exception)
+        op = _WriteOp(call, description, coalesce_key, future, idempotent, shard_key)
+        if coalesce_key is not None:
+            shard.pending[coalesce_key] = op
+        await shard.queue.put(op)
+        shard.arrival.set()
+        return future
+
+    def _take_queued(self) -> List[_WriteOp]:
+        """停止接收新写入并取出尚未开始执行的写入（所属事件循环已停止时使用）。"""
+        self._closing = True
+        taken: List[_WriteOp] = []
+        for shard in self._shards:
+            shard.pending.clear()
+            while True:
+                try:
+                    taken.append(shard.queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+        return taken
+
+    def _adopt(self, op: _WriteOp) -> None:
+        """接管其他管线未执行的写入：在本循环上新建 Future，保持原有顺序与合并键。"""
+        shard = self._shard_for(op.shard_key)
+        future: asyncio.Future = self.loop.create_future()
+        future.add_done_callback(_consume_future_exception)
+        adopted = _WriteOp(
+            op.call, op.description, op.coalesce_key, future, op.idempotent, op.shard_key
+        )
+        self._metrics["submitted"] += 1
+        if adopted.coalesce_key is not None:
+            shard.pending[adopted.coalesce_key] = adopted
+        try:
+            shard.queue.put_nowait(adopted)
+        except asyncio.QueueFull:
+            self.loop.create_task(shard.queue.put(adopted))
+        shard.arrival.set()
+
+    async def _run_shard(self, shard: _Shard) -> None:
+        while True:
+            op = await shard.queue.get()
+            try:
+                if op.coalesce_key is not None:
+                    await self._await_coalesce_window(shard, op)
+                    if shard.pending.get(op.coalesce_key) is op:
+                        shard.pending.pop(op.coalesce_key, None)
+                await self._execute(op)
+            finally:
+                shard.queue.task_done()
+
+    async def _await_coalesce_window(self, shard: _Shard, op: _WriteOp) -> None:
+        """等待合并窗口到期；同键更新直接并入 op，队列中出现后续写入或管线关闭时提前返回。"""
+        remaining = op.enqueued_at + self.coalesce_window - time.monotonic()
+        if remaining <= 0 or self._closing or not shard.queue.empty():
+            return
+        shard.arrival.clear()
+        try:
+            await asyncio.wait_for(shard.arrival.wait(), timeout=remaining)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _execute(self, op: _WriteOp) -> None:
+        attempt = 0
+        while True:
+            try:
+                result = await op.call()
+            except asyncio.CancelledError:
+                if not op.future.done():
+                    op.future.cancel()
+                raise
+            except Exception as exc:
+                if attempt < self.max_retries and self._should_retry(op, exc):
+                    delay = self.retry_base_delay * (2 ** attempt) * random.uniform(0.5, 1.5)
+                    attempt += 1
+                    self._metrics["retried"] += 1
+                    logger.warning(
+                        f"[Memory] 写入失败，{delay:.2f}s 后第 {attempt} 次重试 ({op.description}): {exc}"
+                    )
+                    await asyncio.sleep(delay)
+                    continue
+                self._metrics["failed"] += 1
+                logger.error(f"[Memory] 写入最终失败 ({op.description}): {exc}")
+                if not op.future.done():
+                    op.future.set_exception(exc)
+                return
+            self._metrics["completed"] += 1
+            if not op.future.done():
+                op.future.set_result(result)
+            return
+
+    @staticmethod
+    def _should_retry(op: _WriteOp, exc: Exception) -> bool:
+        if isinstance(exc, _NON_RETRYABLE):
+            return False
+        return op.idempotent or isinstance(exc, _NOT_DELIVERED)
+
+    async def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待已提交的写入全部执行完毕；超时返回 False。"""
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(shard.queue.join() for shard in self._shards)),
+                timeout=timeout,
+            )
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def close(self, timeout: float = 10.0) -> bool:
+        """停止接收新写入，排空队列后停止分片协程。"""
+        self._closing = True
+        for shard in self._shards:
+            shard.arrival.set()
+        flushed = await self.flush(timeout)
+        if not flushed:
+            logger.warning(f"[Memory] 写入管线关闭超时，仍有 {self.queue_depth()} 条写入未完成")
+        for shard in self._shards:
+            if shard.worker is not None:
+                shard.worker.cancel()
+        await asyncio.gather(
+            *(shard.worker for shard in self._shards if shard.worker is not None),
+            return_exceptions=True,
+        )
+        return flushed
+
+    def queue_depth(self) -> int:
+        return sum(shard.queue.qsize() for shard in self._shards)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self._metrics,
+            "queue_depth": self.queue_depth(),
+            "shard_depths": [shard.queue.qsize() for shard in self._shards],
+        }
+
+
+_PIPELINE: Optional[WritePipeline] = None
+
+
+def get_write_pipeline(config: Any = None) -> WritePipeline:
+    """获取绑定当前事件循环的写入管线（首次调用时按配置创建；事件循环变化时替换并排空旧管线）。"""
+    global _PIPELINE
+    loop = asyncio.get_running_loop()
+    previous = _PIPELINE
+    if previous is None or previous.loop is not loop:
+        config = config if config is not None else get_memory_config()
+        pipeline = WritePipeline(
+            shards=int(getattr(config, "MEM0_WRITE_SHARDS", 4)),
+            queue_size=int(getattr(config, "MEM0_WRITE_QUEUE_SIZE", 256)),
+            coalesce_window=float(getattr(config, "MEM0_WRITE_COALESCE_MS", 100)) / 1000.0,
+            max_retries=int(getattr(config, "MEM0_WRITE_MAX_RETRIES", 3)),
+        )
+        _PIPELINE = pipeline
+        if previous is not None:
+            _retire_pipeline(previous, pipeline)
+        return pipeline
+    return previous
+
+
+def _retire_pipeline(previous: WritePipeline, successor: WritePipeline) -> None:
+    """替换旧管线：旧循环仍在运行时在其上排空并关闭；已停止时把未执行的写入移交新管线，避免丢写。"""
+    old_loop = previous.loop
+    if old_loop.is_running() and not old_loop.is_closed():
+        try:
+            asyncio.run_coroutine_threadsafe(previous.close(), old_loop)
+            return
+        except RuntimeError:
+            pass  # 旧循环恰好已关闭，按已停止处理
+    try:
+        queued = previous._take_queued()
+    except Exception as exc:
+        logger.warning(f"[Memory] 取出旧写入管线的待执行写入失败: {exc}")
+        return
+    for op in queued:
+        successor._adopt(op)
+    if queued:
+        logger.info(f"[Memory] 事件循环已变更，{len(queued)} 条未执行写入移交新写入管线")
+
+
+async def enqueue_mem0_write(
+    shard_key: str,
+    fn: Callable[[], Any],
+    *,
+    config: Any = None,
+    description: str = "write",
+    coalesce_key: Optional[str] = None,
+    barrier_key: Optional[str] = None,
+    idempotent: bool = True,
+) -> asyncio.Future:
+    """提交一个阻塞的 mem0 写调用（无参可调用，如 functools.partial(client.add, ...)）。
+
+    client.add 不是幂等的，提交时应传 idempotent=False。
+    """
+    return await get_write_pipeline(config).submit(
+        shard_key,
+        lambda: run_mem0_io(PRIORITY_WRITE, fn),
+        description=description,
+        coalesce_key=coalesce_key,
+        barrier_key=barrier_key,
+        idempotent=idempotent,
+    )
+
+
+async def enqueue_write_job(
+    shard_key: str,
+    job: Callable[[], Awaitable[Any]],
+    *,
+    config: Any = None,
+    description: str = "write job",
+    barrier_key: Optional[str] = None,
+) -> asyncio.Future:
+    """提交一个异步写任务（每次重试都会重新调用 job 生成协程）。"""
+    return await get_write_pipeline(config).submit(
+        shard_key, job, description=description, barrier_key=barrier_key
+    )
+
+
+async def shutdown_write_pipeline(timeout: float = 10.0) -> None:
+    global _PIPELINE
+    pipeline = _PIPELINE
+    _PIPELINE = None
+    if pipeline is None:
+        return
+    try:
+        if pipeline.loop is asyncio.get_running_loop():
+            await pipeline.close(timeout)
+    except Exception as exc:
+        logger.warning(f"[Memory] 关闭写入管线失败: {exc}")
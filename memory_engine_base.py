@@ -1,5 +1,7 @@
 from abc import ABC, abstractmethod
 
+from .mem0_executor import PRIORITY_INTERACTIVE, PRIORITY_WRITE, run_mem0_io
+
 _ENGINE_REGISTRY: dict[str, type] = {}
 
 
@@ -29,3 +31,19 @@ class MemoryEngineBase(ABC):
     @abstractmethod
     def remove_memory(self, key: str) -> bool:
         pass
+
+    async def aadd_memory(self, key: str, value: object) -> None:
+        """异步添加记忆：默认在 mem0 专用线程池（写入优先级）中执行同步实现"""
+        await run_mem0_io(PRIORITY_WRITE, self.add_memory, key, value)
+
+    async def asearch_memory(self, query: str, **kwargs) -> list[dict[str, object]]:
+        """异步搜索记忆：默认在 mem0 专用线程池（交互优先级）中执行同步实现"""
+        return await run_mem0_io(PRIORITY_INTERACTIVE, self.search_memory, query, **kwargs)
+
+    async def aremove_memory(self, key: str) -> bool:
+        """异步删除记忆：默认在 mem0 专用线程池（写入优先级）中执行同步实现"""
+        return await run_mem0_io(PRIORITY_WRITE, self.remove_memory, key)
+
+    def close(self) -> None:
+        """释放引擎持有的资源（后台线程等），实例被替换或插件卸载时调用"""
+        return None
@@ -1,13 +1,16 @@
 from __future__ import annotations
 
-from collections import Counter
 from collections.abc import Mapping
 from pathlib import Path
 import threading
+import time
 from typing import cast
 from typing_extensions import override
 
-from .emgas_ppmi import build_cooccurrence_matrix, compute_ppmi
+from nekro_agent.core import logger
+
+from .emgas_ppmi import IncrementalPPMI
+from .emgas_snapshot import atomic_write_bytes, encode_graph, load_snapshot
 from .emgas_spreading import EMGASGraph, SpreadingActivationOptions
 from .hippo_entity_extraction import extract_entities
 from .memory_engine_base import MemoryEngineBase, register_engine
@@ -38,8 +41,18 @@ class EMGASEngine(MemoryEngineBase):
             / f"{self.memory_id}.json"
         )
 
-        self.graph: EMGASGraph = EMGASGraph()
+        self.graph: EMGASGraph = EMGASGraph(
+            decay_rate=self.decay_rate, prune_threshold=self.prune_threshold
+        )
         self.passage_store: dict[str, dict[str, object]] = {}
+        self.ppmi: IncrementalPPMI = IncrementalPPMI()
+
+        self.flush_delay: float = float(
+            getattr(config, "EMGAS_FLUSH_DELAY_SECONDS", 2.0)
+        )
+        self.flush_max_delay: float = float(
+            getattr(config, "EMGAS_FLUSH_MAX_DELAY_SECONDS", 30.0)
+        )
 
         self._lock: threading.RLock = threading.RLock()
         self._stop_event: threading.Event = threading.Event()
@@ -49,9 +62,25 @@ class EMGASEngine(MemoryEngineBase):
             name=f"emgas-maintenance-{self.memory_id}",
             daemon=True,
         )
+        # 写入只递增脏计数，由后台线程防抖后落盘
+        self._dirty_gen: int = 0
+        self._flushed_gen: int = 0
+        self._dirty_event: threading.Event = threading.Event()
+        self._flush_lock: threading.Lock = threading.Lock()
+        self._flush_thread: threading.Thread = threading.Thread(
+            target=self._flush_loop,
+            name=f"emgas-flush-{self.memory_id}",
+            daemon=True,
+        )
 
         self._load_graph()
         self._maintenance_thread.start()
+        self._flush_thread.start()
+
+    @property
+    def snapshot_path(self) -> Path:
+        """二进制快照路径（与旧版 JSON 同目录，扩展名为 .emgas）"""
+        return self.graph_path.with_suffix(".emgas")
 
     def initialize(self) -> None:
         return None
@@ -63,11 +92,14 @@ class EMGASEngine(MemoryEngineBase):
             return
 
         with self._lock:
+            previous = self.passage_store.get(passage_id)
+            if previous is not None:
+                self.ppmi.remove_document(self._normalize_concepts(previous.get("concepts")))
             self.graph.add_memory(
                 content=content, passage_id=passage_id, concepts=concepts
             )
             self.passage_store[passage_id] = payload
-            self._apply_ppmi()
+            self.ppmi.add_document(concepts)
             self._save_graph()
 
     @override
@@ -85,6 +117,7 @@ class EMGASEngine(MemoryEngineBase):
         )
 
         with self._lock:
+            self._refresh_ppmi()
             passage_ids = self.graph.retrieve_context(
                 seed_concepts=seed_concepts, options=opts
             )
@@ -121,15 +154,19 @@ class EMGASEngine(MemoryEngineBase):
                 or f"passage::{passage_id}" in self.graph.nodes
             )
             self.graph.remove_memory(passage_id)
-            _ = self.passage_store.pop(passage_id, None)
-            self._apply_ppmi()
+            record = self.passage_store.pop(passage_id, None)
+            if record is not None:
+                self.ppmi.remove_document(self._normalize_concepts(record.get("concepts")))
             self._save_graph()
             return existed
 
     def close(self) -> None:
         self._stop_event.set()
-        if self._maintenance_thread.is_alive():
-            self._maintenance_thread.join(timeout=1.0)
+        self._dirty_event.set()
+        for thread in (self._maintenance_thread, self._flush_thread):
+            if thread.is_alive() and thread is not threading.current_thread():
+                thread.join(timeout=1.0)
+        self.flush()
 
     def __del__(self) -> None:
         try:
@@ -139,21 +176,51 @@ class EMGASEngine(MemoryEngineBase):
 
     def _maintenance_loop(self) -> None:
         while not self._stop_event.wait(self._maintenance_interval_seconds):
-            with self._lock:
-                self.graph.apply_decay(lambda_rate=self.decay_rate)
-                self.graph.prune(threshold=self.prune_threshold)
-                self._sync_passage_store_after_prune()
-                self._save_graph()
+            self.run_maintenance()
 
-    def _sync_passage_store_after_prune(self) -> None:
-        remained_passages: set[str] = {
-            node_id.split("::", 1)[1]
-            for node_id, node in self.graph.nodes.items()
-            if node.node_type == "passage" and "::" in node_id
-        }
-        for passage_id in list(self.passage_store.keys()):
-            if passage_id not in remained_passages:
-                del self.passage_store[passage_id]
+    def run_maintenance(self) -> list[str]:
+        """刷新 PPMI、剪除已到期节点并编译 CSR 快照，返回被剪除的节点 id"""
+        with self._lock:
+            version = self.graph.version
+            self._refresh_ppmi()
+            # 衰减在读取时计算，这里只弹出已到期的节点，不再遍历全图
+            removed = self.graph.prune(threshold=self.prune_threshold)
+            self._sync_passage_store_after_prune(removed)
+            if self.graph.version != version:
+                self._save_graph()
+            # 检索只在快照与图版本一致时使用 CSR 路径，编译放在维护任务中
+            _ = self.graph.compile()
+            return removed
+
+    def _flush_loop(self) -> None:
+        while not self._stop_event.is_set():
+            _ = self._dirty_event.wait()
+            if self._stop_event.is_set():
+                break
+            # 防抖：等到 flush_delay 内没有新的写入再落盘，持续写入时最长等待 flush_max_delay
+            started = time.monotonic()
+            while not self._stop_event.is_set():
+                seen = self._dirty_gen
+                if self._stop_event.wait(self.flush_delay):
+                    break
+                if self._dirty_gen == seen or time.monotonic() - started >= self.flush_max_delay:
+                    break
+            if self._stop_event.is_set():
+                break
+            try:
+                self.flush()
+            except Exception:
+                # 写入失败时保留脏标记，等待下一次写入或关闭时重试
+                self._dirty_event.set()
+                _ = self._stop_event.wait(self.flush_delay)
+
+    def _sync_passage_store_after_prune(self, removed: list[str]) -> None:
+        for node_id in removed:
+            if not node_id.startswith("passage::"):
+                continue
+            record = self.passage_store.pop(node_id.split("::", 1)[1], None)
+            if record is not None:
+                self.ppmi.remove_document(self._normalize_concepts(record.get("concepts")))
 
     def _normalize_add_payload(
         self, key: str, value: object
@@ -184,23 +251,14 @@ class EMGASEngine(MemoryEngineBase):
         payload["concepts"] = dedup_concepts
         return passage_id, content, dedup_concepts, payload
 
-    def _apply_ppmi(self) -> None:
-        typed_documents: list[list[str]] = []
-        for record in self.passage_store.values():
-            raw_concepts = record.get("concepts")
-            doc = self._normalize_concepts(raw_concepts)
-            if doc:
-                typed_documents.append(doc)
-        if not typed_documents:
-            return
-
-        cooccurrence = build_cooccurrence_matrix(typed_documents)
-        total_pairs = sum(cooccurrence.values())
-        if total_pairs <= 0:
-            return
-
-        concept_counts = Counter(token for doc in typed_documents for token in doc)
-        ppmi_scores = compute_ppmi(cooccurrence, concept_counts, total_pairs)
+    def _refresh_ppmi(self) -> None:
+        """把计数变化过的行的 PPMI 写回概念边（写入只更新计数，重算推迟到检索/维护时）"""
+        ppmi_scores: dict[tuple[str, str], float] = {}
+        for from_id, row in self.ppmi.take_dirty_rows().items():
+            for to_id, score in row.items():
+                # 共现计数对称，脏行两个方向的边都需要更新
+                ppmi_scores[(from_id, to_id)] = score
+                ppmi_scores[(to_id, from_id)] = score
 
         for (from_id, to_id), score in ppmi_scores.items():
             if score <= 0:
@@ -216,16 +274,57 @@ class EMGASEngine(MemoryEngineBase):
             if edge is None:
                 self.graph.add_edge(from_id, to_id, weight=score)
             else:
-                edge.weight = max(0.01, float(score))
+                self.graph.set_edge_weight(from_id, to_id, max(0.01, float(score)))
 
     def _load_graph(self) -> None:
-        if not self.graph_path.exists():
-            return
-        self.graph = EMGASGraph.load(str(self.graph_path))
+        snapshot_path = self.snapshot_path
+        if snapshot_path.exists():
+            try:
+                self.graph = load_snapshot(snapshot_path)
+            except Exception as exc:
+                # 损坏的快照移到一旁保留，避免下次落盘把它覆盖成空图
+                stale_json = (
+                    self.graph_path.exists()
+                    and self.graph_path.stat().st_mtime < snapshot_path.stat().st_mtime
+                )
+                corrupt_path = snapshot_path.with_name(snapshot_path.name + ".corrupt")
+                try:
+                    _ = snapshot_path.replace(corrupt_path)
+                except OSError:
+                    pass
+                logger.warning(
+                    f"[Memory] EMGAS 快照读取失败，已另存为 {corrupt_path.name}: {exc}"
+                )
+                if stale_json:
+                    # 旧版 JSON 早于快照，回退会丢失之后的变更并被当作最新状态写回
+                    logger.warning("[Memory] EMGAS 旧版 JSON 早于快照，不回退加载")
+                    return
+            else:
+                self.graph.configure_decay(self.decay_rate, self.prune_threshold)
+                return
+        # 旧版 JSON 状态：加载后下次落盘写为二进制快照
+        if self.graph_path.exists():
+            self.graph = EMGASGraph.load(str(self.graph_path))
+            self.graph.configure_decay(self.decay_rate, self.prune_threshold)
 
     def _save_graph(self) -> None:
-        self.graph_path.parent.mkdir(parents=True, exist_ok=True)
-        self.graph.save(str(self.graph_path))
+        """标记图已变更；实际写盘由后台线程防抖执行"""
+        self._dirty_gen += 1
+        self._dirty_event.set()
+
+    def flush(self) -> bool:
+        """把未落盘的变更写入二进制快照（锁内编码，锁外原子写文件），返回是否写入"""
+        with self._flush_lock:
+            with self._lock:
+                gen = self._dirty_gen
+                if gen == self._flushed_gen:
+                    self._dirty_event.clear()
+                    return False
+                self._dirty_event.clear()
+                data = encode_graph(self.graph)
+            atomic_write_bytes(self.snapshot_path, data)
+            self._flushed_gen = gen
+            return True
 
     def _normalize_concepts(self, raw_concepts: object) -> list[str]:
         if not isinstance(raw_concepts, list):
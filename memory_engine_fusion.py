@@ -0,0 +1,310 @@
+"""Fusion 引擎：并发运行多个子引擎，按倒数排名融合（RRF）合并结果"""
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import asdict, dataclass
+import threading
+import time
+from typing import Any
+
+from nekro_agent.core import logger
+
+from .mem0_executor import PRIORITY_INTERACTIVE, get_mem0_executor, in_mem0_worker
+from .mem0_output_formatter import normalize_results
+from .memory_engine_base import MemoryEngineBase, register_engine
+from .memory_engine_router import acquire_engine
+
+
+@dataclass
+class FusionEngineStats:
+    """单个子引擎的调用统计"""
+
+    calls: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    total_latency_ms: float = 0.0
+    contributed: int = 0
+
+    @property
+    def avg_latency_ms(self) -> float:
+        return self.total_latency_ms / self.calls if self.calls else 0.0
+
+
+@register_engine("fusion")
+class FusionEngine(MemoryEngineBase):
+    """Fusion 引擎：子引擎各自限时并发检索，超时者直接丢弃，其余结果按 RRF 融合。
+
+    FUSION_ENGINES 形如 "basic,hippo:2.5"，冒号后为该子引擎的单独时限（秒）。
+    结果按 RRF 排序；score 为各子引擎归一化相关度的最大值，子引擎原始分数保留在 engine_score。
+    子引擎通过路由注册表获取并由其管理生命周期；写入会转发给各子引擎；basic 仅是 mem0 的直通封装，若其他子引擎已负责写入 mem0 则跳过 basic，避免重复写入。
+    """
+
+    def __init__(self, config: Any) -> None:
+        self.config: Any = config
+        self.rrf_k: int = max(1, int(getattr(config, "FUSION_RRF_K", 60)))
+        self.default_timeout: float = float(getattr(config, "FUSION_ENGINE_TIMEOUT", 1.5))
+        self.engine_specs: list[tuple[str, float]] = self._parse_engine_specs(
+            str(getattr(config, "FUSION_ENGINES", "basic,hippo") or "")
+        )
+        self.engines: dict[str, MemoryEngineBase] = {}
+        self.stats: dict[str, FusionEngineStats] = {
+            name: FusionEngineStats() for name, _ in self.engine_specs
+        }
+        # 同步检索在多个线程并发执行，统计计数需加锁
+        self._stats_lock: threading.Lock = threading.Lock()
+        # 调用方本身就是 mem0 线程池工作线程时使用的独立线程池（首次需要时创建）
+        self._fallback_pool: ThreadPoolExecutor | None = None
+        self._fallback_lock: threading.Lock = threading.Lock()
+        self._client: Any = None
+
+    @property
+    def client(self) -> Any:
+        return self._client
+
+    @client.setter
+    def client(self, value: Any) -> None:
+        # 路由层复用实例时会刷新 client，需同步给持有 mem0 客户端的子引擎
+        self._client = value
+        for engine in self.engines.values():
+            if hasattr(engine, "client"):
+                setattr(engine, "client", value)
+
+    async def initialize(self) -> None:
+        for name, _ in self.engine_specs:
+            try:
+                # 子引擎取自路由注册表，与单独使用该引擎时是同一实例，不会出现两个实例写同一份状态
+                engine = await acquire_engine(name, self.config, root=False)
+            except Exception as exc:
+                logger.warning(f"[Memory] Fusion 子引擎 {name} 初始化失败，已跳过: {exc}")
+                continue
+            self.engines[name] = engine
+            if self._client is None and hasattr(engine, "client"):
+                self._client = getattr(engine, "client")
+
+    def add_memory(self, key: str, value: object) -> None:
+        for engine in self._write_targets():
+            engine.add_memory(key, value)
+
+    def search_memory(self, query: str, **kwargs) -> list[dict[str, object]]:
+        """同步检索：子引擎经线程池并发执行并按各自时限等待，可在运行中的事件循环内调用。
+
+        调用方已是 mem0 线程池的工作线程时改用独立线程池，避免池被占满时子检索排队到超时。
+        """
+        if not query or not self.engines:
+            return []
+
+        names = [name for name, _ in self.engine_specs if name in self.engines]
+        started = time.perf_counter()
+        futures = [
+            self._submit_search(self.engines[name], query, kwargs) for name in names
+        ]
+        outcomes: list[list[dict[str, Any]]] = []
+        for name, future in zip(names, futures):
+            timeout = self._timeout_for(name)
+            outcome = "ok"
+            try:
+                remaining = max(0.0, timeout - (time.perf_counter() - started))
+                outcomes.append(normalize_results(future.result(timeout=remaining)))
+            except FutureTimeoutError:
+                _ = future.cancel()
+                outcome = "timeout"
+                logger.debug(f"[Memory] Fusion 子引擎 {name} 超过 {timeout}s，已丢弃其结果")
+                outcomes.append([])
+            except Exception as exc:
+                outcome = "error"
+                logger.warning(f"[Memory] Fusion 子引擎 {name} 检索失败: {exc}")
+                outcomes.append([])
+            self._record_call(name, outcome, (time.perf_counter() - started) * 1000.0)
+        return self._fuse(names, outcomes, kwargs)
+
+    def _submit_search(
+        self, engine: MemoryEngineBase, query: str, kwargs: dict[str, Any]
+    ) -> Future:
+        if not in_mem0_worker():
+            return get_mem0_executor().submit(
+                PRIORITY_INTERACTIVE, engine.search_memory, query, **kwargs
+            )
+        with self._fallback_lock:
+            if self._fallback_pool is None:
+                self._fallback_pool = ThreadPoolExecutor(
+                    max_workers=max(1, 2 * len(self.engine_specs)),
+                    thread_name_prefix="mem0-fusion",
+                )
+            return self._fallback_pool.submit(engine.search_memory, query, **kwargs)
+
+    def remove_memory(self, key: str) -> bool:
+        removed = False
+        for engine in self._write_targets():
+            removed = engine.remove_memory(key) or removed
+        return removed
+
+    async def aadd_memory(self, key: str, value: object) -> None:
+        await asyncio.gather(
+            *(engine.aadd_memory(key, value) for engine in self._write_targets())
+        )
+
+    async def aremove_memory(self, key: str) -> bool:
+        results = await asyncio.gather(
+            *(engine.aremove_memory(key) for engine in self._write_targets())
+        )
+        return any(results)
+
+    async def asearch_memory(self, query: str, **kwargs) -> list[dict[str, object]]:
+        if not query or not self.engines:
+            return []
+
+        names = [name for name, _ in self.engine_specs if name in self.engines]
+        outcomes = await asyncio.gather(
+            *(self._search_engine(name, query, kwargs) for name in names)
+        )
+        return self._fuse(names, list(outcomes), kwargs)
+
+    def _fuse(
+        self, names: list[str], outcomes: list[list[dict[str, Any]]], kwargs: dict[str, Any]
+    ) -> list[dict[str, object]]:
+        ranked_lists = [(name, results) for name, results in zip(names, outcomes) if results]
+        if not ranked_lists:
+            return []
+
+        fused = self._reciprocal_rank_fusion(ranked_lists)
+        limit = kwargs.get("limit")
+        if isinstance(limit, int) and limit > 0:
+            fused = fused[:limit]
+
+        with self._stats_lock:
+            for item in fused:
+                for name in item.get("fusion_engines", []):
+                    self.stats[name].contributed += 1
+        return fused
+
+    def _record_call(self, name: str, outcome: str, latency_ms: float) -> None:
+        with self._stats_lock:
+            stats = self.stats[name]
+            stats.calls += 1
+            stats.total_latency_ms += latency_ms
+            if outcome == "timeout":
+                stats.timeouts += 1
+            elif outcome == "error":
+                stats.errors += 1
+
+    def get_stats(self) -> dict[str, dict[str, float]]:
+        """返回各子引擎的调用次数、超时/错误次数、平均延迟与贡献结果数"""
+        with self._stats_lock:
+            return {
+                name: {**asdict(stats), "avg_latency_ms": stats.avg_latency_ms}
+                for name, stats in self.stats.items()
+            }
+
+    def close(self) -> None:
+        # 子引擎归路由注册表所有，由注册表负责关闭
+        self.engines.clear()
+        with self._fallback_lock:
+            pool, self._fallback_pool = self._fallback_pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    async def _search_engine(
+        self, name: str, query: str, kwargs: dict[str, Any]
+    ) -> list[dict[str, Any]]:
+        engine = self.engines[name]
+        timeout = self._timeout_for(name)
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            raw = await asyncio.wait_for(engine.asearch_memory(query, **kwargs), timeout=timeout)
+            return normalize_results(raw)
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            logger.debug(f"[Memory] Fusion 子引擎 {name} 超过 {timeout}s，已丢弃其结果")
+            return []
+        except Exception as exc:
+            outcome = "error"
+            logger.warning(f"[Memory] Fusion 子引擎 {name} 检索失败: {exc}")
+            return []
+        finally:
+            self._record_call(name, outcome, (time.perf_counter() - started) * 1000.0)
+
+    def _reciprocal_rank_fusion(
+        self, ranked_lists: list[tuple[str, list[dict[str, Any]]]]
+    ) -> list[dict[str, Any]]:
+        """RRF：fusion_score = Σ 1 / (k + rank)，只用于排序；记录保留优先级最高子引擎返回的字段。
+
+        score 取各子引擎相关度的最大值（见 _relevance_scores），阈值过滤与重要度加权仍基于相关度；
+        优先级最高子引擎的原始分数移到 engine_score。
+        """
+        merged: dict[str, dict[str, Any]] = {}
+        for name, results in ranked_lists:
+            relevance = self._relevance_scores(results)
+            for rank, (item, item_relevance) in enumerate(zip(results, relevance), start=1):
+                key = self._result_key(item)
+                if not key:
+                    continue
+                contribution = 1.0 / (self.rrf_k + rank)
+                existing = merged.get(key)
+                if existing is None:
+                    record = dict(item)
+                    record["engine_score"] = record.pop("score", None)
+                    record["score"] = item_relevance
+                    record["fusion_score"] = contribution
+                    record["fusion_engines"] = [name]
+                    merged[key] = record
+                    continue
+                existing["fusion_score"] += contribution
+                existing["score"] = max(existing["score"], item_relevance)
+                if name not in existing["fusion_engines"]:
+                    existing["fusion_engines"].append(name)
+
+        return sorted(merged.values(), key=lambda x: float(x["fusion_score"]), reverse=True)
+
+    @staticmethod
+    def _relevance_scores(results: list[dict[str, Any]]) -> list[float]:
+        """按子引擎归一化相关度：分数本就在 [0, 1] 内的引擎原样使用（无关结果仍是低分），
+        分数无上界的引擎（如 EMGAS 激活值）按该列表最高分缩放到 [0, 1]；缺失分数记为 0"""
+        raw: list[float] = []
+        for item in results:
+            value = item.get("score")
+            raw.append(max(0.0, float(value)) if isinstance(value, (int, float)) else 0.0)
+        scale = max([1.0, *raw])
+        return [value / scale for value in raw]
+
+    def _result_key(self, item: dict[str, Any]) -> str:
+        for key in ("id", "memory_id"):
+            value = item.get(key)
+            if value:
+                return f"id::{value}"
+        text = item.get("memory") or item.get("content") or item.get("text")
+        return f"text::{str(text).strip()}" if text else ""
+
+    def _timeout_for(self, name: str) -> float:
+        for spec_name, timeout in self.engine_specs:
+            if spec_name == name:
+                return timeout
+        return self.default_timeout
+
+    def _write_targets(self) -> list[MemoryEngineBase]:
+        targets = [
+            engine for name, engine in self.engines.items()
+            if name != "basic"
+        ]
+        if "basic" in self.engines and not any(hasattr(e, "client") for e in targets):
+            targets.insert(0, self.engines["basic"])
+        return targets
+
+    def _parse_engine_specs(self, raw: str) -> list[tuple[str, float]]:
+        specs: list[tuple[str, float]] = []
+        seen: set[str] = set()
+        for part in raw.split(","):
+            name, _, timeout_text = part.strip().partition(":")
+            name = name.strip().lower()
+            if not name or name == "fusion" or name in seen:
+                continue
+            timeout = self.default_timeout
+            if timeout_text.strip():
+                try:
+                    timeout = float(timeout_text)
+                except ValueError:
+                    logger.warning(f"[Memory] Fusion 子引擎 {name} 的时限无效: {timeout_text}")
+            specs.append((name, max(0.01, timeout)))
+            seen.add(name)
+        return specs
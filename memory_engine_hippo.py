@@ -1,19 +1,57 @@
 from __future__ import annotations
 
-import json
+import asyncio
+from collections import OrderedDict
 from pathlib import Path
-from typing import Any
+import threading
+from typing import Any, Callable, TypeVar
 from uuid import uuid4
 
-from .hippo_alias_merge import apply_alias_mapping, consolidate_entity_aliases
-from .hippo_entity_extraction import extract_entities
-from .hippo_pagerank import HippoGraphIndex
+from nekro_agent.core import logger
+
+from .hippo_entity_extraction import (
+    Triple,
+    configure_entity_cache,
+    entity_cache_stats,
+    extract_entities,
+    extract_entities_batch,
+    normalize_text,
+)
+from .hippo_partition import (
+    DEFAULT_PARTITION,
+    HippoPartition,
+    HippoPassageDirectory,
+    ScopeKey,
+    partition_id_for,
+)
+from .hippo_passage_store import HippoPassageStore
+from .hippo_triple_pipeline import TripleExtractionPipeline, build_chat_invoke, content_hash
+from .mem0_executor import PRIORITY_MAINTENANCE, get_mem0_executor
 from .mem0_utils import get_mem0_client
 from .memory_engine_base import MemoryEngineBase, register_engine
 
+_SCOPE_FIELDS = ("user_id", "agent_id", "run_id")
+
+_T = TypeVar("_T")
+
+
+class _PartitionReleasing(Exception):
+    """需要的分区刚被淘汰、仍在锁外释放：由 _locked 出锁等待后重试"""
+
+    def __init__(self, partition_id: str, done: threading.Event) -> None:
+        super().__init__(partition_id)
+        self.partition_id = partition_id
+        self.done = done
+
 
 @register_engine("hippo")
 class HippoEngine(MemoryEngineBase):
+    """HippoRAG 引擎：图与别名索引按作用域 (user_id, agent_id, run_id) 分区，正文存于 SQLite 正文库
+
+    分区在首次访问时从磁盘加载，常驻分区的估算内存超过 HIPPO_PARTITION_MEMORY_MB 时按 LRU 释放冷分区；
+    无作用域的写入与检索使用 default 分区（沿用旧版单文件 {memory_id}.json）。
+    """
+
     def __init__(self, config: Any, memory_id: str | None = None) -> None:
         self.config: Any = config
         self.client: Any = None
@@ -21,20 +59,57 @@ class HippoEngine(MemoryEngineBase):
         cfg_memory_id = getattr(config, "MEMORY_ID", None) if config is not None else None
         self.memory_id: str = (memory_id or cfg_memory_id or "default").strip() or "default"
 
-        self.graph = HippoGraphIndex()
-        self.alias_map: dict[str, str] = {}
-        self.memory_store: dict[str, dict[str, Any]] = {}
-
         self.ppr_alpha: float = float(getattr(config, "HIPPO_PPR_ALPHA", 0.15))
         self.hybrid_weight: float = float(getattr(config, "HIPPO_HYBRID_WEIGHT", 0.8))
         self.top_entities: int = int(getattr(config, "HIPPO_TOP_ENTITIES", 10))
         self.max_candidates: int = int(getattr(config, "HIPPO_MAX_CANDIDATES", 200))
+        self.ppr_tolerance: float = float(getattr(config, "HIPPO_PPR_TOLERANCE", 1e-6))
+        self.ppr_method: str = str(getattr(config, "HIPPO_PPR_METHOD", "power") or "power").strip().lower()
+        self.ppr_push_epsilon: float = float(getattr(config, "HIPPO_PPR_PUSH_EPSILON", 1e-4))
+        self.compact_every: int = int(getattr(config, "HIPPO_JOURNAL_COMPACT_OPS", 1000))
+        self.memory_budget: int = int(float(getattr(config, "HIPPO_PARTITION_MEMORY_MB", 256)) * 1024 * 1024)
+        self.graph_options: dict[str, int] = {
+            "ppr_cache_size": int(getattr(config, "HIPPO_PPR_CACHE_SIZE", 128)),
+            "ppr_cache_top_n": int(getattr(config, "HIPPO_PPR_CACHE_TOP_N", 512)),
+        }
 
-        self._persist_path = Path("data") / "chatluna" / "long-memory" / "hippo" / f"{self.memory_id}.json"
+        self.persist_root = Path("data") / "chatluna" / "long-memory" / "hippo"
+        # 已加载的分区，按最近访问排序（末尾最新）
+        self.partitions: OrderedDict[str, HippoPartition] = OrderedDict()
+        self.directory = HippoPassageDirectory(
+            self.persist_root / self.memory_id / "directory.json", compact_every=self.compact_every
+        )
+        self.evictions: int = 0
+        # 已摘除、仍在锁外等待日志压缩并关闭的分区；重新加载同一分区前需等其完成
+        self._releasing: dict[str, threading.Event] = {}
+        self.passage_store: HippoPassageStore | None = None
+        self.triple_extraction: bool = bool(getattr(config, "HIPPO_TRIPLE_EXTRACTION", False))
+        self.relation_weight: float = float(getattr(config, "HIPPO_RELATION_EDGE_WEIGHT", 2.0))
+        self.triple_pipeline: TripleExtractionPipeline | None = None
+        configure_entity_cache(int(getattr(config, "HIPPO_ENTITY_CACHE_SIZE", 4096)))
+        # 搜索/写入在线程池中并发执行，分区表、图与别名表的读写需串行化
+        self._lock: threading.RLock = threading.RLock()
 
     async def initialize(self) -> None:
         self.client = await get_mem0_client()
-        self._load_state()
+        await asyncio.to_thread(self._load_state)
+        if self.triple_extraction and self.triple_pipeline is None:
+            self.start_triple_pipeline(build_chat_invoke(self.config))
+
+    def start_triple_pipeline(self, llm_invoke: Any) -> TripleExtractionPipeline:
+        """在当前事件循环启动后台三元组抽取（需在事件循环中调用）"""
+        self.triple_pipeline = TripleExtractionPipeline(
+            llm_invoke,
+            self._on_triples,
+            concurrency=int(getattr(self.config, "HIPPO_TRIPLE_CONCURRENCY", 2)),
+            batch_size=int(getattr(self.config, "HIPPO_TRIPLE_BATCH_SIZE", 8)),
+            batch_window=float(getattr(self.config, "HIPPO_TRIPLE_BATCH_WINDOW_MS", 500)) / 1000.0,
+        )
+        return self.triple_pipeline
+
+    def _load_state(self) -> None:
+        with self._lock:
+            self.directory.load()
 
     def add_memory(self, key: str, value: object) -> None:
         passage_id = self._normalize_passage_id(key)
@@ -42,20 +117,36 @@ class HippoEngine(MemoryEngineBase):
         if not content:
             return
 
+        scope = self._scope_for_add(key, value)
         entities = extract_entities(content)
-        normalized_entities = self._normalize_entities(entities)
 
-        self.memory_store[passage_id] = {
-            "content": content,
-            "entities": normalized_entities,
-        }
-        self.graph.add_memory(content, passage_id=passage_id, entities=normalized_entities)
+        def _add_locked() -> tuple[HippoPartition, list[str], list[tuple[HippoPartition, threading.Event]]]:
+            partition = self.partition(scope)
+            previous = self.directory.get(passage_id)
+            if previous is not None and previous != partition.partition_id:
+                # 同一 passage 改写到其他作用域：先从原分区移除
+                self._partition_by_id(previous).remove(passage_id)
+            normalized_entities = partition.normalize_entities(entities)
+            partition.add(
+                passage_id,
+                content,
+                normalized_entities,
+                raw_entities=[str(e).strip() for e in entities if str(e).strip()],
+            )
+            self.directory.set(passage_id, partition.partition_id)
+            return partition, normalized_entities, self._evict_cold_partitions(keep=partition.partition_id)
+
+        partition, normalized_entities, evicted = self._locked(_add_locked)
+        self._release_partitions(evicted)
+
+        if self.triple_pipeline is not None:
+            self.triple_pipeline.submit((partition.partition_id, passage_id), content)
 
         if self.client is not None:
             try:
                 self.client.add(
                     content,
-                    user_id=key,
+                    **self._scope_kwargs(scope),
                     metadata={
                         "hippo_passage_id": passage_id,
                         "hippo_entities": normalized_entities,
@@ -64,20 +155,35 @@ class HippoEngine(MemoryEngineBase):
             except Exception:
                 pass
 
-        self._save_state()
-
     def search_memory(self, query: str, **kwargs) -> list[dict[str, object]]:
         query_text = (query or "").strip()
         if not query_text:
             return []
 
-        query_entities = self._normalize_entities(extract_entities(query_text))
-        ppr_scores = self.graph.ppr(query_entities, alpha=self._clamp(self.ppr_alpha), max_iter=20)
-        ppr_candidates = self.graph.get_candidates_by_ppr(
-            ppr_scores,
-            top_entities=max(1, self.top_entities),
-            max_candidates=max(1, self.max_candidates),
-        )
+        scope = self._scope_from_kwargs(kwargs)
+        raw_query_entities = extract_entities(query_text)
+
+        def _rank_locked() -> tuple[HippoPartition, Any, Any, Any, list[tuple[HippoPartition, threading.Event]]]:
+            partition = self.partition(scope)
+            graph = partition.graph
+            ppr_scores = graph.ppr(
+                partition.canonical_entities(raw_query_entities),
+                alpha=self._clamp(self.ppr_alpha),
+                max_iter=20,
+                tol=self.ppr_tolerance,
+                method=self.ppr_method,
+                epsilon=self.ppr_push_epsilon,
+            )
+            ppr_candidates = graph.get_candidates_by_ppr(
+                ppr_scores,
+                top_entities=max(1, self.top_entities),
+                max_candidates=max(1, self.max_candidates),
+            )
+            evicted = self._evict_cold_partitions(keep=partition.partition_id)
+            return partition, graph, ppr_scores, ppr_candidates, evicted
+
+        partition, graph, ppr_scores, ppr_candidates, evicted = self._locked(_rank_locked)
+        self._release_partitions(evicted)
 
         semantic_results: list[dict[str, Any]] = []
         if self.client is not None:
@@ -89,66 +195,79 @@ class HippoEngine(MemoryEngineBase):
                 semantic_results = []
 
         merged: dict[str, dict[str, Any]] = {}
-
-        for item in semantic_results:
-            pid = self._extract_passage_id(item)
-            if not pid:
-                continue
-
-            content = self._extract_result_content(item)
-            if not content and pid in self.memory_store:
-                content = str(self.memory_store[pid].get("content", ""))
-
-            entities = self._extract_result_entities(item)
-            if not entities and pid in self.memory_store:
-                entities = [str(e) for e in self.memory_store[pid].get("entities", [])]
-            entities = self._normalize_entities(entities)
-
-            semantic_score = self._normalize_semantic_score(item)
-            ppr_score = self.graph.score_content_by_ppr(entities, ppr_scores)
-            hybrid_score = self._hybrid_score(semantic_score, ppr_score)
-
-            merged[pid] = {
-                **item,
-                "id": pid,
-                "memory": content,
-                "entities": entities,
-                "semantic_score": semantic_score,
-                "ppr_score": ppr_score,
-                "score": hybrid_score,
-                "hybrid_score": hybrid_score,
-            }
-
-        for pid in ppr_candidates:
-            if pid in merged:
-                continue
-            record = self.memory_store.get(pid)
-            if not record:
-                continue
-            entities = [str(e) for e in record.get("entities", [])]
-            ppr_score = self.graph.score_content_by_ppr(entities, ppr_scores)
-            hybrid_score = self._hybrid_score(0.0, ppr_score)
-            merged[pid] = {
-                "id": pid,
-                "memory": str(record.get("content", "")),
-                "entities": entities,
-                "semantic_score": 0.0,
-                "ppr_score": ppr_score,
-                "score": hybrid_score,
-                "hybrid_score": hybrid_score,
-            }
+        # 缺少 hippo_entities 元数据的结果在锁外一次批量提取
+        result_entities = self._extract_results_entities(semantic_results)
+
+        with self._lock:
+            passage_entities = graph.passage_entities
+            for item, entities in zip(semantic_results, result_entities):
+                pid = self._extract_passage_id(item)
+                if not pid:
+                    continue
+
+                content = self._extract_result_content(item)
+                if not entities and pid in passage_entities:
+                    entities = list(passage_entities[pid])
+                entities = partition.canonical_entities(entities)
+
+                semantic_score = self._normalize_semantic_score(item)
+                ppr_score = graph.score_content_by_ppr(entities, ppr_scores)
+                hybrid_score = self._hybrid_score(semantic_score, ppr_score)
+
+                merged[pid] = {
+                    **item,
+                    "id": pid,
+                    "memory": content,
+                    "entities": entities,
+                    "semantic_score": semantic_score,
+                    "ppr_score": ppr_score,
+                    "score": hybrid_score,
+                    "hybrid_score": hybrid_score,
+                }
+
+            ppr_only: set[str] = set()
+            for pid in ppr_candidates:
+                if pid in merged or pid not in passage_entities:
+                    continue
+                ppr_only.add(pid)
+                entities = list(passage_entities[pid])
+                ppr_score = graph.score_content_by_ppr(entities, ppr_scores)
+                hybrid_score = self._hybrid_score(0.0, ppr_score)
+                merged[pid] = {
+                    "id": pid,
+                    "memory": "",
+                    "entities": entities,
+                    "semantic_score": 0.0,
+                    "ppr_score": ppr_score,
+                    "score": hybrid_score,
+                    "hybrid_score": hybrid_score,
+                }
 
         ranked = sorted(merged.values(), key=lambda x: float(x.get("hybrid_score", 0.0)), reverse=True)
-        return ranked[: max(1, self.max_candidates)]
+        ranked = ranked[: max(1, self.max_candidates)]
+
+        # 只为最终返回且缺少正文的记忆（主要是 PPR 候选）从正文库批量读取正文
+        missing = [item["id"] for item in ranked if not item["memory"]]
+        if missing:
+            records = partition.memory_store.get_many(missing)
+            for item in ranked:
+                if not item["memory"] and item["id"] in records:
+                    item["memory"] = str(records[item["id"]].get("content", ""))
+            # 并发删除的 PPR 候选已无正文，丢弃
+            ranked = [item for item in ranked if item["memory"] or item["id"] not in ppr_only]
+        return ranked
 
     def remove_memory(self, key: str) -> bool:
         pid = self._normalize_passage_id(key)
-        removed = False
 
-        if pid in self.memory_store:
-            self.memory_store.pop(pid, None)
-            self.graph.remove_memory(pid)
-            removed = True
+        def _remove_locked() -> bool:
+            # 旧版本写入的记忆不在目录中，都位于 default 分区
+            partition_id = self.directory.get(pid) or DEFAULT_PARTITION
+            found = self._partition_by_id(partition_id).remove(pid)
+            self.directory.discard(pid)
+            return found
+
+        removed = self._locked(_remove_locked)
 
         if self.client is not None:
             try:
@@ -157,10 +276,187 @@ class HippoEngine(MemoryEngineBase):
             except Exception:
                 pass
 
-        if removed:
-            self._save_state()
         return removed
 
+    def _on_triples(self, tag: Any, digest: str, triples: list[Triple]) -> None:
+        """抽取结果回调（事件循环线程）：写图需要引擎锁，交给维护线程执行，避免阻塞事件循环"""
+        if not triples:
+            return
+        try:
+            get_mem0_executor().submit(PRIORITY_MAINTENANCE, self.apply_triples, tag[0], tag[1], digest, triples)
+        except RuntimeError:
+            return
+
+    def apply_triples(self, partition_id: str, passage_id: str, digest: str, triples: list[Triple]) -> int:
+        """把三元组并入分区图；记忆已被删除、改写或迁移到其他作用域时丢弃结果"""
+        def _apply_locked() -> tuple[int, list[tuple[HippoPartition, threading.Event]]]:
+            if self.directory.get(passage_id) != partition_id:
+                return 0, []
+            partition = self._partition_by_id(partition_id)
+            record = partition.memory_store.get(passage_id)
+            if record is None or content_hash(str(record.get("content", ""))) != digest:
+                return 0, []
+            written = partition.add_relations(
+                passage_id,
+                [(normalize_text(t.subject), t.predicate, normalize_text(t.obj)) for t in triples],
+                weight=self.relation_weight,
+            )
+            return written, self._evict_cold_partitions(keep=partition_id)
+
+        written, evicted = self._locked(_apply_locked)
+        self._release_partitions(evicted)
+        if written:
+            logger.debug(f"[Memory] Hippo 记忆 {passage_id} 写入 {written} 条关系边")
+        return written
+
+    def get_stats(self) -> dict[str, Any]:
+        """返回分区常驻情况与 PPR 结果缓存的命中统计"""
+        with self._lock:
+            cache_totals: dict[str, float] = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "entries": 0}
+            for partition in self.partitions.values():
+                stats = partition.graph.ppr_cache_stats()
+                for name in cache_totals:
+                    cache_totals[name] += stats[name]
+            lookups = cache_totals["hits"] + cache_totals["misses"]
+            cache_totals["hit_rate"] = cache_totals["hits"] / lookups if lookups else 0.0
+            return {
+                "partitions": {
+                    "loaded": len(self.partitions),
+                    "approx_bytes": self._resident_bytes(),
+                    "budget_bytes": self.memory_budget,
+                    "evictions": self.evictions,
+                },
+                "ppr_cache": cache_totals,
+                "triples": dict(self.triple_pipeline.stats) if self.triple_pipeline is not None else {},
+                "entity_cache": entity_cache_stats(),
+            }
+
+    def close(self) -> None:
+        """停止三元组抽取，把各分区与目录的剩余日志压缩进快照后关闭日志文件"""
+        if self.triple_pipeline is not None:
+            self.triple_pipeline.close()
+            self.triple_pipeline = None
+        with self._lock:
+            for partition in self.partitions.values():
+                partition.close()
+            self.partitions.clear()
+            for released in list(self._releasing.values()):
+                _ = released.wait(30.0)
+            self._releasing.clear()
+            self.directory.close()
+            if self.passage_store is not None:
+                self.passage_store.close()
+                self.passage_store = None
+
+    def _locked(self, body: Callable[[], _T]) -> _T:
+        """持引擎锁执行 body；需要的分区仍在锁外释放时先出锁等待释放完成，再重新加锁从头执行。
+
+        body 在取得所需分区之前不能修改引擎状态，重试时才不会重复生效。
+        """
+        while True:
+            with self._lock:
+                try:
+                    return body()
+                except _PartitionReleasing as pending:
+                    releasing = pending
+            if not releasing.done.wait(30.0):
+                logger.warning(f"[Memory] 等待 Hippo 分区 {releasing.partition_id} 释放超时，直接重新加载")
+                releasing.done.set()
+
+    def partition(self, scope: ScopeKey) -> HippoPartition:
+        """获取作用域对应的分区（调用方持有 self._lock），未加载时从磁盘懒加载
+
+        分区仍在锁外释放时抛出 _PartitionReleasing，需经 _locked 调用。
+        """
+        return self._partition_by_id(partition_id_for(scope))
+
+    def _partition_by_id(self, partition_id: str) -> HippoPartition:
+        partition = self.partitions.get(partition_id)
+        if partition is not None:
+            self.partitions.move_to_end(partition_id)
+            return partition
+        releasing = self._releasing.get(partition_id)
+        if releasing is not None and not releasing.is_set():
+            # 刚被淘汰的分区：锁外的压缩与关闭完成前不能重新加载，避免与新实例同时读写日志；
+            # 持锁等待会阻塞所有作用域，交由 _locked 出锁等待后重试
+            raise _PartitionReleasing(partition_id, releasing)
+        self._releasing.pop(partition_id, None)
+        partition = HippoPartition(
+            partition_id,
+            self._partition_path(partition_id),
+            compact_every=self.compact_every,
+            graph_options=self.graph_options,
+            passage_store=self._passages(),
+        )
+        partition.load()
+        self.partitions[partition_id] = partition
+        return partition
+
+    def _passages(self) -> HippoPassageStore:
+        """所有分区共用的正文库（首次使用时打开）"""
+        if self.passage_store is None:
+            self.passage_store = HippoPassageStore(self.persist_root / self.memory_id / "passages.sqlite3")
+        return self.passage_store
+
+    def _partition_path(self, partition_id: str) -> Path:
+        if partition_id == DEFAULT_PARTITION:
+            # default 分区沿用旧版单文件路径，升级前的数据无需迁移
+            return self.persist_root / f"{self.memory_id}.json"
+        return self.persist_root / self.memory_id / f"{partition_id}.json"
+
+    def _resident_bytes(self) -> int:
+        return sum(partition.approx_bytes for partition in self.partitions.values())
+
+    def _evict_cold_partitions(self, keep: str) -> list[tuple[HippoPartition, threading.Event]]:
+        """常驻内存超出预算时按 LRU 摘除分区（不摘除当前正在使用的分区）；
+        摘除的分区交给调用方出锁后用 _release_partitions 释放，等待日志压缩时不占用引擎锁
+        """
+        for partition_id in [pid for pid, done in self._releasing.items() if done.is_set()]:
+            del self._releasing[partition_id]
+        evicted: list[tuple[HippoPartition, threading.Event]] = []
+        while self._resident_bytes() > self.memory_budget and len(self.partitions) > 1:
+            partition_id = next(iter(self.partitions))
+            if partition_id == keep:
+                self.partitions.move_to_end(partition_id)
+                continue
+            partition = self.partitions.pop(partition_id)
+            done = threading.Event()
+            self._releasing[partition_id] = done
+            evicted.append((partition, done))
+            self.evictions += 1
+        return evicted
+
+    def _release_partitions(self, evicted: list[tuple[HippoPartition, threading.Event]]) -> None:
+        """在引擎锁外释放已摘除的分区"""
+        for partition, done in evicted:
+            try:
+                partition.release()
+            except Exception as exc:
+                logger.warning(f"[Memory] 释放 Hippo 分区 {partition.partition_id} 失败: {exc}")
+            finally:
+                done.set()
+            logger.debug(
+                f"[Memory] Hippo 分区 {partition.partition_id} 已释放（约 {partition.approx_bytes} 字节）"
+            )
+
+    @staticmethod
+    def _scope_from_kwargs(kwargs: dict[str, Any]) -> ScopeKey:
+        def _clean(value: Any) -> str | None:
+            text = str(value).strip() if value is not None else ""
+            return text or None
+
+        return (_clean(kwargs.get("user_id")), _clean(kwargs.get("agent_id")), _clean(kwargs.get("run_id")))
+
+    def _scope_for_add(self, key: str, value: object) -> ScopeKey:
+        """写入作用域：value 携带 user_id/agent_id/run_id 时以其为准，否则与 mem0 写入一致使用 user_id=key"""
+        if isinstance(value, dict) and any(value.get(name) for name in _SCOPE_FIELDS):
+            return self._scope_from_kwargs(value)
+        return ((key or "").strip() or None, None, None)
+
+    @staticmethod
+    def _scope_kwargs(scope: ScopeKey) -> dict[str, str]:
+        return {name: value for name, value in zip(_SCOPE_FIELDS, scope) if value}
+
     def _normalize_passage_id(self, key: str) -> str:
         value = (key or "").strip()
         return value or f"hippo-{uuid4().hex}"
@@ -179,18 +475,6 @@ class HippoEngine(MemoryEngineBase):
             return str(getattr(value, "content", "")).strip()
         return str(value).strip()
 
-    def _normalize_entities(self, entities: list[str]) -> list[str]:
-        clean_entities = [str(entity).strip() for entity in entities if str(entity).strip()]
-        if not clean_entities:
-            return []
-
-        vocabulary = set(self.alias_map.keys())
-        vocabulary.update(self.alias_map.values())
-        vocabulary.update(clean_entities)
-
-        self.alias_map = consolidate_entity_aliases(list(vocabulary), threshold=0.85)
-        return apply_alias_mapping(clean_entities, self.alias_map)
-
     def _extract_passage_id(self, item: dict[str, Any]) -> str:
         for key in ("id", "memory_id"):
             value = item.get(key)
@@ -213,15 +497,23 @@ class HippoEngine(MemoryEngineBase):
                     return text
         return ""
 
-    def _extract_result_entities(self, item: dict[str, Any]) -> list[str]:
+    @staticmethod
+    def _metadata_entities(item: dict[str, Any]) -> list[str] | None:
         metadata = item.get("metadata")
         if isinstance(metadata, dict):
             values = metadata.get("hippo_entities")
             if isinstance(values, list):
                 return [str(v).strip() for v in values if str(v).strip()]
+        return None
 
-        content = self._extract_result_content(item)
-        return extract_entities(content) if content else []
+    def _extract_results_entities(self, items: list[dict[str, Any]]) -> list[list[str]]:
+        """检索结果的实体：优先使用写入时记录的 hippo_entities，其余按内容批量提取（带缓存）"""
+        entities = [self._metadata_entities(item) for item in items]
+        missing = [i for i, values in enumerate(entities) if values is None]
+        analyses = extract_entities_batch([self._extract_result_content(items[i]) for i in missing])
+        for i, analysis in zip(missing, analyses):
+            entities[i] = list(analysis.entities)
+        return [values or [] for values in entities]
 
     def _normalize_semantic_score(self, item: dict[str, Any]) -> float:
         raw = item.get("score")
@@ -250,77 +542,3 @@ class HippoEngine(MemoryEngineBase):
     @staticmethod
     def _clamp(value: float) -> float:
         return max(0.0, min(1.0, float(value)))
-
-    def _load_state(self) -> None:
-        path = self._persist_path
-        if not path.exists():
-            return
-
-        try:
-            data = json.loads(path.read_text(encoding="utf-8"))
-            if not isinstance(data, dict):
-                return
-
-            graph_payload = data.get("graph")
-            if isinstance(graph_payload, dict):
-                temp = HippoGraphIndex()
-                adj = graph_payload.get("adj", {})
-                postings = graph_payload.get("postings", {})
-                passage_entities = graph_payload.get("passage_entities", {})
-
-                if isinstance(adj, dict):
-                    for src, neighbors in adj.items():
-                        if not isinstance(neighbors, dict):
-                            continue
-                        temp.adj[str(src)] = {
-                            str(dst): float(weight)
-                            for dst, weight in neighbors.items()
-                            if isinstance(weight, (int, float, str))
-                        }
-
-                if isinstance(postings, dict):
-                    for entity, pids in postings.items():
-                        if isinstance(pids, list):
-                            temp.postings[str(entity)] = {str(pid) for pid in pids}
-
-                if isinstance(passage_entities, dict):
-                    for pid, entities in passage_entities.items():
-                        if isinstance(entities, list):
-                            temp.passage_entities[str(pid)] = [str(e) for e in entities]
-
-                self.graph = temp
-
-            alias_map = data.get("alias_map", {})
-            if isinstance(alias_map, dict):
-                self.alias_map = {str(k): str(v) for k, v in alias_map.items()}
-
-            memory_store = data.get("memory_store", {})
-            if isinstance(memory_store, dict):
-                normalized_store: dict[str, dict[str, Any]] = {}
-                for pid, record in memory_store.items():
-                    if not isinstance(record, dict):
-                        continue
-                    normalized_store[str(pid)] = {
-                        "content": str(record.get("content", "")),
-                        "entities": [str(e) for e in record.get("entities", []) if str(e).strip()],
-                    }
-                self.memory_store = normalized_store
-        except Exception:
-            return
-
-    def _save_state(self) -> None:
-        payload = {
-            "graph": {
-                "adj": {src: dict(neighbors) for src, neighbors in self.graph.adj.items()},
-                "postings": {entity: sorted(list(pids)) for entity, pids in self.graph.postings.items()},
-                "passage_entities": {
-                    pid: list(entities) for pid, entities in self.graph.passage_entities.items()
-                },
-            },
-            "alias_map": dict(self.alias_map),
-            "memory_store": self.memory_store,
-        }
-
-        path = self._persist_path
-        path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
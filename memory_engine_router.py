@@ -1,53 +1,175 @@
 """记忆引擎路由调度"""
 
-from typing import Dict, List, Any
-from .memory_engine_base import get_engine
+import asyncio
+from contextvars import ContextVar
+import hashlib
+import json
+from typing import Dict, List, Any, Optional, Set, Tuple
+
+from nekro_agent.core import logger
+
+from .memory_engine_base import MemoryEngineBase, get_engine
+from .mem0_embedding import embedding_scope
 from .mem0_output_formatter import normalize_results
+from .mem0_utils import get_mem0_client
 from .plugin import get_memory_config
 
+# (引擎名, memory_id) -> (配置指纹, 已初始化的引擎实例)
+_ENGINE_INSTANCES: Dict[Tuple[str, str], Tuple[str, MemoryEngineBase]] = {}
+# 按键加锁：fusion 初始化时获取子引擎不会与自身的创建互相等待
+_ENGINE_KEY_LOCKS: Dict[Tuple[str, str], asyncio.Lock] = {}
+# 当前对外服务的顶层引擎键，以及各顶层引擎初始化时获取的子引擎键
+_ROOT_KEY: Optional[Tuple[str, str]] = None
+_ROOT_DEPENDENCIES: Dict[Tuple[str, str], Set[Tuple[str, str]]] = {}
+_ACQUIRING_ROOT: ContextVar[Optional[Tuple[str, str]]] = ContextVar(
+    "nekro_mem0_acquiring_root", default=None
+)
+
+
+def _get_key_lock(key: Tuple[str, str]) -> asyncio.Lock:
+    lock = _ENGINE_KEY_LOCKS.get(key)
+    if lock is None:
+        lock = _ENGINE_KEY_LOCKS[key] = asyncio.Lock()
+    return lock
+
+
+def _config_fingerprint(config: Any) -> str:
+    """计算配置指纹，配置变更时据此替换引擎实例（MEMORY_ENGINE 只决定选用哪个引擎，不计入指纹）。"""
+    payload: Dict[str, Any]
+    if callable(getattr(config, "model_dump", None)):
+        try:
+            payload = dict(config.model_dump())
+        except Exception:
+            payload = dict(vars(config))
+    else:
+        payload = {k: v for k, v in vars(config).items() if not k.startswith("_")}
+    payload.pop("MEMORY_ENGINE", None)
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _config_memory_id(config: Any) -> str:
+    return str(getattr(config, "MEMORY_ID", "default") or "default").strip() or "default"
+
+
+def _close_engine(engine: MemoryEngineBase) -> None:
+    try:
+        engine.close()
+    except Exception as exc:
+        logger.warning(f"[Memory] 关闭引擎实例失败: {exc}")
+
+
+def _retire_other_engines(root_key: Tuple[str, str]) -> None:
+    """关闭顶层引擎及其子引擎之外的实例（MEMORY_ENGINE / MEMORY_ID / 子引擎列表变化后），
+    避免后台线程泄漏与多个实例写同一份日志。"""
+    global _ROOT_KEY
+    if _ROOT_KEY is not None and _ROOT_KEY != root_key:
+        logger.info(f"[Memory] 记忆引擎切换为 {root_key[0]}（memory_id={root_key[1]}），关闭其余实例")
+    _ROOT_KEY = root_key
+    keep = {root_key} | _ROOT_DEPENDENCIES.get(root_key, set())
+    for key in [key for key in _ENGINE_INSTANCES if key not in keep]:
+        _, engine = _ENGINE_INSTANCES.pop(key)
+        _ROOT_DEPENDENCIES.pop(key, None)
+        _close_engine(engine)
+
+
+async def acquire_engine(
+    engine_name: str, config: Any = None, *, root: bool = True
+) -> MemoryEngineBase:
+    """获取长期存活的引擎实例：按 (引擎名, memory_id, 配置指纹) 复用，配置变化时关闭并替换。
+
+    root=False 供组合引擎（fusion）在初始化时获取子引擎：子引擎与单独使用时是同一注册表实例，
+    顶层引擎切换时仍被新的顶层引擎依赖的实例会保留。
+    """
+    config = config if config is not None else get_memory_config()
+    engine_class = get_engine(engine_name)
+    key = (engine_name, _config_memory_id(config))
+    fingerprint = _config_fingerprint(config)
+    parent = _ACQUIRING_ROOT.get()
+    if not root and parent is not None:
+        _ROOT_DEPENDENCIES.setdefault(parent, set()).add(key)
+
+    cached = _ENGINE_INSTANCES.get(key)
+    if cached is not None and cached[0] == fingerprint:
+        engine = cached[1]
+        if hasattr(engine, "client"):
+            # mem0 客户端可能因模型组变更被重建，复用实例时同步最新客户端
+            setattr(engine, "client", await get_mem0_client())
+        if root and _ROOT_KEY != key:
+            _retire_other_engines(key)
+        return engine
+
+    async with _get_key_lock(key):
+        cached = _ENGINE_INSTANCES.get(key)
+        if cached is not None and cached[0] == fingerprint:
+            engine = cached[1]
+        else:
+            if cached is not None:
+                # 先关闭旧实例再创建新实例，两者不会同时持有同一份持久化文件
+                logger.info(f"[Memory] 引擎 {engine_name} 配置已变更，替换实例")
+                del _ENGINE_INSTANCES[key]
+                _close_engine(cached[1])
+
+            engine = engine_class(config)
+            token = _ACQUIRING_ROOT.set(key) if root else None
+            if root:
+                _ROOT_DEPENDENCIES[key] = set()
+            try:
+                if hasattr(engine, "initialize"):
+                    init_result = engine.initialize()
+                    if asyncio.iscoroutine(init_result):
+                        await init_result
+            finally:
+                if token is not None:
+                    _ACQUIRING_ROOT.reset(token)
+            _ENGINE_INSTANCES[key] = (fingerprint, engine)
+
+    if root:
+        _retire_other_engines(key)
+    return engine
+
+
+def close_all_engines() -> None:
+    """关闭并清空所有已缓存的引擎实例。"""
+    global _ROOT_KEY
+    _ROOT_KEY = None
+    _ROOT_DEPENDENCIES.clear()
+    instances = list(_ENGINE_INSTANCES.values())
+    _ENGINE_INSTANCES.clear()
+    for _, engine in instances:
+        _close_engine(engine)
+
 
 async def route_search(query: str | None, **kwargs) -> List[Dict[str, Any]]:
-    """路由搜索请求到对应引擎"""
+    """路由搜索请求到对应引擎；空查询直接返回空结果"""
+    if not query:
+        return []
     config = get_memory_config()
     engine_name = config.MEMORY_ENGINE
 
     try:
-        engine_class = get_engine(engine_name)
-        engine = engine_class(config)
-        if hasattr(engine, "initialize"):
-            await engine.initialize()
-        raw = engine.search_memory(query, **kwargs)
+        engine = await acquire_engine(engine_name, config)
+        raw = await engine.asearch_memory(query, **kwargs)
         return normalize_results(raw)
     except ValueError:
         # 引擎不存在，降级到 basic
         try:
-            engine_class = get_engine("basic")
-            engine = engine_class(config)
-            if hasattr(engine, "initialize"):
-                await engine.initialize()
-            raw = engine.search_memory(query, **kwargs)
+            engine = await acquire_engine("basic", config)
+            raw = await engine.asearch_memory(query, **kwargs)
             return normalize_results(raw)
         except ValueError:
             return []
 
 
-async def route_add(memory: str, **kwargs) -> Dict[str, Any]:
-    """路由添加请求到对应引擎"""
-    config = get_memory_config()
-    engine_name = config.MEMORY_ENGINE
+async def route_search_many(
+    query: str | None, scopes: List[Dict[str, Any]], **kwargs
+) -> List[List[Dict[str, Any]]]:
+    """同一查询在多个作用域上并发检索：查询向量只计算一次，结果顺序与 scopes 一致"""
+    if not scopes:
+        return []
+    with embedding_scope():
+        results = await asyncio.gather(
+            *(route_search(query, **{**kwargs, **scope}) for scope in scopes)
+        )
+    return list(results)
 
-    try:
-        engine_class = get_engine(engine_name)
-        engine = engine_class(config)
-        if hasattr(engine, "initialize"):
-            await engine.initialize()
-        return engine.add_memory(memory, **kwargs)
-    except ValueError:
-        try:
-            engine_class = get_engine("basic")
-            engine = engine_class(config)
-            if hasattr(engine, "initialize"):
-                await engine.initialize()
-            return engine.add_memory(memory, **kwargs)
-        except ValueError:
-            return {"ok": False, "error": "no engine available"}
@@ -170,6 +170,69 @@ class PluginConfig(ConfigBase):
         description="Hamming 距离超过此值跳过精确计算（性能优化）",
     )
 
+    MEM0_EXECUTOR_WORKERS: int = Field(
+        default=8,
+        title="mem0 I/O 线程数",
+        description="mem0 与向量库调用专用线程池的线程数，与 NekroAgent 默认线程池隔离",
+    )
+    MEM0_EXECUTOR_WRITE_LIMIT: int = Field(
+        default=4,
+        title="写入并发上限",
+        description="写入类调用最多同时占用的线程数，剩余线程留给交互读取",
+    )
+    MEM0_EXECUTOR_MAINTENANCE_LIMIT: int = Field(
+        default=1,
+        title="后台维护并发上限",
+        description="过期清理、自动迁移等后台任务最多同时占用的线程数",
+    )
+
+    MEM0_WRITE_SHARDS: int = Field(
+        default=4,
+        title="写入分片数",
+        description="写入管线的分片数，同一作用域/同一记忆的写入固定落在一个分片内按序执行",
+    )
+    MEM0_WRITE_QUEUE_SIZE: int = Field(
+        default=256,
+        title="写入队列容量",
+        description="每个分片最多排队的写入数，队满时新写入等待（背压）",
+    )
+    MEM0_WRITE_COALESCE_MS: int = Field(
+        default=100,
+        title="更新合并窗口（毫秒）",
+        description="该窗口内对同一记忆的多次内容更新只执行最后一次",
+    )
+    MEM0_WRITE_MAX_RETRIES: int = Field(
+        default=3,
+        title="写入重试次数",
+        description="写入失败后按指数退避加随机抖动重试的最大次数",
+    )
+
+    EMBEDDING_CACHE_ENABLED: bool = Field(
+        default=True,
+        title="启用嵌入缓存",
+        description="缓存文本向量，去重检索、写入与预搜索复用同一文本的嵌入结果",
+    )
+    EMBEDDING_CACHE_MAX_ENTRIES: int = Field(
+        default=2048,
+        title="嵌入缓存容量",
+        description="进程内 LRU 缓存的最大向量条数",
+    )
+    EMBEDDING_CACHE_TTL_SECONDS: int = Field(
+        default=604800,
+        title="嵌入缓存有效期（秒）",
+        description="缓存向量的最长保留时间，0 表示不过期",
+    )
+    EMBEDDING_CACHE_PERSIST: bool = Field(
+        default=False,
+        title="持久化嵌入缓存",
+        description="将向量写入本地 SQLite，重启后仍可命中",
+    )
+    EMBEDDING_CACHE_DISK_MAX_ENTRIES: int = Field(
+        default=50000,
+        title="嵌入缓存磁盘容量",
+        description="持久层最多保留的向量条数，超出时淘汰最旧记录",
+    )
+
     AUTO_EXTRACT_ENABLED: bool = Field(
         default=True,
         title="启用被动提取",
@@ -206,7 +269,23 @@ class PluginConfig(ConfigBase):
     MEMORY_ENGINE: str = Field(
         default="basic",
         title="记忆引擎",
-        description="选择记忆检索引擎：basic（向量搜索）、hippo（知识图谱+PPR）、emgas（激活扩散）",
+        description="选择记忆检索引擎：basic（向量搜索）、hippo（知识图谱+PPR）、emgas（激活扩散）、fusion（多引擎并发融合）",
+    )
+
+    FUSION_ENGINES: str = Field(
+        default="basic,hippo",
+        title="Fusion 子引擎",
+        description="fusion 引擎并发运行的子引擎，逗号分隔；可用 name:秒数 单独指定时限，如 basic,hippo:2.5",
+    )
+    FUSION_ENGINE_TIMEOUT: float = Field(
+        default=1.5,
+        title="Fusion 子引擎时限（秒）",
+        description="子引擎未单独指定时限时的默认值，超时的子引擎结果直接丢弃",
+    )
+    FUSION_RRF_K: int = Field(
+        default=60,
+        title="Fusion RRF 常数",
+        description="倒数排名融合 1/(k+rank) 中的 k，越大各名次差异越平缓",
     )
 
     HIPPO_PPR_ALPHA: float = Field(
@@ -214,6 +293,16 @@ class PluginConfig(ConfigBase):
         title="HippoRAG PPR Alpha",
         description="Personalized PageRank 重启概率",
     )
+    HIPPO_PPR_METHOD: str = Field(
+        default="power",
+        title="HippoRAG PPR 算法",
+        description="power：全图迭代（精确）；push：从种子实体局部推送的近似算法，耗时与图规模无关",
+    )
+    HIPPO_PPR_PUSH_EPSILON: float = Field(
+        default=1e-4,
+        title="HippoRAG PPR 推送精度",
+        description="push 算法的残差阈值，越小越精确、越慢",
+    )
     HIPPO_HYBRID_WEIGHT: float = Field(
         default=0.8,
         title="HippoRAG 混合权重",
@@ -229,6 +318,61 @@ class PluginConfig(ConfigBase):
         title="HippoRAG 最大候选数",
         description="通过实体获取的最大候选记忆数",
     )
+    HIPPO_PPR_TOLERANCE: float = Field(
+        default=1e-6,
+        title="HippoRAG PPR 收敛阈值",
+        description="相邻两轮迭代分数的 L1 差值低于此值时提前停止（0 表示固定迭代 20 轮）",
+    )
+    HIPPO_JOURNAL_COMPACT_OPS: int = Field(
+        default=1000,
+        title="HippoRAG 日志压缩阈值",
+        description="图状态写入只追加操作日志，累计多少条后在后台压缩为快照",
+    )
+    HIPPO_PPR_CACHE_SIZE: int = Field(
+        default=128,
+        title="HippoRAG PPR 缓存条数",
+        description="按种子实体集合缓存的 PPR 结果条数，图变更后自动失效（0 关闭缓存）",
+    )
+    HIPPO_PPR_CACHE_TOP_N: int = Field(
+        default=512,
+        title="HippoRAG PPR 缓存保留分数数",
+        description="启用缓存时每条 PPR 结果只保留分数最高的 N 个实体（0 不截断）",
+    )
+    HIPPO_ENTITY_CACHE_SIZE: int = Field(
+        default=4096,
+        title="HippoRAG 实体提取缓存条数",
+        description="按内容哈希缓存实体提取结果（写入、检索与结果重算共用），0 关闭",
+    )
+    HIPPO_PARTITION_MEMORY_MB: float = Field(
+        default=256,
+        title="HippoRAG 分区内存预算 (MB)",
+        description="知识图谱按作用域分区懒加载，常驻分区估算内存超过此值时按最近最少使用释放",
+    )
+    HIPPO_TRIPLE_EXTRACTION: bool = Field(
+        default=False,
+        title="HippoRAG 启用 LLM 三元组抽取",
+        description="写入后在后台用记忆管理模型抽取 (主语, 谓词, 宾语) 关系，作为带类型的加权边并入知识图谱；不阻塞写入",
+    )
+    HIPPO_TRIPLE_CONCURRENCY: int = Field(
+        default=2,
+        title="HippoRAG 三元组抽取并发数",
+        description="同时进行的三元组抽取 LLM 请求上限",
+    )
+    HIPPO_TRIPLE_BATCH_SIZE: int = Field(
+        default=8,
+        title="HippoRAG 三元组抽取批大小",
+        description="单次 LLM 请求最多合并的记忆条数",
+    )
+    HIPPO_TRIPLE_BATCH_WINDOW_MS: int = Field(
+        default=500,
+        title="HippoRAG 三元组攒批等待 (毫秒)",
+        description="取到第一条记忆后等待更多记忆凑批的最长时间",
+    )
+    HIPPO_RELATION_EDGE_WEIGHT: float = Field(
+        default=2.0,
+        title="HippoRAG 关系边权重",
+        description="每条抽取出的关系在主语与宾语实体之间增加的边权（共现边为 1.0）",
+    )
 
     EMGAS_DECAY_RATE: float = Field(
         default=0.01,
@@ -250,6 +394,16 @@ class PluginConfig(ConfigBase):
         title="EMGAS 传播衰减",
         description="能量传播时的保留比例（0.85 = 15% 损失）",
     )
+    EMGAS_FLUSH_DELAY_SECONDS: float = Field(
+        default=2.0,
+        title="EMGAS 落盘防抖 (秒)",
+        description="图变更后等待多久没有新写入再写入快照；连续写入只落盘一次",
+    )
+    EMGAS_FLUSH_MAX_DELAY_SECONDS: float = Field(
+        default=30.0,
+        title="EMGAS 最长落盘间隔 (秒)",
+        description="持续写入时最迟多久落盘一次",
+    )
 
 
 _memory_config: Optional[PluginConfig] = None
@@ -3,6 +3,7 @@
 """
 
 import asyncio
+import functools
 from collections import Counter
 from datetime import datetime, timezone
 from typing import Annotated, Any, Dict, List, Optional, Set, Tuple
@@ -28,7 +29,30 @@ from .mem0_output_formatter import (
     _format_memory_list,
     _get_combined_score,
 )
+from .mem0_embedding import (
+    bind_embedding_scope,
+    close_embedding_cache,
+    embedding_scope,
+    get_embedding_cache_stats,
+    prime_embeddings,
+)
+from .mem0_executor import (
+    PRIORITY_INTERACTIVE,
+    PRIORITY_MAINTENANCE,
+    PRIORITY_WRITE,
+    configure_mem0_executor,
+    run_mem0_io,
+    shutdown_mem0_executor,
+)
 from .mem0_utils import get_mem0_client
+from .mem0_write_overlay import get_write_overlay
+from .mem0_write_pipeline import (
+    enqueue_mem0_write,
+    enqueue_write_job,
+    memory_shard_key,
+    scope_shard_key,
+    shutdown_write_pipeline,
+)
 from .plugin import get_memory_config, plugin
 from .utils import MemoryScope, decode_id, get_preset_id, resolve_memory_scope
 from .pre_search_utils import build_pre_search_query, convert_db_messages_to_dict
@@ -37,7 +61,7 @@ from .dedup_similarity import calculate_similarity
 from .query_rewrite import should_skip_retrieval
 from .extraction_prompts import ENHANCED_MEMORY_PROMPT
 from .extraction_parser import parse_extracted_memories
-from .memory_engine_router import route_search
+from .memory_engine_router import close_all_engines, route_search, route_search_many
 
 
 _MIGRATION_IN_FLIGHT: Set[Tuple[Optional[str], Optional[str], Optional[str], str]] = (
@@ -166,7 +190,7 @@ async def _scan_records_from_registered_scopes(client: Any) -> List[Dict[str, An
     seen_ids: Set[str] = set()
     for kwargs in scope_kwargs_list:
         try:
-            raw = await asyncio.to_thread(client.get_all, **kwargs)
+            raw = await run_mem0_io(PRIORITY_MAINTENANCE, client.get_all, **kwargs)
         except Exception as exc:
             logger.warning(f"[Memory] 作用域扫描失败 kwargs={kwargs}: {exc}")
             continue
@@ -576,7 +600,7 @@ async def _migrate_records_to_target_layer(
             _add_kw["agent_id"] = target_layer_ids["agent_id"]
         if target_layer_ids.get("run_id") is not None:
             _add_kw["run_id"] = target_layer_ids["run_id"]
-        await asyncio.to_thread(client.add, memory_text, **_add_kw)
+        await run_mem0_io(PRIORITY_MAINTENANCE, client.add, memory_text, **_add_kw)
         migrated += 1
 
     if migrated:
@@ -628,6 +652,34 @@ async def _read_with_legacy_fallback(
     op: str,
     query: Optional[str] = None,
     limit: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """读取指定层级（含旧作用域兼容读取），并叠加尚未落库的写入与删除。"""
+    if op == "search" and not query:
+        return [], False
+    records, legacy_hit = await _read_layer_records(
+        client=client,
+        layer_ids=layer_ids,
+        plugin_config=plugin_config,
+        op=op,
+        query=query,
+        limit=limit,
+    )
+    records = get_write_overlay().apply(
+        records,
+        _layer_query_kwargs(layer_ids, plugin_config),
+        query=query if op == "search" else None,
+    )
+    return records, legacy_hit
+
+
+async def _read_layer_records(
+    *,
+    client: Any,
+    layer_ids: Dict[str, Any],
+    plugin_config: Any,
+    op: str,
+    query: Optional[str] = None,
+    limit: Optional[int] = None,
 ) -> Tuple[List[Dict[str, Any]], bool]:
     """读取指定层级，并在启用时回退读取旧作用域格式。"""
     if op not in {"search", "get_all"}:
@@ -639,16 +691,33 @@ async def _read_with_legacy_fallback(
         return (ids.get("user_id"), ids.get("agent_id"), ids.get("run_id"))
 
     primary_kwargs = _layer_query_kwargs(layer_ids, plugin_config)
+    fallback_enabled = getattr(plugin_config, "LEGACY_SCOPE_FALLBACK_ENABLED", True)
+    target_fingerprint = _id_fingerprint(layer_ids)
+    legacy_variants: List[Dict[str, Any]] = []
+    if fallback_enabled:
+        legacy_variants = [
+            variant
+            for variant in _build_legacy_layer_variants(layer_ids)
+            if _id_fingerprint(variant) != target_fingerprint
+        ]
+
+    legacy_search_raws: List[Any] = []
     if op == "search":
         if not query:
             return [], False
-        primary_raw = await route_search(
-            query=query,
+        # 主作用域与旧格式变体共用同一查询向量，并发检索
+        search_raws = await route_search_many(
+            query,
+            [primary_kwargs]
+            + [_layer_query_kwargs(variant, plugin_config) for variant in legacy_variants],
             limit=limit or 5,
-            **primary_kwargs,
         )
+        primary_raw = search_raws[0]
+        legacy_search_raws = search_raws[1:]
     else:
-        primary_raw = await asyncio.to_thread(client.get_all, **primary_kwargs)
+        primary_raw = await run_mem0_io(
+            PRIORITY_INTERACTIVE, client.get_all, **primary_kwargs
+        )
 
     merged = normalize_results(primary_raw)
     has_primary = bool(merged)
@@ -662,29 +731,25 @@ async def _read_with_legacy_fallback(
     legacy_hit = False
     legacy_variants_hit = 0
     legacy_records_merged = 0
-    if not getattr(plugin_config, "LEGACY_SCOPE_FALLBACK_ENABLED", True):
+    if not fallback_enabled:
         return merged, legacy_hit
 
-    target_fingerprint = _id_fingerprint(layer_ids)
     allow_auto_migrate = getattr(plugin_config, "AUTO_MIGRATE_ON_READ", False)
     if allow_auto_migrate and op == "search" and (not has_primary):
         # search 的空结果不代表目标层无数据（可能只是查询词未命中），避免误迁移。
-        existence_probe = await asyncio.to_thread(client.get_all, **primary_kwargs)
+        existence_probe = await run_mem0_io(
+            PRIORITY_INTERACTIVE, client.get_all, **primary_kwargs
+        )
         has_primary = bool(normalize_results(existence_probe))
 
-    for variant in _build_legacy_layer_variants(layer_ids):
-        if _id_fingerprint(variant) == target_fingerprint:
-            continue
-
-        legacy_kwargs = _layer_query_kwargs(variant, plugin_config)
+    for index, variant in enumerate(legacy_variants):
         if op == "search":
-            legacy_raw = await route_search(
-                query=query,
-                limit=limit or 5,
-                **legacy_kwargs,
-            )
+            legacy_raw = legacy_search_raws[index]
         else:
-            legacy_raw = await asyncio.to_thread(client.get_all, **legacy_kwargs)
+            legacy_kwargs = _layer_query_kwargs(variant, plugin_config)
+            legacy_raw = await run_mem0_io(
+                PRIORITY_INTERACTIVE, client.get_all, **legacy_kwargs
+            )
 
         legacy_records = normalize_results(legacy_raw)
         if not legacy_records:
@@ -1220,7 +1285,7 @@ async def _cleanup_expired_memories() -> Dict[str, Any]:
         failed = 0
         for memory_id in expired_ids:
             try:
-                await asyncio.to_thread(client.delete, memory_id)
+                await run_mem0_io(PRIORITY_MAINTENANCE, client.delete, memory_id)
                 deleted += 1
             except Exception as exc:
                 failed += 1
@@ -1256,10 +1321,27 @@ async def _start_expiry_cleanup_loop() -> None:
 @plugin.mount_init_method()
 async def init_plugin() -> None:
     logger.info("记忆插件初始化中...")
+    configure_mem0_executor(get_memory_config())
     await get_mem0_client()
     _fire_and_forget(_start_expiry_cleanup_loop())
 
 
+@plugin.mount_cleanup_method()
+async def cleanup_plugin() -> None:
+    await shutdown_write_pipeline()
+    close_all_engines()
+    cache_stats = get_embedding_cache_stats()
+    if cache_stats:
+        logger.info(
+            f"[Memory] 嵌入缓存统计：hits={cache_stats['hits']}, "
+            f"disk_hits={cache_stats['disk_hits']}, misses={cache_stats['misses']}, "
+            f"evictions={cache_stats['evictions']}"
+        )
+    close_embedding_cache()
+    shutdown_mem0_executor()
+    logger.info("记忆插件已清理引擎实例")
+
+
 @plugin.mount_sandbox_method(
     SandboxMethodType.BEHAVIOR,
     name="清理过期记忆",
@@ -1316,6 +1398,64 @@ async def add_memory(
     if client is None:
         return {"ok": False, "error": "mem0 client init failed"}
 
+    target, error = _resolve_add_target(
+        _ctx,
+        plugin_config,
+        user_id=user_id,
+        agent_id=agent_id,
+        run_id=run_id,
+        scope_level=scope_level,
+        guild_id=guild_id,
+    )
+    if target is None:
+        return error
+
+    add_kwargs = _build_add_kwargs(
+        target,
+        _normalize_memory_metadata(
+            metadata,
+            expiration_date=expiration_date,
+            importance=importance,
+        ),
+    )
+
+    # 去重检查
+    if plugin_config.DEDUP_ENABLED:
+        duplicate = await _find_duplicate_memory(
+            str(memory), target["scope_ids"], plugin_config
+        )
+        if duplicate is not None:
+            return duplicate
+
+    # 同一作用域的写入按序执行；队列满时在此等待（背压），不会无限堆积后台任务
+    future = await enqueue_mem0_write(
+        scope_shard_key(*target["scope_ids"]),
+        functools.partial(client.add, memory, **add_kwargs),
+        config=plugin_config,
+        description="add",
+        idempotent=False,
+    )
+    # 落库前的读取也能看到这条记忆
+    get_write_overlay().track_add(
+        future, target["scope_ids"], str(memory), add_kwargs["metadata"]
+    )
+    return {"ok": True, "layer": target["layer"], "message": "记忆已提交写入"}
+
+
+def _resolve_add_target(
+    _ctx: Optional[AgentCtx],
+    plugin_config: Any,
+    *,
+    user_id: Optional[str] = None,
+    agent_id: Optional[str] = None,
+    run_id: Optional[str] = None,
+    scope_level: Optional[str] = None,
+    guild_id: Optional[str] = None,
+) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    """解析写入作用域与目标层级。
+
+    成功返回 ({"layer", "scope_ids": (user_id, agent_id, run_id)}, {})，失败返回 (None, 错误响应)。
+    """
     scope = resolve_memory_scope(
         _ctx, user_id=user_id, agent_id=agent_id, run_id=run_id
     )
@@ -1329,7 +1469,10 @@ async def add_memory(
     )
 
     if not scope.has_scope():
-        return {"ok": False, "error": "缺少 user_id/agent_id/run_id，无法写入记忆"}
+        return None, {
+            "ok": False,
+            "error": "缺少 user_id/agent_id/run_id，无法写入记忆",
+        }
 
     _register_scope_context(scope, plugin_config)
 
@@ -1348,19 +1491,11 @@ async def add_memory(
 
     layer_ids = _resolve_layer_ids(scope, target_layer or "", plugin_config)
     if layer_ids is None:
-        return {
+        return None, {
             "ok": False,
             "error": "未能确定可用的记忆层级，请提供 scope_level 或 user_id/agent_id/run_id",
         }
 
-    # 后台执行实际写入，立即返回不阻塞沙盒
-    merged_metadata = _normalize_memory_metadata(
-        metadata,
-        expiration_date=expiration_date,
-        importance=importance,
-    )
-
-    add_kwargs: Dict[str, Any] = {"metadata": merged_metadata, "infer": False}
     _uid = (
         layer_ids["user_id"]
         if (plugin_config.ENABLE_AGENT_SCOPE or target_layer == "global")
@@ -1372,49 +1507,215 @@ async def add_memory(
         else None
     )
     _rid = layer_ids["run_id"]
-    if _uid is not None:
-        add_kwargs["user_id"] = _uid
-    if _aid is not None:
-        add_kwargs["agent_id"] = _aid
-    if _rid is not None:
-        add_kwargs["run_id"] = _rid
     _register_scope_query(user_id=_uid, agent_id=_aid, run_id=_rid)
+    return {"layer": layer_ids["layer"], "scope_ids": (_uid, _aid, _rid)}, {}
 
-    # 去重检查
-    if plugin_config.DEDUP_ENABLED:
-        hasher = SimHasher()
-        new_simhash = hasher.compute_simhash_hex(str(memory))
 
-        search_results = await route_search(
-            str(memory), limit=20, user_id=_uid, agent_id=_aid, run_id=_rid
-        )
-        if search_results:
-            for result in search_results:
-                result_id = result.get("id") or result.get("memory_id")
-                result_text = result.get("memory") or result.get("text", "")
+def _build_add_kwargs(
+    target: Dict[str, Any], metadata: Dict[str, Any]
+) -> Dict[str, Any]:
+    add_kwargs: Dict[str, Any] = {"metadata": metadata, "infer": False}
+    for key, value in zip(("user_id", "agent_id", "run_id"), target["scope_ids"]):
+        if value is not None:
+            add_kwargs[key] = value
+    return add_kwargs
 
-                # 计算 hamming distance
-                result_simhash = hasher.compute_simhash_hex(result_text)
-                hamming_dist = hamming_distance_hex(new_simhash, result_simhash)
 
-                # 预筛：如果 hamming distance 超过阈值，跳过
-                if hamming_dist > plugin_config.DEDUP_SIMHASH_THRESHOLD:
-                    continue
+def _match_duplicate(
+    memory_text: str,
+    candidates: List[Dict[str, Any]],
+    plugin_config: Any,
+    hasher: SimHasher,
+) -> Optional[Dict[str, Any]]:
+    """在候选记录中查找与 memory_text 重复的一条，返回重复错误响应。"""
+    new_simhash = hasher.compute_simhash_hex(memory_text)
+    for result in candidates:
+        result_id = result.get("id") or result.get("memory_id")
+        result_text = result.get("memory") or result.get("text", "")
+
+        # 计算 hamming distance
+        result_simhash = hasher.compute_simhash_hex(result_text)
+        hamming_dist = hamming_distance_hex(new_simhash, result_simhash)
+
+        # 预筛：如果 hamming distance 超过阈值，跳过
+        if hamming_dist > plugin_config.DEDUP_SIMHASH_THRESHOLD:
+            continue
+
+        # 计算综合相似度
+        similarity = calculate_similarity(memory_text, result_text)
+
+        # 如果相似度超过阈值，返回重复错误
+        if similarity >= plugin_config.DEDUP_SIMILARITY_THRESHOLD:
+            return {
+                "ok": False,
+                "error": "记忆重复",
+                "similar_to": result_id,
+                "similarity": similarity,
+            }
+    return None
+
+
+async def _find_duplicate_memory(
+    memory_text: str,
+    scope_ids: Tuple[Optional[str], Optional[str], Optional[str]],
+    plugin_config: Any,
+) -> Optional[Dict[str, Any]]:
+    _uid, _aid, _rid = scope_ids
+    search_results = await route_search(
+        memory_text, limit=20, user_id=_uid, agent_id=_aid, run_id=_rid
+    )
+    hasher = SimHasher()
+    if search_results:
+        duplicate = _match_duplicate(memory_text, search_results, plugin_config, hasher)
+        if duplicate is not None:
+            return duplicate
+    return _find_pending_duplicate(memory_text, scope_ids, plugin_config, hasher)
+
+
+def _find_pending_duplicate(
+    memory_text: str,
+    scope_ids: Tuple[Optional[str], Optional[str], Optional[str]],
+    plugin_config: Any,
+    hasher: SimHasher,
+) -> Optional[Dict[str, Any]]:
+    """检查同一作用域内已排队、尚未落库的新增：连续提交的相同记忆检索不到彼此。"""
+    pending = get_write_overlay().pending_adds(scope_ids)
+    if not pending:
+        return None
+    duplicate = _match_duplicate(memory_text, pending, plugin_config, hasher)
+    if duplicate is not None:
+        duplicate["pending"] = True
+    return duplicate
+
+
+@plugin.mount_sandbox_method(
+    SandboxMethodType.BEHAVIOR,
+    name="批量添加记忆",
+    description=(
+        "批量添加记忆（非阻塞），作用域只解析一次、向量一次批量计算，返回逐条状态。"
+        "示例：add_memories(['喜欢猫', {'memory': '下周出差', 'expiration_date': '2026-12-31T00:00:00Z', 'importance': 6}], scope_level='persona')"
+    ),
+)
+async def add_memories(
+    _ctx: Optional[AgentCtx],
+    memories: List[Any],
+    user_id: Optional[str] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    expiration_date: Optional[str] = None,
+    agent_id: Optional[str] = None,
+    run_id: Optional[str] = None,
+    scope_level: Optional[str] = None,
+    guild_id: Optional[str] = None,
+    importance: Optional[int] = None,
+) -> Dict[str, Any]:
+    """批量添加记忆到同一层级（非阻塞，立即返回逐条状态）。
 
-                # 计算综合相似度
-                similarity = calculate_similarity(str(memory), result_text)
+    memories 中每一项可以是字符串，或包含 memory/metadata/expiration_date/importance 的字典；
+    字典中的字段覆盖批量参数。
 
-                # 如果相似度超过阈值，返回重复错误
-                if similarity >= plugin_config.DEDUP_SIMILARITY_THRESHOLD:
-                    return {
-                        "ok": False,
-                        "error": "记忆重复",
-                        "similar_to": result_id,
-                        "similarity": similarity,
-                    }
+    示例：
+        add_memories(['喜欢科幻电影', '养了一只猫'], scope_level='persona')
+    """
+    plugin_config = get_memory_config()
+    client = await get_mem0_client()
+    if client is None:
+        return {"ok": False, "error": "mem0 client init failed"}
+    if not isinstance(memories, list) or not memories:
+        return {"ok": False, "error": "memories 必须是非空列表"}
 
-    _fire_and_forget(asyncio.to_thread(client.add, memory, **add_kwargs))
-    return {"ok": True, "layer": layer_ids["layer"], "message": "记忆已提交写入"}
+    target, error = _resolve_add_target(
+        _ctx,
+        plugin_config,
+        user_id=user_id,
+        agent_id=agent_id,
+        run_id=run_id,
+        scope_level=scope_level,
+        guild_id=guild_id,
+    )
+    if target is None:
+        return error
+
+    results: List[Dict[str, Any]] = [{} for _ in memories]
+    items: List[Tuple[int, str, Dict[str, Any]]] = []
+    for index, entry in enumerate(memories):
+        item_metadata = dict(metadata or {})
+        item_expiration = expiration_date
+        item_importance = importance
+        if isinstance(entry, dict):
+            text = entry.get("memory") or entry.get("content") or entry.get("text")
+            if isinstance(entry.get("metadata"), dict):
+                item_metadata.update(entry["metadata"])
+            item_expiration = entry.get("expiration_date") or expiration_date
+            item_importance = entry.get("importance", importance)
+        else:
+            text = entry
+        text = str(text).strip() if text is not None else ""
+        if not text:
+            results[index] = {"index": index, "ok": False, "error": "记忆内容为空"}
+            continue
+        items.append(
+            (
+                index,
+                text,
+                _build_add_kwargs(
+                    target,
+                    _normalize_memory_metadata(
+                        item_metadata,
+                        expiration_date=item_expiration,
+                        importance=item_importance,
+                    ),
+                ),
+            )
+        )
+
+    hasher = SimHasher()
+    accepted: List[Dict[str, Any]] = []
+    shard_key = scope_shard_key(*target["scope_ids"])
+    # 一次请求算出全部向量并记入请求作用域（未启用嵌入缓存时同样生效），
+    # 之后并发的去重检索与逐条写入都直接复用
+    with embedding_scope():
+        await prime_embeddings(client, [text for _, text, _ in items])
+
+        duplicates: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        if plugin_config.DEDUP_ENABLED:
+            duplicates = list(
+                await asyncio.gather(
+                    *(
+                        _find_duplicate_memory(text, target["scope_ids"], plugin_config)
+                        for _, text, _ in items
+                    )
+                )
+            )
+
+        for (index, text, add_kwargs), duplicate in zip(items, duplicates):
+            if duplicate is None and plugin_config.DEDUP_ENABLED:
+                # 同一批次内部，以及去重检索期间其他请求排队的新增也要去重
+                duplicate = _match_duplicate(
+                    text, accepted, plugin_config, hasher
+                ) or _find_pending_duplicate(text, target["scope_ids"], plugin_config, hasher)
+            if duplicate is not None:
+                results[index] = {"index": index, **duplicate}
+                continue
+            future = await enqueue_mem0_write(
+                shard_key,
+                bind_embedding_scope(functools.partial(client.add, text, **add_kwargs)),
+                config=plugin_config,
+                description="add",
+                idempotent=False,
+            )
+            get_write_overlay().track_add(
+                future, target["scope_ids"], text, add_kwargs["metadata"]
+            )
+            accepted.append({"id": f"batch[{index}]", "memory": text})
+            results[index] = {"index": index, "ok": True}
+
+    return {
+        "ok": bool(accepted),
+        "layer": target["layer"],
+        "submitted": len(accepted),
+        "results": results,
+        "message": f"已提交 {len(accepted)}/{len(memories)} 条记忆写入",
+    }
 
 
 @plugin.mount_sandbox_method(
@@ -1483,20 +1784,30 @@ async def search_memory(
     if not layer_order:
         return {"ok": False, "error": "未找到可搜索的层级"}
 
-    merged_results: List[Dict[str, Any]] = []
-    seen_ids: Set[str] = set()
+    layer_id_list: List[Tuple[str, Dict[str, Any]]] = []
     for layer in layer_order:
         layer_ids = _resolve_read_layer_ids(scope, layer, plugin_config)
-        if not layer_ids:
-            continue
-        raw_results, legacy_hit = await _read_with_legacy_fallback(
-            client=client,
-            layer_ids=layer_ids,
-            plugin_config=plugin_config,
-            op="search",
-            query=query,
-            limit=limit,
+        if layer_ids:
+            layer_id_list.append((layer, layer_ids))
+    # 各层在同一嵌入作用域内并发检索，查询向量只计算一次；结果仍按层级顺序合并去重
+    with embedding_scope():
+        layer_reads = await asyncio.gather(
+            *(
+                _read_with_legacy_fallback(
+                    client=client,
+                    layer_ids=layer_ids,
+                    plugin_config=plugin_config,
+                    op="search",
+                    query=query,
+                    limit=limit,
+                )
+                for _, layer_ids in layer_id_list
+            )
         )
+
+    merged_results: List[Dict[str, Any]] = []
+    seen_ids: Set[str] = set()
+    for (layer, layer_ids), (raw_results, legacy_hit) in zip(layer_id_list, layer_reads):
         if legacy_hit:
             logger.info(f"[Memory] 层级 {layer} 触发旧作用域兼容读取")
         merged_results.extend(
@@ -1612,11 +1923,68 @@ async def update_memory(
     if client is None:
         return {"ok": False, "error": "mem0 client init failed"}
 
-    # 后台执行实际更新，立即返回不阻塞沙盒
-    _fire_and_forget(asyncio.to_thread(client.update, memory_id, new_memory))
+    # 后台执行实际更新，立即返回不阻塞沙盒；短时间内对同一记忆的多次更新只执行最后一次
+    future = await enqueue_mem0_write(
+        memory_shard_key(memory_id),
+        functools.partial(client.update, memory_id, new_memory),
+        description=f"update {memory_id}",
+        coalesce_key=memory_id,
+    )
+    get_write_overlay().track_update(future, memory_id, new_memory)
     return {"ok": True, "message": "记忆更新已提交"}
 
 
+@plugin.mount_sandbox_method(
+    SandboxMethodType.BEHAVIOR,
+    name="批量更新记忆",
+    description=(
+        "批量更新记忆内容（非阻塞），返回逐条状态。"
+        "示例：update_memories([{'memory_id': 'abc', 'new_memory': '改为喜欢爵士乐'}])"
+    ),
+)
+async def update_memories(
+    _ctx: Optional[AgentCtx],
+    updates: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """批量更新记忆内容（非阻塞，立即返回逐条状态）。新内容的向量一次批量计算。"""
+    client = await get_mem0_client()
+    if client is None:
+        return {"ok": False, "error": "mem0 client init failed"}
+    if not isinstance(updates, list) or not updates:
+        return {"ok": False, "error": "updates 必须是非空列表"}
+
+    results: List[Dict[str, Any]] = []
+    valid: List[Tuple[int, str, str]] = []
+    for index, entry in enumerate(updates):
+        entry = entry if isinstance(entry, dict) else {}
+        memory_id = _normalize_cli_value(entry.get("memory_id"))
+        new_memory = str(entry.get("new_memory") or entry.get("memory") or "").strip()
+        if not memory_id or not new_memory:
+            results.append(
+                {"index": index, "ok": False, "error": "memory_id 与 new_memory 不能为空"}
+            )
+            continue
+        valid.append((index, memory_id, new_memory))
+        results.append({"index": index, "ok": True, "memory_id": memory_id})
+
+    with embedding_scope():
+        await prime_embeddings(client, [text for _, _, text in valid])
+        for _, memory_id, new_memory in valid:
+            future = await enqueue_mem0_write(
+                memory_shard_key(memory_id),
+                bind_embedding_scope(functools.partial(client.update, memory_id, new_memory)),
+                description=f"update {memory_id}",
+                coalesce_key=memory_id,
+            )
+            get_write_overlay().track_update(future, memory_id, new_memory)
+    return {
+        "ok": bool(valid),
+        "submitted": len(valid),
+        "results": results,
+        "message": f"已提交 {len(valid)}/{len(updates)} 条记忆更新",
+    }
+
+
 async def _update_memory_metadata_job(
     *,
     client: Any,
@@ -1656,7 +2024,9 @@ async def _update_memory_metadata_job(
 
     update_kwargs: Dict[str, Any] = {"metadata": merged_metadata}
     try:
-        await asyncio.to_thread(client.update, memory_id, memory_text, **update_kwargs)
+        await run_mem0_io(
+            PRIORITY_WRITE, client.update, memory_id, memory_text, **update_kwargs
+        )
         logger.info(f"[Memory] 元数据更新完成 memory_id={memory_id} (原ID保留)")
         return
     except TypeError:
@@ -1670,8 +2040,8 @@ async def _update_memory_metadata_job(
         if scope_value is not None:
             add_kwargs[scope_key] = scope_value
 
-    await asyncio.to_thread(client.add, memory_text, **add_kwargs)
-    await asyncio.to_thread(client.delete, memory_id)
+    await run_mem0_io(PRIORITY_WRITE, client.add, memory_text, **add_kwargs)
+    await run_mem0_io(PRIORITY_WRITE, client.delete, memory_id)
     logger.info(f"[Memory] 元数据更新完成 memory_id={memory_id} (降级模式，已替换ID)")
 
 
@@ -1703,14 +2073,19 @@ async def update_memory_metadata(
     if not normalized_memory_id:
         return {"ok": False, "error": "memory_id 不能为空"}
 
-    _fire_and_forget(
-        _update_memory_metadata_job(
+    await enqueue_write_job(
+        memory_shard_key(normalized_memory_id),
+        functools.partial(
+            _update_memory_metadata_job,
             client=client,
             memory_id=normalized_memory_id,
             metadata_patch=metadata_patch,
             expiration_date=expiration_date,
             clear_expiration=clear_expiration,
-        )
+        ),
+        config=plugin_config,
+        description=f"update metadata {normalized_memory_id}",
+        barrier_key=normalized_memory_id,
     )
     return {"ok": True, "message": "记忆元数据更新已提交"}
 
@@ -1746,11 +2121,59 @@ async def delete_memory(
     if not normalized_memory_id:
         return {"ok": False, "error": "memory_id 不能为空"}
 
-    # 后台执行实际删除，立即返回不阻塞沙盒
-    _fire_and_forget(asyncio.to_thread(client.delete, normalized_memory_id))
+    # 后台执行实际删除，立即返回不阻塞沙盒；删除之后的更新不会被合并到删除之前
+    future = await enqueue_mem0_write(
+        memory_shard_key(normalized_memory_id),
+        functools.partial(client.delete, normalized_memory_id),
+        description=f"delete {normalized_memory_id}",
+        barrier_key=normalized_memory_id,
+    )
+    get_write_overlay().track_delete(future, normalized_memory_id)
     return {"ok": True, "message": "记忆删除已提交"}
 
 
+@plugin.mount_sandbox_method(
+    SandboxMethodType.BEHAVIOR,
+    name="批量删除记忆",
+    description=(
+        "批量删除记忆（非阻塞），返回逐条状态。示例：delete_memories(['id1', 'id2'])"
+    ),
+)
+async def delete_memories(
+    _ctx: Optional[AgentCtx],
+    memory_ids: List[str],
+) -> Dict[str, Any]:
+    """批量删除记忆（非阻塞，立即返回逐条状态）。"""
+    client = await get_mem0_client()
+    if client is None:
+        return {"ok": False, "error": "mem0 client init failed"}
+    if not isinstance(memory_ids, list) or not memory_ids:
+        return {"ok": False, "error": "memory_ids 必须是非空列表"}
+
+    results: List[Dict[str, Any]] = []
+    submitted = 0
+    for index, raw_id in enumerate(memory_ids):
+        memory_id = _normalize_cli_value(raw_id)
+        if not memory_id:
+            results.append({"index": index, "ok": False, "error": "memory_id 不能为空"})
+            continue
+        future = await enqueue_mem0_write(
+            memory_shard_key(memory_id),
+            functools.partial(client.delete, memory_id),
+            description=f"delete {memory_id}",
+            barrier_key=memory_id,
+        )
+        get_write_overlay().track_delete(future, memory_id)
+        submitted += 1
+        results.append({"index": index, "ok": True, "memory_id": memory_id})
+    return {
+        "ok": submitted > 0,
+        "submitted": submitted,
+        "results": results,
+        "message": f"已提交 {submitted}/{len(memory_ids)} 条记忆删除",
+    }
+
+
 @plugin.mount_sandbox_method(
     SandboxMethodType.BEHAVIOR,
     name="删除作用域记忆",
@@ -1814,7 +2237,7 @@ async def delete_all_memory(
                 _del_kw["agent_id"] = _layer_ids["agent_id"]
             if _layer_ids.get("run_id") is not None:
                 _del_kw["run_id"] = _layer_ids["run_id"]
-            await asyncio.to_thread(client.delete_all, **_del_kw)
+            await run_mem0_io(PRIORITY_WRITE, client.delete_all, **_del_kw)
 
         _fire_and_forget(_do_delete_all())
 
@@ -1845,7 +2268,7 @@ async def get_memory_history(
         return {"ok": False, "error": "mem0 client init failed"}
 
     try:
-        results = await asyncio.to_thread(client.history, memory_id)
+        results = await run_mem0_io(PRIORITY_INTERACTIVE, client.history, memory_id)
     except Exception as exc:  # pragma: no cover
         logger.error(f"获取记忆历史失败: {exc}")
         return {"ok": False, "error": str(exc)}
@@ -2229,25 +2652,26 @@ async def _execute_pre_search(_ctx: AgentCtx) -> Optional[str]:
             _pre_search_skip("NO_CLIENT", "mem0 客户端初始化失败")
             return None
 
-        # 6. 并行搜索所有层级
+        # 6. 并行搜索所有层级（各层任务在同一嵌入作用域内创建，查询向量只计算一次）
         search_tasks = []
 
-        for layer in layer_order:
-            layer_ids = _resolve_read_layer_ids(scope, layer, config)
-            if not layer_ids:
-                continue
+        with embedding_scope():
+            for layer in layer_order:
+                layer_ids = _resolve_read_layer_ids(scope, layer, config)
+                if not layer_ids:
+                    continue
 
-            search_tasks.append(
-                asyncio.create_task(
-                    _search_single_layer(
-                        client,
-                        query,
-                        layer_ids,
-                        config.PRE_SEARCH_RESULT_LIMIT,
-                        config,
+                search_tasks.append(
+                    asyncio.create_task(
+                        _search_single_layer(
+                            client,
+                            query,
+                            layer_ids,
+                            config.PRE_SEARCH_RESULT_LIMIT,
+                            config,
+                        )
                     )
                 )
-            )
 
         if not search_tasks:
             logger.debug("[PreSearch] 无有效层级，跳过预搜索")
@@ -2396,18 +2820,23 @@ async def _do_passive_extraction(
 
         logger.info(f"[AutoExtract] 提取到 {len(memories)} 条记忆")
 
-        for mem in memories:
-            await add_memory(
-                _ctx,
-                memory=mem["content"],
-                metadata={
-                    "TYPE": mem.get("type", "contextual"),
-                    "_auto_extracted": True,
-                },
-                expiration_date=mem.get("expiration_date"),
-                importance=mem.get("importance", 5),
-                scope_level=config.AUTO_EXTRACT_TARGET_LAYER,
-            )
+        batch_result = await add_memories(
+            _ctx,
+            memories=[
+                {
+                    "memory": mem["content"],
+                    "metadata": {
+                        "TYPE": mem.get("type", "contextual"),
+                        "_auto_extracted": True,
+                    },
+                    "expiration_date": mem.get("expiration_date"),
+                    "importance": mem.get("importance", 5),
+                }
+                for mem in memories
+            ],
+            scope_level=config.AUTO_EXTRACT_TARGET_LAYER,
+        )
+        logger.info(f"[AutoExtract] {batch_result.get('message') or batch_result.get('error')}")
     except Exception as exc:
         logger.error(f"[AutoExtract] 提取执行失败: {exc}")
 
@@ -2482,6 +2911,7 @@ async def inject_memory_prompt(_ctx: AgentCtx) -> str:
         "## 写操作（非阻塞，不要 await；可与 send_text 同一代码块）",
         "add_memory('用户喜欢猫', scope_level='global', importance=8)",
         "add_memory('用户今天心情好', scope_level='persona', expiration_date='2026-12-31T00:00:00Z', importance=6)",
+        "add_memories(['用户喜欢猫', '用户养了一只橘猫'], scope_level='global')  # 多条一起写入更快",
         "await send_text(_ctx, ‘好的，我记住了！’)  # send_text 仍需 _ctx",
         "",
         "## ⏳ 过期策略（必须主动决策）",
@@ -2504,6 +2934,7 @@ async def inject_memory_prompt(_ctx: AgentCtx) -> str:
         "await update_memory_metadata(memory_id, expiration_date=‘2026-12-31T00:00:00Z’)  # 仅更新元数据/过期时间",
         "await update_memory_metadata(memory_id, clear_expiration=True)  # 转为长期记忆时清除过期时间",
         "await delete_memory(memory_id)  # 删除过时记忆（主动维护！）",
+        "await delete_memories([id1, id2])  # 批量删除；update_memories([{‘memory_id’: id, ‘new_memory’: ‘新内容’}]) 批量更新",
         "写入时始终设置 importance（1-10）；对会过时的信息优先显式设置 expiration_date（ISO8601）。",
         "",
         "## 层级说明",
@@ -2624,7 +3055,7 @@ async def _command_delete_memory(memory_id: str) -> str:
     if not normalized_memory_id:
         return _format_command_error("用法: mem.delete <memory_id>")
     try:
-        await asyncio.to_thread(client.delete, normalized_memory_id)
+        await run_mem0_io(PRIORITY_WRITE, client.delete, normalized_memory_id)
     except Exception as exc:  # pragma: no cover
         logger.error(f"删除记忆失败: {exc}")
         return _format_command_error(str(exc))
@@ -2683,7 +3114,7 @@ async def _command_clear_memory(scope: MemoryScope, layers: Optional[List[str]])
                 _del_kw["agent_id"] = layer_ids["agent_id"]
             if layer_ids.get("run_id") is not None:
                 _del_kw["run_id"] = layer_ids["run_id"]
-            await asyncio.to_thread(client.delete_all, **_del_kw)
+            await run_mem0_io(PRIORITY_WRITE, client.delete_all, **_del_kw)
             deleted_layers.append(layer_ids["layer"])
     except Exception as exc:  # pragma: no cover
         logger.error(f"清空记忆失败: {exc}")
@@ -2699,7 +3130,7 @@ async def _command_history(memory_id: str) -> str:
     if client is None:
         return _format_command_error("mem0 client init failed，检查插件配置。")
     try:
-        results = await asyncio.to_thread(client.history, memory_id)
+        results = await run_mem0_io(PRIORITY_INTERACTIVE, client.history, memory_id)
     except Exception as exc:  # pragma: no cover
         logger.error(f"获取历史失败: {exc}")
         return _format_command_error(str(exc))
@@ -2841,7 +3272,9 @@ async def _command_add(
             add_kwargs["agent_id"] = _aid
         if _rid is not None:
             add_kwargs["run_id"] = _rid
-        result = await asyncio.to_thread(client.add, memory_text, **add_kwargs)
+        result = await run_mem0_io(
+            PRIORITY_WRITE, client.add, memory_text, **add_kwargs
+        )
     except Exception as exc:  # pragma: no cover
         logger.error(f"添加记忆失败: {exc}")
         return _format_command_error(str(exc))
@@ -3083,7 +3516,13 @@ async def mem_edit_cmd(
     if client is None:
         return CmdCtl.failed("记忆服务未初始化")
     try:
-        _fire_and_forget(asyncio.to_thread(client.update, memory_id, new_text))
+        future = await enqueue_mem0_write(
+            memory_shard_key(memory_id),
+            functools.partial(client.update, memory_id, new_text),
+            description=f"update {memory_id}",
+            coalesce_key=memory_id,
+        )
+        get_write_overlay().track_update(future, memory_id, new_text)
         return CmdCtl.success(f"记忆 {memory_id} 已更新（后台处理中）")
     except Exception as exc:
         return CmdCtl.failed(f"更新失败: {exc}")
@@ -0,0 +1,1532 @@
+import asyncio
+import importlib
+import os
+import sys
+import types
+
+
+def _install_stubs(config: object) -> None:
+    class _DummyLogger:
+        def debug(self, *args, **kwargs):
+            return None
+
+        def info(self, *args, **kwargs):
+            return None
+
+        def warning(self, *args, **kwargs):
+            return None
+
+        def error(self, *args, **kwargs):
+            return None
+
+    core_mod = types.ModuleType("nekro_agent.core")
+    setattr(core_mod, "logger", _DummyLogger())
+    sys.modules.setdefault("nekro_agent", types.ModuleType("nekro_agent"))
+    sys.modules["nekro_agent.core"] = core_mod
+
+    package_name = "nekro_plugin_mem0"
+    package_root = os.path.dirname(os.path.abspath(__file__))
+    package_mod = types.ModuleType(package_name)
+    package_mod.__path__ = [package_root]
+    sys.modules[package_name] = package_mod
+
+    plugin_stub = types.ModuleType(f"{package_name}.plugin")
+    setattr(plugin_stub, "get_memory_config", lambda: config)
+    sys.modules[f"{package_name}.plugin"] = plugin_stub
+
+    mem0_utils_stub = types.ModuleType(f"{package_name}.mem0_utils")
+
+    async def _dummy_get_mem0_client():
+        return None
+
+    setattr(mem0_utils_stub, "get_mem0_client", _dummy_get_mem0_client)
+    sys.modules[f"{package_name}.mem0_utils"] = mem0_utils_stub
+
+    for name in list(sys.modules):
+        if name.startswith(f"{package_name}.memory_engine"):
+            del sys.modules[name]
+
+
+def _load_router(config: object):
+    _install_stubs(config)
+    return importlib.import_module("nekro_plugin_mem0.memory_engine_router")
+
+
+def _register_counting_engine(base_module, name: str):
+    created = []
+    closed = []
+
+    @base_module.register_engine(name)
+    class _CountingEngine(base_module.MemoryEngineBase):
+        def __init__(self, config):
+            self.config = config
+            self.initialized = 0
+            created.append(self)
+
+        async def initialize(self):
+            self.initialized += 1
+
+        def add_memory(self, key, value):
+            return None
+
+        def search_memory(self, query, **kwargs):
+            return [{"id": "m1", "memory": str(query)}]
+
+        def remove_memory(self, key):
+            return False
+
+        def close(self):
+            closed.append(self)
+
+    return created, closed
+
+
+def test_engine_registry_reuses_instance_for_same_config() -> None:
+    config = types.SimpleNamespace(MEMORY_ENGINE="counting", MEMORY_ID="default")
+    router = _load_router(config)
+    base = sys.modules["nekro_plugin_mem0.memory_engine_base"]
+    created, closed = _register_counting_engine(base, "counting")
+
+    async def _run():
+        first = await router.route_search("q1", user_id="u1")
+        second = await router.route_search("q2", user_id="u1")
+        return first, second
+
+    first, second = asyncio.run(_run())
+
+    assert first[0]["memory"] == "q1"
+    assert second[0]["memory"] == "q2"
+    assert len(created) == 1
+    assert created[0].initialized == 1
+    assert closed == []
+    router.close_all_engines()
+    assert closed == created
+
+
+def test_engine_registry_replaces_instance_when_config_changes() -> None:
+    config = types.SimpleNamespace(MEMORY_ENGINE="counting", MEMORY_ID="default")
+    router = _load_router(config)
+    base = sys.modules["nekro_plugin_mem0.memory_engine_base"]
+    created, closed = _register_counting_engine(base, "counting")
+
+    async def _run():
+        first = await router.acquire_engine("counting", config)
+        config.EXTRA_OPTION = 1
+        second = await router.acquire_engine("counting", config)
+        return first, second
+
+    first, second = asyncio.run(_run())
+
+    assert first is not second
+    assert closed == [first]
+    router.close_all_engines()
+
+
+def test_engine_registry_retires_instances_when_engine_or_memory_id_changes() -> None:
+    config = types.SimpleNamespace(MEMORY_ENGINE="alpha", MEMORY_ID="default", FUSION_ENGINES="beta")
+    router = _load_router(config)
+    base = sys.modules["nekro_plugin_mem0.memory_engine_base"]
+    importlib.import_module("nekro_plugin_mem0.memory_engine_fusion")
+    alpha_created, alpha_closed = _register_counting_engine(base, "alpha")
+    beta_created, beta_closed = _register_counting_engine(base, "beta")
+
+    async def _search():
+        return await router.route_search("q", user_id="u1")
+
+    _ = asyncio.run(_search())
+    config.MEMORY_ENGINE = "beta"
+    _ = asyncio.run(_search())
+    assert alpha_closed == alpha_created and len(beta_created) == 1
+
+    # fusion 复用注册表中的子引擎实例，而不是再建一份
+    config.MEMORY_ENGINE = "fusion"
+    fused = asyncio.run(_search())
+    assert [r["memory"] for r in fused] == ["q"]
+    assert len(beta_created) == 1 and beta_closed == []
+    fusion_engine = router._ENGINE_INSTANCES[("fusion", "default")][1]
+    assert fusion_engine.engines["beta"] is beta_created[0]
+
+    config.MEMORY_ENGINE = "alpha"
+    config.MEMORY_ID = "other"
+    _ = asyncio.run(_search())
+    assert beta_closed == beta_created
+    assert list(router._ENGINE_INSTANCES) == [("alpha", "other")]
+    router.close_all_engines()
+
+
+def test_route_search_runs_sync_engine_off_event_loop() -> None:
+    import time
+
+    config = types.SimpleNamespace(MEMORY_ENGINE="slow", MEMORY_ID="default")
+    router = _load_router(config)
+    base = sys.modules["nekro_plugin_mem0.memory_engine_base"]
+
+    @base.register_engine("slow")
+    class _SlowEngine(base.MemoryEngineBase):
+        def __init__(self, config):
+            self.config = config
+
+        def add_memory(self, key, value):
+            return None
+
+        def search_memory(self, query, **kwargs):
+            time.sleep(0.2)
+            return [{"id": str(query), "memory": str(query)}]
+
+        def remove_memory(self, key):
+            return False
+
+    async def _run():
+        await router.acquire_engine("slow", config)
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(router.route_search(f"q{i}", user_id="u1") for i in range(4))
+        )
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(_run())
+
+    assert [r[0]["memory"] for r in results] == ["q0", "q1", "q2", "q3"]
+    assert elapsed < 0.6
+    router.close_all_engines()
+
+
+def test_route_search_many_embeds_query_once() -> None:
+    import threading
+    import time
+
+    config = types.SimpleNamespace(MEMORY_ENGINE="embedding", MEMORY_ID="default")
+    router = _load_router(config)
+    base = sys.modules["nekro_plugin_mem0.memory_engine_base"]
+    embedding = importlib.import_module("nekro_plugin_mem0.mem0_embedding")
+
+    calls = []
+    calls_lock = threading.Lock()
+
+    class _CountingEmbedder:
+        def embed(self, text, memory_action=None):
+            with calls_lock:
+                calls.append(text)
+            time.sleep(0.05)
+            return [float(len(text))]
+
+    client = types.SimpleNamespace(embedding_model=_CountingEmbedder())
+    embedding.install_shared_embedder(client)
+    embedding.install_shared_embedder(client)
+
+    @base.register_engine("embedding")
+    class _EmbeddingEngine(base.MemoryEngineBase):
+        def __init__(self, config):
+            self.config = config
+
+        def add_memory(self, key, value):
+            return None
+
+        def search_memory(self, query, **kwargs):
+            vector = client.embedding_model.embed(query, "search")
+            return [{"id": kwargs["user_id"], "memory": str(vector[0])}]
+
+        def remove_memory(self, key):
+            return False
+
+    async def _run():
+        many = await router.route_search_many(
+            " hello  world ", [{"user_id": f"u{i}"} for i in range(4)], limit=5
+        )
+        single = await router.route_search("hello world", user_id="u9")
+        return many, single
+
+    many, single = asyncio.run(_run())
+
+    assert [r[0]["id"] for r in many] == ["u0", "u1", "u2", "u3"]
+    assert len(calls) == 2
+    assert single[0]["id"] == "u9"
+    router.close_all_engines()
+
+
+def test_embedding_cache_lru_ttl_and_disk_tier() -> None:
+    import tempfile
+    from pathlib import Path
+
+    _install_stubs(types.SimpleNamespace(MEMORY_ENGINE="basic"))
+    embedding = importlib.import_module("nekro_plugin_mem0.mem0_embedding")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "cache.sqlite3"
+        cache = embedding.EmbeddingCache("m", 3, max_entries=2, persist_path=path)
+        cache.put("a", [1.0, 2.0, 3.0])
+        cache.put("b", [2.0, 2.0, 2.0])
+        cache.put("c", [3.0, 3.0, 3.0])
+        assert cache.evictions == 1
+        assert cache.get(" a ") == [1.0, 2.0, 3.0]
+        assert cache.stats()["disk_hits"] == 1
+        assert cache.get("c") == [3.0, 3.0, 3.0]
+        assert cache.stats()["hits"] == 1
+        cache.close()
+
+        reopened = embedding.EmbeddingCache("m", 3, persist_path=path)
+        assert reopened.get("b") == [2.0, 2.0, 2.0]
+        other_model = embedding.EmbeddingCache("m2", 3, persist_path=path)
+        assert other_model.get("b") is None
+        reopened.close()
+        other_model.close()
+
+    expiring = embedding.EmbeddingCache("m", 3, ttl_seconds=0.01)
+    expiring.put("x", [0.0, 0.0, 1.0])
+    import time
+
+    time.sleep(0.02)
+    assert expiring.get("x") is None
+    assert expiring.misses == 1
+
+    calls = []
+
+    class _Embedder:
+        def embed(self, text, memory_action=None):
+            calls.append((text, memory_action))
+            return [1.0]
+
+    client = types.SimpleNamespace(embedding_model=_Embedder())
+    embedding.install_shared_embedder(client, embedding.EmbeddingCache("m", 1))
+    client.embedding_model.embed("same text", "search")
+    client.embedding_model.embed("same  text", "add")
+    assert calls == [("same text", "search")]
+
+
+def test_fusion_engine_drops_late_engine_and_fuses_ranks() -> None:
+    import time
+
+    config = types.SimpleNamespace(
+        MEMORY_ENGINE="fusion",
+        MEMORY_ID="default",
+        FUSION_ENGINES="fast_a,fast_b,late:0.05",
+        FUSION_ENGINE_TIMEOUT=1.0,
+        FUSION_RRF_K=60,
+    )
+    router = _load_router(config)
+    base = sys.modules["nekro_plugin_mem0.memory_engine_base"]
+    fusion = importlib.import_module("nekro_plugin_mem0.memory_engine_fusion")
+
+    def _make_engine(name, ids, delay=0.0):
+        @base.register_engine(name)
+        class _Engine(base.MemoryEngineBase):
+            def __init__(self, config):
+                self.config = config
+
+            def add_memory(self, key, value):
+                return None
+
+            def search_memory(self, query, **kwargs):
+                if delay:
+                    time.sleep(delay)
+                return [{"id": i, "memory": i, "score": 0.5} for i in ids]
+
+            def remove_memory(self, key):
+                return False
+
+    _make_engine("fast_a", ["m1", "m2", "m3"])
+    _make_engine("fast_b", ["m2", "m4"])
+    _make_engine("late", ["m9"], delay=0.3)
+
+    async def _run():
+        started = time.perf_counter()
+        results = await router.route_search("q", user_id="u1", limit=3)
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(_run())
+    engine = router._ENGINE_INSTANCES[("fusion", "default")][1]
+    stats = engine.get_stats()
+
+    assert isinstance(engine, fusion.FusionEngine)
+    assert elapsed < 0.25
+    assert [r["id"] for r in results] == ["m2", "m1", "m4"]
+    assert results[0]["fusion_engines"] == ["fast_a", "fast_b"]
+    assert stats["late"]["timeouts"] == 1
+    assert stats["late"]["contributed"] == 0
+    assert stats["fast_a"]["contributed"] == 2
+    assert stats["fast_b"]["contributed"] == 2
+    router.close_all_engines()
+
+
+def _load_fusion_with_engines(engines: dict) -> tuple:
+    config = types.SimpleNamespace(
+        MEMORY_ENGINE="fusion",
+        MEMORY_ID="default",
+        FUSION_ENGINES=",".join(engines),
+        FUSION_ENGINE_TIMEOUT=1.0,
+        FUSION_RRF_K=60,
+    )
+    router = _load_router(config)
+    base = sys.modules["nekro_plugin_mem0.memory_engine_base"]
+    importlib.import_module("nekro_plugin_mem0.memory_engine_fusion")
+    formatter = importlib.import_module("nekro_plugin_mem0.mem0_output_formatter")
+
+    def _make_engine(name, scored):
+        @base.register_engine(name)
+        class _Engine(base.MemoryEngineBase):
+            def __init__(self, config):
+                self.config = config
+
+            def add_memory(self, key, value):
+                return None
+
+            def search_memory(self, query, **kwargs):
+                return [{"id": i, "memory": i, "score": score} for i, score in scored]
+
+            def remove_memory(self, key):
+                return False
+
+    for name, scored in engines.items():
+        _make_engine(name, scored)
+    return router, formatter
+
+
+def test_fusion_score_keeps_junk_from_a_lone_engine_below_threshold() -> None:
+    junk = [(f"j{i}", 0.05) for i in range(20)]
+    router, formatter = _load_fusion_with_engines({"junk_a": junk, "silent_b": []})
+
+    async def _run():
+        routed = await router.route_search("q", user_id="u1")
+        engine = router._ENGINE_INSTANCES[("fusion", "default")][1]
+        # 同步接口在事件循环内调用也不能依赖 asyncio.run
+        return routed, engine.search_memory("q", user_id="u1")
+
+    routed, synced = asyncio.run(_run())
+    formatted = formatter.format_search_output(routed, threshold=0.5, importance_weight=0.3)
+
+    assert [r["id"] for r in routed] == [f"j{i}" for i in range(20)]
+    assert [r["id"] for r in synced] == [r["id"] for r in routed]
+    # 只有一个引擎返回结果时，排名靠前也不会把无关结果抬到高分
+    assert all(r["score"] == 0.05 and r["engine_score"] == 0.05 for r in routed)
+    assert formatted["results"] == []
+    router.close_all_engines()
+
+
+def test_fusion_score_keeps_disjoint_hits_from_complementary_engines() -> None:
+    router, formatter = _load_fusion_with_engines(
+        {
+            "vector_a": [("a1", 0.92), ("shared", 0.6), ("a2", 0.1)],
+            "graph_b": [("b1", 3.0), ("shared", 1.5), ("b2", 0.3)],
+        }
+    )
+
+    routed = asyncio.run(router.route_search("q", user_id="u1"))
+    formatted = formatter.format_search_output(routed, threshold=0.5, importance_weight=0.3)
+    by_id = {r["id"]: r for r in routed}
+
+    assert routed[0]["id"] == "shared"  # 两个引擎都命中，RRF 排在最前
+    assert by_id["b1"]["score"] == 1.0 and by_id["b1"]["engine_score"] == 3.0
+    assert by_id["shared"]["score"] == 0.6 and by_id["shared"]["engine_score"] == 0.6
+    assert abs(by_id["b2"]["score"] - 0.1) < 1e-9
+    # 只被一个引擎命中的高相关结果不会因为另一个引擎没找到而被过滤
+    assert sorted(r["id"] for r in formatted["results"]) == ["a1", "b1", "shared"]
+    router.close_all_engines()
+
+
+def test_fusion_sync_search_from_executor_worker_does_not_starve() -> None:
+    router, _ = _load_fusion_with_engines(
+        {"vector_a": [("a1", 0.9)], "graph_b": [("b1", 0.8)]}
+    )
+    executor_module = sys.modules["nekro_plugin_mem0.mem0_executor"]
+
+    _ = asyncio.run(router.route_search("q", user_id="u1"))
+    engine = router._ENGINE_INSTANCES[("fusion", "default")][1]
+    previous = executor_module._EXECUTOR
+    # 单线程池：调用方占住唯一的工作线程，子检索若再提交到同一个池只能等到超时
+    setattr(executor_module, "_EXECUTOR", executor_module.PriorityExecutor(workers=1))
+    try:
+        results = executor_module.get_mem0_executor().submit(
+            executor_module.PRIORITY_INTERACTIVE, engine.search_memory, "q", user_id="u1"
+        ).result(timeout=5)
+    finally:
+        executor_module.get_mem0_executor().shutdown()
+        setattr(executor_module, "_EXECUTOR", previous)
+
+    assert sorted(r["id"] for r in results) == ["a1", "b1"]
+    stats = engine.get_stats()
+    assert stats["vector_a"]["calls"] == 2 and stats["vector_a"]["timeouts"] == 0
+    router.close_all_engines()
+
+
+def test_priority_executor_keeps_interactive_ahead_of_maintenance() -> None:
+    import threading
+    import time
+
+    _install_stubs(types.SimpleNamespace(MEMORY_ENGINE="basic"))
+    executor_module = importlib.import_module("nekro_plugin_mem0.mem0_executor")
+    executor = executor_module.PriorityExecutor(
+        workers=2,
+        limits={
+            executor_module.PRIORITY_WRITE: 1,
+            executor_module.PRIORITY_MAINTENANCE: 1,
+        },
+    )
+    release = threading.Event()
+
+    def _blocking_sweep():
+        release.wait(2.0)
+        return "swept"
+
+    async def _run():
+        sweeps = [
+            asyncio.ensure_future(
+                executor.run(executor_module.PRIORITY_MAINTENANCE, _blocking_sweep)
+            )
+            for _ in range(5)
+        ]
+        await asyncio.sleep(0.05)
+        started = time.perf_counter()
+        value = await executor.run(executor_module.PRIORITY_INTERACTIVE, lambda: "read")
+        interactive_latency = time.perf_counter() - started
+        metrics = executor.metrics()
+        release.set()
+        swept = await asyncio.gather(*sweeps)
+        return value, interactive_latency, metrics, swept
+
+    value, latency, metrics, swept = asyncio.run(_run())
+    executor.shutdown()
+
+    assert value == "read"
+    assert latency < 0.2
+    maintenance = metrics[executor_module.PRIORITY_MAINTENANCE]
+    assert maintenance["running"] == 1
+    assert maintenance["queue_depth"] == 4
+    assert swept == ["swept"] * 5
+
+
+def test_write_pipeline_orders_coalesces_and_retries() -> None:
+    _install_stubs(types.SimpleNamespace(MEMORY_ENGINE="basic"))
+    pipeline_module = importlib.import_module("nekro_plugin_mem0.mem0_write_pipeline")
+
+    applied = []
+    attempts = {"flaky": 0}
+
+    def _record(label):
+        async def _call():
+            applied.append(label)
+            return label
+
+        return _call
+
+    async def _flaky():
+        attempts["flaky"] += 1
+        if attempts["flaky"] < 3:
+            raise ConnectionError("transient")
+        applied.append("flaky")
+
+    async def _run():
+        pipeline = pipeline_module.WritePipeline(
+            shards=2, queue_size=2, coalesce_window=0.05, retry_base_delay=0.001
+        )
+        scope = pipeline_module.scope_shard_key("u1", None, None)
+        memory = pipeline_module.memory_shard_key("m1")
+        for i in range(5):
+            await pipeline.submit(scope, _record(f"add{i}"))
+        first = await pipeline.submit(memory, _record("update-a"), coalesce_key="m1")
+        second = await pipeline.submit(memory, _record("update-b"), coalesce_key="m1")
+        await pipeline.submit(memory, _record("delete"), barrier_key="m1")
+        await pipeline.submit(memory, _record("update-c"), coalesce_key="m1")
+        await pipeline.submit(scope, _flaky)
+        await pipeline.close(timeout=2.0)
+        return pipeline.metrics(), first, second
+
+    metrics, first, second = asyncio.run(_run())
+
+    assert [a for a in applied if a.startswith("add")] == [f"add{i}" for i in range(5)]
+    memory_ops = [a for a in applied if a.startswith(("update", "delete"))]
+    assert memory_ops == ["update-b", "delete", "update-c"]
+    assert first is second and first.result() == "update-b"
+    assert "flaky" in applied
+    assert metrics["coalesced"] == 1
+    assert metrics["retried"] == 2
+    assert metrics["failed"] == 0
+    assert metrics["queue_depth"] == 0
+
+
+def test_write_pipeline_retries_non_idempotent_adds_only_when_undelivered() -> None:
+    _install_stubs(types.SimpleNamespace(MEMORY_ENGINE="basic"))
+    pipeline_module = importlib.import_module("nekro_plugin_mem0.mem0_write_pipeline")
+
+    attempts = {"timeout": 0, "refused": 0, "update": 0}
+
+    def _failing_once(label, exc):
+        async def _call():
+            attempts[label] += 1
+            if attempts[label] == 1:
+                raise exc
+            return label
+
+        return _call
+
+    async def _run():
+        pipeline = pipeline_module.WritePipeline(shards=1, retry_base_delay=0.001)
+        # 超时后服务端可能已写入，重试 add 会产生重复记忆
+        timed_out = await pipeline.submit(
+            "s", _failing_once("timeout", TimeoutError("read timeout")), idempotent=False
+        )
+        refused = await pipeline.submit(
+            "s", _failing_once("refused", ConnectionRefusedError()), idempotent=False
+        )
+        update = await pipeline.submit("s", _failing_once("update", TimeoutError("read timeout")))
+        await pipeline.close(timeout=2.0)
+        return timed_out, refused, update, pipeline.metrics()
+
+    timed_out, refused, update, metrics = asyncio.run(_run())
+
+    assert isinstance(timed_out.exception(), TimeoutError)
+    assert attempts == {"timeout": 1, "refused": 2, "update": 2}
+    assert refused.result() == "refused" and update.result() == "update"
+    assert metrics["retried"] == 2 and metrics["failed"] == 1
+
+
+def test_write_pipeline_hands_queued_writes_to_pipeline_on_new_loop() -> None:
+    _install_stubs(types.SimpleNamespace(MEMORY_ENGINE="basic"))
+    pipeline_module = importlib.import_module("nekro_plugin_mem0.mem0_write_pipeline")
+    config = types.SimpleNamespace(MEM0_WRITE_SHARDS=1, MEM0_WRITE_COALESCE_MS=0)
+    executed: list[str] = []
+
+    def _write(label):
+        async def _call():
+            executed.append(label)
+            if label == "stuck":
+                await asyncio.Event().wait()
+            return label
+
+        return _call
+
+    async def _first_loop():
+        pipeline = pipeline_module.get_write_pipeline(config)
+        await pipeline.submit("s", _write("stuck"))
+        await pipeline.submit("s", _write("queued"))
+        await asyncio.sleep(0.01)
+        return pipeline
+
+    async def _second_loop():
+        pipeline = pipeline_module.get_write_pipeline(config)
+        assert await pipeline.flush(timeout=2.0)
+        await pipeline_module.shutdown_write_pipeline()
+        return pipeline
+
+    setattr(pipeline_module, "_PIPELINE", None)
+    first = asyncio.run(_first_loop())
+    assert executed == ["stuck"] and first.queue_depth() == 1
+    second = asyncio.run(_second_loop())
+
+    # 旧循环已结束：未执行的写入移交新管线，不会随旧管线丢失
+    assert second is not first
+    assert executed == ["stuck", "queued"]
+    assert first.queue_depth() == 0
+    assert second.metrics()["completed"] == 1
+
+
+def test_write_pipeline_coalesce_window_does_not_block_shard() -> None:
+    import time
+
+    _install_stubs(types.SimpleNamespace(MEMORY_ENGINE="basic"))
+    pipeline_module = importlib.import_module("nekro_plugin_mem0.mem0_write_pipeline")
+
+    applied = []
+
+    def _record(label):
+        async def _call():
+            applied.append(label)
+            return label
+
+        return _call
+
+    async def _run():
+        pipeline = pipeline_module.WritePipeline(shards=1, coalesce_window=0.5)
+        started = time.perf_counter()
+        update = await pipeline.submit("s", _record("update-a"), coalesce_key="m1")
+        await asyncio.sleep(0.02)
+        merged = await pipeline.submit("s", _record("update-b"), coalesce_key="m1")
+        add = await pipeline.submit("s", _record("add"))
+        await add
+        add_elapsed = time.perf_counter() - started
+
+        lone = await pipeline.submit("s", _record("update-c"), coalesce_key="m2")
+        await asyncio.sleep(0.05)
+        lone_pending = not lone.done()
+        await pipeline.close(timeout=2.0)
+        return update, merged, add_elapsed, lone_pending, time.perf_counter() - started
+
+    update, merged, add_elapsed, lone_pending, total = asyncio.run(_run())
+
+    assert applied == ["update-b", "add", "update-c"]
+    assert update is merged and update.result() == "update-b"
+    assert add_elapsed < 0.3
+    assert lone_pending
+    assert total < 0.5
+
+
+def test_embed_many_batches_cache_misses_into_one_request() -> None:
+    _install_stubs(types.SimpleNamespace(MEMORY_ENGINE="basic"))
+    embedding = importlib.import_module("nekro_plugin_mem0.mem0_embedding")
+
+    requests = []
+
+    class _Embeddings:
+        def create(self, input, model, dimensions=None):
+            requests.append(list(input))
+            return types.SimpleNamespace(
+                data=[
+                    types.SimpleNamespace(index=i, embedding=[float(len(t))])
+                    for i, t in enumerate(input)
+                ]
+            )
+
+    class _OpenAIEmbedder:
+        def __init__(self):
+            self.client = types.SimpleNamespace(embeddings=_Embeddings())
+            self.config = types.SimpleNamespace(model="m", embedding_dims=1)
+
+        def embed(self, text, memory_action=None):
+            raise AssertionError("single-text embed should not be used")
+
+    cache = embedding.EmbeddingCache("m", 1)
+    cache.put("cached", [9.0])
+    client = types.SimpleNamespace(embedding_model=_OpenAIEmbedder())
+    embedding.install_shared_embedder(client, cache)
+
+    assert asyncio.run(embedding.prime_embeddings(client, ["a", "bb", "a ", "cached"]))
+    assert requests == [["a", "bb"]]
+    assert client.embedding_model.embed("bb", "add") == [2.0]
+
+    # 缓存关闭且不在请求作用域内时预计算的向量无处复用，直接跳过，避免每条文本嵌入两次
+    embedding.install_shared_embedder(client, None)
+    assert not asyncio.run(embedding.prime_embeddings(client, ["ccc", "dddd"]))
+    assert requests == [["a", "bb"]]
+
+    # 请求作用域内仍批量预计算，绑定作用域的调用在作用域外执行也能复用
+    async def _primed_in_scope():
+        with embedding.embedding_scope():
+            primed = await embedding.prime_embeddings(client, ["ccc", "dddd"])
+            bound = embedding.bind_embedding_scope(
+                lambda: client.embedding_model.embed("dddd", "add")
+            )
+        return primed, bound
+
+    primed, bound = asyncio.run(_primed_in_scope())
+    assert primed
+    assert requests == [["a", "bb"], ["ccc", "dddd"]]
+    assert bound() == [4.0]
+
+
+def test_hippo_ppr_numpy_and_python_paths_agree_and_track_mutations() -> None:
+    _install_stubs(types.SimpleNamespace(MEMORY_ENGINE="hippo"))
+    pagerank = importlib.import_module("nekro_plugin_mem0.hippo_pagerank")
+
+    graph = pagerank.HippoGraphIndex()
+    graph.add_memory("", "p1", entities=["alice", "bob", "carol"])
+    graph.add_memory("", "p2", entities=["carol", "dave"])
+    graph.add_memory("", "p3", entities=["erin", "frank"])
+
+    first = graph.ppr(["alice"], max_iter=200, tol=1e-12)
+    assert abs(sum(first.values()) - 1.0) < 1e-9
+    assert "erin" not in first  # 不连通的分量没有质量
+    assert first["carol"] > first["dave"] > 0
+
+    numpy_module = pagerank.np
+    try:
+        setattr(pagerank, "np", None)
+        graph._compiled = None
+        fallback = graph.ppr(["alice"], max_iter=200, tol=1e-12)
+    finally:
+        setattr(pagerank, "np", numpy_module)
+    assert set(fallback) == set(first)
+    assert all(abs(fallback[k] - first[k]) < 1e-9 for k in first)
+
+    # 变更后快照失效，新边立即参与游走；未知种子作为孤立节点保留
+    graph.add_edge("dave", "erin")
+    second = graph.ppr(["alice", "unknown"], max_iter=200, tol=1e-12)
+    assert second["erin"] > 0 and second["unknown"] > 0
+
+    candidates = graph.get_candidates_by_ppr(second, top_entities=1, max_candidates=10)
+    assert candidates == {"p1"}  # alice 分数最高，只取其倒排
+
+
+def test_hippo_alias_index_matches_full_consolidation_and_search_is_read_only() -> None:
+    import tempfile
+    from pathlib import Path
+
+    _install_stubs(types.SimpleNamespace(MEMORY_ENGINE="hippo"))
+    alias_merge = importlib.import_module("nekro_plugin_mem0.hippo_alias_merge")
+    hippo = importlib.import_module("nekro_plugin_mem0.memory_engine_hippo")
+
+    vocabulary = ["北京大学", "北京大学校", "清华大学", "alice_smith", "alice_smith_", "bob"]
+    index = alias_merge.EntityAliasIndex(threshold=0.85)
+    for entity in vocabulary:
+        index.add(entity)
+    assert index.mapping() == alias_merge.consolidate_entity_aliases(vocabulary, threshold=0.85)
+
+    restored = alias_merge.EntityAliasIndex.from_alias_map(index.mapping())
+    assert restored.mapping() == index.mapping()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = hippo.HippoEngine(types.SimpleNamespace(), memory_id="alias-test")
+        engine.persist_root = Path(tmp)
+        partition = engine.partition((None, None, None))
+        partition.alias_index = index
+        before = partition.alias_map
+        partition.canonical_entities(["北京大学", "从未见过的实体", "alice_smith__"])
+        engine.search_memory("北京大学 和 alice_smith__")
+        assert partition.alias_map == before
+        assert index.canonical("alice_smith__") == "alice_smith_"
+        engine.close()
+
+
+def test_hippo_remove_memory_reverses_cooccurrence_edges() -> None:
+    _install_stubs(types.SimpleNamespace(MEMORY_ENGINE="hippo"))
+    pagerank = importlib.import_module("nekro_plugin_mem0.hippo_pagerank")
+
+    graph = pagerank.HippoGraphIndex()
+    graph.add_memory("", "p1", entities=["alice", "bob", "carol"])
+    graph.add_memory("", "p2", entities=["alice", "bob"])
+    assert graph.adj["alice"]["bob"] == 2.0
+    graph.ppr(["alice"])  # 先编译快照，确认删除后快照会失效
+
+    graph.remove_memory("p1")
+    assert dict(graph.adj) == {"alice": {"bob": 1.0}, "bob": {"alice": 1.0}}
+    assert "carol" not in graph.ppr(["alice"])
+
+    graph.add_memory("", "p2", entities=["dave", "erin"])  # 同 id 重写先扣除旧贡献
+    assert set(graph.adj) == {"dave", "erin"}
+    graph.remove_memory("p2")
+    assert not graph.adj and not graph.postings
+
+    leaked = pagerank.HippoGraphIndex.from_passages({"p3": ["x", "y"]})
+    assert dict(leaked.adj) == {"x": {"y": 1.0}, "y": {"x": 1.0}}
+
+
+def test_hippo_journal_replays_after_crash_and_compacts_to_snapshot() -> None:
+    import tempfile
+    from pathlib import Path
+
+    _install_stubs(types.SimpleNamespace(MEMORY_ENGINE="hippo"))
+    partition_mod = importlib.import_module("nekro_plugin_mem0.hippo_partition")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_path = Path(tmp) / "default.json"
+
+        def _partition(compact_every: int):
+            partition = partition_mod.HippoPartition("default", snapshot_path, compact_every=compact_every)
+            partition.load()
+            return partition
+
+        def _add(partition, pid: str, entities: list) -> None:
+            partition.add(pid, f"{pid} 内容", partition.normalize_entities(entities), raw_entities=entities)
+
+        first = _partition(compact_every=3)
+        _add(first, "p1", ["Alice", "Bob", "Shanghai"])
+        _add(first, "p2", ["Bob", "Python"])
+        assert not snapshot_path.exists()
+        assert first.remove("p1")  # 第 3 条操作触发后台压缩
+        first.wait_compaction()
+        assert snapshot_path.exists() and not first.journal.rotated_path.exists()
+
+        _add(first, "p3", ["Carol", "Beijing"])
+        first.journal.close()
+        with open(first.journal.journal_path, "a", encoding="utf-8") as f:
+            f.write('{"seq": 99, "op": "add", "pid": "torn"')  # 模拟写入一半时崩溃
+
+        second = _partition(compact_every=100)
+        assert set(second.memory_store) == {"p2", "p3"}
+        assert dict(second.graph.adj) == dict(first.graph.adj)
+        assert second.alias_map == first.alias_map
+        assert second.approx_bytes == first.approx_bytes
+        assert second.journal.seq == 4
+        assert first.journal.journal_path.read_text(encoding="utf-8").endswith("\n")
+
+        second.close()  # 关闭时把剩余日志压缩进快照
+        third = _partition(compact_every=100)
+        assert set(third.memory_store) == {"p2", "p3"} and third.journal.pending_ops == 0
+        third.close()
+
+
+def test_hippo_partitions_isolate_scopes_and_evict_under_budget() -> None:
+    import tempfile
+    import threading
+    from pathlib import Path
+
+    _install_stubs(types.SimpleNamespace(MEMORY_ENGINE="hippo"))
+    hippo = importlib.import_module("nekro_plugin_mem0.memory_engine_hippo")
+
+    with tempfile.TemporaryDirectory() as tmp:
+
+        def _engine():
+            # 预算约 2KB：同时只能常驻一个分区
+            engine = hippo.HippoEngine(types.SimpleNamespace(HIPPO_PARTITION_MEMORY_MB=0.002), memory_id="m")
+            engine.persist_root = Path(tmp)
+            engine.directory = hippo.HippoPassageDirectory(Path(tmp) / "m" / "directory.json")
+            engine._load_state()
+            return engine
+
+        engine = _engine()
+        # 淘汰的分区在引擎锁外释放：释放期间其他线程可以拿到锁
+        lock_free = []
+        original_release = hippo.HippoPartition.release
+
+        def _probing_release(partition):
+            def _probe():
+                acquired = engine._lock.acquire(timeout=1.0)
+                if acquired:
+                    engine._lock.release()
+                lock_free.append(acquired)
+
+            probe = threading.Thread(target=_probe)
+            probe.start()
+            probe.join()
+            original_release(partition)
+
+        setattr(hippo.HippoPartition, "release", _probing_release)
+        try:
+            engine.add_memory("a1", {"content": "Alice 和 Bob 去 Shanghai 出差", "user_id": "u1"})
+            engine.add_memory("b1", {"content": "Bob 和 Carol 在 Beijing 见面", "user_id": "u2"})
+        finally:
+            setattr(hippo.HippoPartition, "release", original_release)
+        assert engine.evictions == 1 and len(engine.partitions) == 1
+        assert lock_free == [True]
+
+        u1 = [item["id"] for item in engine.search_memory("Bob", user_id="u1")]
+        u2 = [item["id"] for item in engine.search_memory("Bob", user_id="u2")]
+        assert u1 == ["a1"] and u2 == ["b1"]  # PPR 候选只来自本作用域
+        assert engine.get_stats()["partitions"]["evictions"] >= 2
+
+        # 目录定位未加载分区中的记忆
+        assert hippo.partition_id_for(("u1", None, None)) not in engine.partitions
+        assert engine.remove_memory("a1")
+        assert engine.search_memory("Bob", user_id="u1") == []
+        engine.close()
+
+        reloaded = _engine()
+        assert reloaded.directory.passages == {"b1": engine.directory.get("b1")}
+        assert [item["id"] for item in reloaded.search_memory("Carol", user_id="u2")] == ["b1"]
+        reloaded.close()
+
+
+def test_hippo_waits_for_releasing_partition_outside_engine_lock() -> None:
+    import tempfile
+    import threading
+    import time
+    from pathlib import Path
+
+    _install_stubs(types.SimpleNamespace(MEMORY_ENGINE="hippo"))
+    hippo = importlib.import_module("nekro_plugin_mem0.memory_engine_hippo")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = hippo.HippoEngine(types.SimpleNamespace(HIPPO_PARTITION_MEMORY_MB=0.002), memory_id="m")
+        engine.persist_root = Path(tmp)
+        engine.directory = hippo.HippoPassageDirectory(Path(tmp) / "m" / "directory.json")
+        engine._load_state()
+        engine.add_memory("a1", {"content": "Alice 和 Bob 去 Shanghai 出差", "user_id": "u1"})
+
+        gate = threading.Event()
+        original_release = hippo.HippoPartition.release
+
+        def _slow_release(partition):
+            gate.wait(5.0)
+            original_release(partition)
+
+        results: dict[str, object] = {}
+        setattr(hippo.HippoPartition, "release", _slow_release)
+        try:
+            # 写入 u2 淘汰 u1，u1 的释放卡在锁外
+            writer = threading.Thread(
+                target=engine.add_memory,
+                args=("b1", {"content": "Bob 和 Carol 在 Beijing 见面", "user_id": "u2"}),
+            )
+            writer.start()
+            deadline = time.monotonic() + 2
+            while hippo.partition_id_for(("u1", None, None)) not in engine._releasing:
+                assert time.monotonic() < deadline
+                time.sleep(0.005)
+
+            # 检索 u1 需等其释放完成，但等待期间不占用引擎锁
+            reader = threading.Thread(
+                target=lambda: results.update(u1=engine.search_memory("Bob", user_id="u1"))
+            )
+            reader.start()
+            time.sleep(0.1)
+            acquired = engine._lock.acquire(timeout=1.0)
+            if acquired:
+                engine._lock.release()
+            gate.set()
+            writer.join(5.0)
+            reader.join(5.0)
+        finally:
+            gate.set()
+            setattr(hippo.HippoPartition, "release", original_release)
+
+        assert acquired
+        assert [item["id"] for item in results["u1"]] == ["a1"]  # type: ignore[union-attr]
+        engine.close()
+
+
+def test_hippo_ppr_cache_hits_until_graph_version_changes() -> None:
+    _install_stubs(types.SimpleNamespace(MEMORY_ENGINE="hippo"))
+    pagerank = importlib.import_module("nekro_plugin_mem0.hippo_pagerank")
+
+    graph = pagerank.HippoGraphIndex(ppr_cache_size=2, ppr_cache_top_n=2)
+    graph.add_memory("", "p1", entities=["alice", "bob", "carol", "dave"])
+
+    first = graph.ppr(["alice", "bob"])
+    assert len(first) == 2  # 只保留前 N 个分数
+    first["alice"] = -1.0  # 调用方修改返回值不影响缓存
+    again = graph.ppr(["bob", "alice", " bob "])
+    assert again["alice"] > 0 and set(again) == set(first)
+    assert graph.ppr_cache_stats()["hits"] == 1
+
+    graph.ppr(["carol"])
+    graph.ppr(["dave"])  # 超出容量，淘汰最久未用的 {alice, bob}
+    graph.ppr(["alice", "bob"])
+    stats = graph.ppr_cache_stats()
+    assert stats["misses"] == 4 and stats["evictions"] == 2
+
+    version = graph.version
+    graph.remove_memory("p1")
+    assert graph.version > version
+    assert graph.ppr(["alice", "bob"]) == {"alice": 0.5, "bob": 0.5}
+    assert graph.ppr_cache_stats()["invalidations"] == 1
+
+
+def test_hippo_push_ppr_approximates_power_iteration_locally() -> None:
+    _install_stubs(types.SimpleNamespace(MEMORY_ENGINE="hippo"))
+    pagerank = importlib.import_module("nekro_plugin_mem0.hippo_pagerank")
+
+    graph = pagerank.HippoGraphIndex(ppr_cache_size=0)
+    graph.add_memory("", "p1", entities=["alice", "bob", "carol"])
+    graph.add_memory("", "p2", entities=["carol", "dave"])
+    for i in range(200):  # 与种子不连通的大分量不应被访问
+        graph.add_memory("", f"far{i}", entities=[f"x{i}", f"x{i + 1}"])
+
+    exact = graph.ppr(["alice", "ghost"], max_iter=500, tol=1e-14)
+    approx = graph.ppr(["alice", "ghost"], method="push", epsilon=1e-7)
+    assert set(approx) == {"alice", "bob", "carol", "dave", "ghost"}
+    assert all(approx[k] <= exact[k] + 1e-12 for k in approx)  # 逐点下界
+    assert max(abs(exact[k] - approx.get(k, 0.0)) for k in exact) < 1e-4
+
+    coarse = graph.ppr(["alice"], method="push", epsilon=0.05)
+    assert sorted(coarse, key=coarse.__getitem__, reverse=True)[0] == "alice"
+    assert len(coarse) < len(approx)
+
+
+def test_hippo_triple_pipeline_batches_caches_and_applies_relation_edges() -> None:
+    import asyncio
+    import json
+    import re
+    import tempfile
+    import time
+    from pathlib import Path
+
+    _install_stubs(types.SimpleNamespace(MEMORY_ENGINE="hippo"))
+    hippo = importlib.import_module("nekro_plugin_mem0.memory_engine_hippo")
+
+    prompts: list[str] = []
+
+    async def fake_llm(prompt: str) -> str:
+        prompts.append(prompt)
+        await asyncio.sleep(0.01)
+        items = [
+            {"passage": int(i), "subject": "Alice", "predicate": "works_at", "object": "Acme Corp"}
+            for i, text in re.findall(r"^\[(\d+)\] (.*)$", prompt, flags=re.M)
+            if "Alice" in text
+        ]
+        return json.dumps(items)
+
+    config = types.SimpleNamespace(HIPPO_TRIPLE_BATCH_WINDOW_MS=50, HIPPO_RELATION_EDGE_WEIGHT=2.0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+
+        def _engine():
+            engine = hippo.HippoEngine(config, memory_id="m")
+            engine.persist_root = Path(tmp)
+            engine.directory = hippo.HippoPassageDirectory(Path(tmp) / "m" / "directory.json")
+            engine._load_state()
+            return engine
+
+        def _graph(engine, user_id):
+            with engine._lock:
+                return engine.partition((user_id, None, None)).graph
+
+        async def _wait_relations(engine, user_id, pid):
+            deadline = time.monotonic() + 5
+            while pid not in _graph(engine, user_id).passage_relations:
+                assert time.monotonic() < deadline
+                await asyncio.sleep(0.01)
+
+        async def main():
+            engine = _engine()
+            pipeline = engine.start_triple_pipeline(fake_llm)
+            text = "Alice joined Acme Corp last year"
+            engine.add_memory("a1", {"content": text, "user_id": "u1"})
+            engine.add_memory("a2", {"content": text, "user_id": "u2"})
+            engine.add_memory("b1", {"content": "Bob likes green tea", "user_id": "u1"})
+            await pipeline.drain()
+            # 三条记忆一个批次；相同内容只发送一次
+            assert len(prompts) == 1 and "[2]" in prompts[0] and "[3]" not in prompts[0]
+            await _wait_relations(engine, "u1", "a1")
+            await _wait_relations(engine, "u2", "a2")
+
+            graph = _graph(engine, "u1")
+            assert graph.relations_between("acme corp", "alice") == {"works_at": 1}
+            assert "a1" in graph.postings["acme corp"]
+            assert "b1" not in graph.passage_relations
+
+            # 内容哈希缓存命中：不再调用 LLM
+            engine.add_memory("a3", {"content": text, "user_id": "u3"})
+            await _wait_relations(engine, "u3", "a3")
+            assert len(prompts) == 1 and pipeline.stats["cache_hits"] == 1
+
+            # 记忆改写后旧结果作废；删除记忆时关系边一并撤销
+            assert engine.apply_triples(
+                hippo.partition_id_for(("u1", None, None)), "a1", "stale", [hippo.Triple("x", "p", "y")]
+            ) == 0
+            assert engine.remove_memory("a1")
+            graph = _graph(engine, "u1")
+            assert graph.relations_between("alice", "acme corp") == {}
+            assert "acme corp" not in graph.postings and "acme corp" not in graph.adj
+            engine.close()
+
+        asyncio.run(main())
+
+        reloaded = _engine()
+        assert _graph(reloaded, "u2").relations_between("alice", "acme corp") == {"works_at": 1}
+        reloaded.close()
+
+
+def test_hippo_entity_extraction_batch_is_memoized_and_matches_single() -> None:
+    _install_stubs(types.SimpleNamespace(MEMORY_ENGINE="hippo"))
+    extraction = importlib.import_module("nekro_plugin_mem0.hippo_entity_extraction")
+    hippo = importlib.import_module("nekro_plugin_mem0.memory_engine_hippo")
+
+    extraction.configure_entity_cache(2)
+    texts = ["Alice 在北京 met Bob, 2024!", "", "Alice 在北京 met Bob, 2024!", "上海 Shanghai 123"]
+    before = extraction.entity_cache_stats()
+    batch = extraction.extract_entities_batch(texts)
+    assert [list(r.entities) for r in batch] == [extraction.extract_entities(t) for t in texts]
+    assert batch[0].normalized == "alice 在北京 met bob 2024"
+    assert batch[0].tokens == ("alice", "在北京", "met", "bob", "2024")
+    assert batch[1] == extraction.TextAnalysis("", (), ())
+    stats = extraction.entity_cache_stats()
+    # 批内重复文本只分析一次；随后三次非空单条调用都命中缓存
+    assert stats["misses"] - before["misses"] == 2 and stats["hits"] - before["hits"] == 3
+    assert stats["entries"] == 2
+
+    # 检索结果缺少 hippo_entities 元数据时一次批量提取
+    engine = hippo.HippoEngine(types.SimpleNamespace(HIPPO_ENTITY_CACHE_SIZE=16), memory_id="m")
+    before = extraction.entity_cache_stats()
+    items = [
+        {"id": "r1", "memory": "Alice 在北京", "metadata": {"hippo_entities": ["alice"]}},
+        {"id": "r2", "memory": "Bob visited Shanghai"},
+        {"id": "r3", "memory": ""},
+    ]
+    assert engine._extract_results_entities(items) == [["alice"], ["bob", "visited", "shanghai"], []]
+    assert extraction.entity_cache_stats()["misses"] - before["misses"] == 1
+
+
+def test_hippo_passage_store_migrates_legacy_state_and_hydrates_only_results() -> None:
+    import json
+    import tempfile
+    from pathlib import Path
+
+    _install_stubs(types.SimpleNamespace(MEMORY_ENGINE="hippo"))
+    hippo = importlib.import_module("nekro_plugin_mem0.memory_engine_hippo")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = Path(tmp) / "m.json"
+        legacy.write_text(
+            json.dumps(
+                {
+                    "graph": {"passage_entities": {"p1": ["alice", "bob"], "p2": ["bob", "carol"]}},
+                    "alias_map": {},
+                    "memory_store": {
+                        "p1": {"content": "alice 和 bob", "entities": ["alice", "bob"]},
+                        "p2": {"content": "bob 和 carol", "entities": ["bob", "carol"]},
+                    },
+                }
+            ),
+            encoding="utf-8",
+        )
+
+        def _engine():
+            engine = hippo.HippoEngine(types.SimpleNamespace(HIPPO_MAX_CANDIDATES=1), memory_id="m")
+            engine.persist_root = Path(tmp)
+            engine.directory = hippo.HippoPassageDirectory(Path(tmp) / "m" / "directory.json")
+            engine._load_state()
+            return engine
+
+        engine = _engine()
+        store = engine._passages()
+        requested: list[list[str]] = []
+        get_many = store.get_many
+        store.get_many = lambda partition, pids: requested.append(list(pids)) or get_many(partition, pids)
+
+        results = engine.search_memory("bob")  # p1、p2 都是 PPR 候选，只返回 1 条
+        assert len(results) == 1 and results[0]["memory"] == f"{' 和 '.join(results[0]['entities'])}"
+        assert requested == [[results[0]["id"]]]  # 只读取最终返回的正文
+        # 旧快照中的正文迁移到正文库后，快照改写为不含正文
+        assert "memory_store" not in json.loads(legacy.read_text(encoding="utf-8"))
+        assert sorted(store.pids(hippo.DEFAULT_PARTITION)) == ["p1", "p2"]
+
+        engine.add_memory("p3", {"content": "Dave 在 Hangzhou", "user_id": "u1"})
+        journal = Path(tmp) / "m" / f"{hippo.partition_id_for(('u1', None, None))}.journal.jsonl"
+        assert "Hangzhou" not in journal.read_text(encoding="utf-8")
+
+        store.put(hippo.DEFAULT_PARTITION, "orphan", "写入日志前崩溃", [])
+        engine.close()
+
+        reloaded = _engine()
+        with reloaded._lock:
+            partition = reloaded.partition((None, None, None))
+            assert set(partition.memory_store) == {"p1", "p2"}
+            assert partition.memory_store["p2"]["content"] == "bob 和 carol"
+        reloaded.close()
+
+
+def test_emgas_incremental_ppmi_matches_full_recount() -> None:
+    import random
+    import tempfile
+    from collections import Counter
+    from pathlib import Path
+
+    _install_stubs(types.SimpleNamespace(MEMORY_ENGINE="emgas"))
+    ppmi = importlib.import_module("nekro_plugin_mem0.emgas_ppmi")
+    emgas = importlib.import_module("nekro_plugin_mem0.memory_engine_emgas")
+
+    rng = random.Random(7)
+    vocabulary = [f"c{i}" for i in range(60)]
+    documents: dict[int, list[str]] = {}
+    index = ppmi.IncrementalPPMI()
+    for step in range(400):
+        if documents and rng.random() < 0.25:
+            index.remove_document(documents.pop(rng.choice(sorted(documents))))
+        else:
+            documents[step] = rng.sample(vocabulary, rng.randint(1, 7))
+            index.add_document(documents[step])
+
+    cooccurrence = ppmi.build_cooccurrence_matrix(list(documents.values()))
+    total = sum(cooccurrence.values())
+    full = ppmi.compute_ppmi(cooccurrence, Counter(c for doc in documents.values() for c in doc), total)
+    rows = index.take_dirty_rows()  # 首次取出为全量刷新
+    scores = {(a, b): score for a, row in rows.items() for b, score in row.items()}
+    assert index.total_pairs == total and set(scores) == set(full)
+    assert all(abs(scores[pair] - full[pair]) < 1e-9 for pair in full)
+
+    # N 变化很小时只重算受影响的行
+    index.add_document(["c1", "c2"])
+    assert set(index.take_dirty_rows()) == {"c1", "c2"}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = emgas.EMGASEngine(types.SimpleNamespace(MEMORY_ID="ppmi-test"))
+        engine.graph_path = Path(tmp) / "graph.json"
+        engine.add_memory("p1", {"memory": "alice bob", "concepts": ["alice", "bob", "carol"]})
+        engine.add_memory("p2", {"memory": "alice dave", "concepts": ["alice", "dave"]})
+        engine.add_memory("p1", {"memory": "改写", "concepts": ["alice", "erin"]})  # 改写先扣除旧文档
+        assert engine.ppmi.concept_counts == Counter({"alice": 2, "dave": 1, "erin": 1})
+        assert engine.search_memory("alice") and not engine.ppmi._dirty  # 检索前惰性写回边权
+        assert engine.remove_memory("p2")
+        assert engine.ppmi.concept_counts == Counter({"alice": 1, "erin": 1})
+        engine.close()
+
+
+def test_emgas_persistence_is_debounced_atomic_and_binary() -> None:
+    import tempfile
+    import time
+    from pathlib import Path
+
+    _install_stubs(types.SimpleNamespace(MEMORY_ENGINE="emgas"))
+    emgas = importlib.import_module("nekro_plugin_mem0.memory_engine_emgas")
+    snapshot = importlib.import_module("nekro_plugin_mem0.emgas_snapshot")
+
+    def _edges(graph):
+        return {src: {dst: edge.weight for dst, edge in row.items()} for src, row in graph.edges.items()}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = types.SimpleNamespace(MEMORY_ID="flush-test", EMGAS_FLUSH_DELAY_SECONDS=0.2)
+
+        def _engine():
+            engine = emgas.EMGASEngine(config)
+            engine.graph_path = Path(tmp) / "flush-test.json"
+            engine._load_graph()
+            return engine
+
+        engine = _engine()
+        for i in range(20):
+            engine.add_memory(f"p{i}", {"memory": f"m{i}", "concepts": ["alice", f"topic{i % 3}"]})
+        assert not engine.snapshot_path.exists()  # 连续写入被合并，防抖期内不落盘
+        deadline = time.monotonic() + 5
+        while not engine.snapshot_path.exists():
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+        assert engine._flushed_gen == engine._dirty_gen == 20
+        assert not engine.snapshot_path.with_name(engine.snapshot_path.name + ".tmp").exists()
+
+        engine.remove_memory("p0")
+        engine.close()  # 关闭时同步写入剩余变更
+        reloaded = snapshot.load_snapshot(engine.snapshot_path)
+        assert set(reloaded.nodes) == set(engine.graph.nodes) and "passage::p0" not in reloaded.nodes
+        assert _edges(reloaded) == _edges(engine.graph)
+        node = engine.graph.nodes["alice"]
+        assert reloaded.nodes["alice"].source_passage_ids == node.source_passage_ids
+        assert abs((reloaded.nodes["alice"].last_accessed - node.last_accessed).total_seconds()) < 1e-3
+
+        # 旧版 JSON 状态可直接加载，下次落盘转为二进制快照
+        engine.snapshot_path.unlink()
+        engine.graph.save(str(engine.graph_path))
+        legacy = _engine()
+        assert _edges(legacy.graph) == _edges(engine.graph)
+        legacy._save_graph()
+        legacy.close()
+        assert _edges(snapshot.load_snapshot(legacy.snapshot_path)) == _edges(engine.graph)
+
+        # 快照损坏：记录告警并保留原文件；JSON 早于快照时不回退，晚于快照时回退
+        warnings = []
+        original_logger = emgas.logger
+        setattr(emgas, "logger", types.SimpleNamespace(warning=warnings.append))
+        corrupt_path = legacy.snapshot_path.with_name(legacy.snapshot_path.name + ".corrupt")
+        legacy.snapshot_path.write_bytes(b"EMGS-broken")
+        os.utime(engine.graph_path, (1_000_000, 1_000_000))
+        stale = _engine()
+        assert len(stale.graph.nodes) == 0
+        assert corrupt_path.read_bytes() == b"EMGS-broken"
+        assert not stale.snapshot_path.exists()
+        assert len(warnings) == 2
+        stale.close()
+
+        warnings.clear()
+        legacy.snapshot_path.write_bytes(b"EMGS-broken")
+        os.utime(legacy.snapshot_path, (1_000_000, 1_000_000))
+        fallback = _engine()
+        assert _edges(fallback.graph) == _edges(engine.graph)
+        assert len(warnings) == 1
+        fallback.close()
+        setattr(emgas, "logger", original_logger)
+
+
+def test_emgas_remove_memory_and_prune_use_reverse_index() -> None:
+    _install_stubs(types.SimpleNamespace(MEMORY_ENGINE="emgas"))
+    spreading = importlib.import_module("nekro_plugin_mem0.emgas_spreading")
+    snapshot = importlib.import_module("nekro_plugin_mem0.emgas_snapshot")
+
+    def _edges(graph):
+        return {src: {dst: edge.weight for dst, edge in row.items()} for src, row in graph.edges.items() if row}
+
+    def _indexes(graph):
+        return (
+            {k: v for k, v in graph.in_edges.items() if v},
+            {k: v for k, v in graph.passage_nodes.items() if v},
+        )
+
+    memories = {
+        "p1": ["alice", "coffee"],
+        "p2": ["alice", "berlin"],
+        "p3": ["paris", "louvre"],
+    }
+    full = spreading.EMGASGraph()
+    without_p1 = spreading.EMGASGraph()
+    for pid, concepts in memories.items():
+        full.add_memory(f"m-{pid}", pid, concepts)
+        if pid != "p1":
+            without_p1.add_memory(f"m-{pid}", pid, concepts)
+
+    full.remove_memory("p1")
+    # 仅由 p1 引入的概念随之删除，其余节点的来源与边与从未写入 p1 的图一致
+    assert set(full.nodes) == set(without_p1.nodes) and "coffee" not in full.nodes
+    assert full.nodes["alice"].source_passage_ids == {"p2"}
+    assert _edges(full) == _edges(without_p1)
+    assert "p1" not in full.passage_nodes
+
+    live = _indexes(full)
+    full.rebuild_indexes()
+    assert _indexes(full) == live
+
+    # 剪枝通过反向索引删除指向被剪节点的入边
+    full.set_activation("louvre", 0.0)
+    assert full.prune(0.05) == ["louvre"]
+    assert "louvre" not in full.nodes and "louvre" not in full.in_edges
+    assert all("louvre" not in row for row in full.edges.values())
+    assert "louvre" not in full.passage_nodes["p3"]
+
+    reloaded = snapshot.decode_graph(snapshot.encode_graph(full))
+    assert _indexes(reloaded) == _indexes(full)
+
+def test_emgas_sparse_frontier_and_csr_spreading_agree() -> None:
+    _install_stubs(types.SimpleNamespace(MEMORY_ENGINE="emgas"))
+    spreading = importlib.import_module("nekro_plugin_mem0.emgas_spreading")
+
+    graph = spreading.EMGASGraph()
+    graph.add_memory("m1", "p1", ["alice", "paris", "coffee"])
+    graph.add_memory("m2", "p2", ["alice", "berlin"])
+    graph.add_memory("m3", "p3", ["paris", "louvre"])
+    # 与种子不连通的分量不应进入激活前沿
+    graph.add_memory("m4", "p4", ["tokyo", "sushi"])
+
+    seeds = ["alice", "missing"]
+    options = {"top_n": 1000, "firing_threshold": 0.05}
+    ranked = graph._spread_frontier(seeds, spreading.SpreadingActivationOptions(**options))
+    assert {node_id for node_id, _ in ranked}.isdisjoint({"tokyo", "sushi", "passage::p4"})
+    frontier = graph.retrieve_context(seeds, spreading.SpreadingActivationOptions(**options, use_csr=False))
+    assert set(frontier) == {"p1", "p2", "p3"}
+
+    if spreading.np is not None:
+        csr = graph.compile()
+        assert csr is not None and graph.compile() is csr  # 图未变更时复用快照
+        ranked_csr = graph._spread_csr(csr, seeds, spreading.SpreadingActivationOptions(**options))
+        expected = dict(ranked)
+        assert dict(ranked_csr).keys() == expected.keys()
+        assert all(abs(score - expected[node_id]) < 1e-9 for node_id, score in ranked_csr)
+        vectorized = graph.retrieve_context(seeds, spreading.SpreadingActivationOptions(**options))
+        assert vectorized.keys() == frontier.keys()
+        assert all(abs(vectorized[pid] - frontier[pid]) < 1e-9 for pid in frontier)
+
+        top = graph._spread_csr(csr, seeds, spreading.SpreadingActivationOptions(top_n=2))
+        assert top == ranked_csr[:2]
+
+    # 修改边权使快照失效，检索退回字典前沿并反映新权重
+    version = graph.version
+    graph.set_edge_weight("alice", "berlin", 50.0)
+    assert graph.version > version
+    boosted = graph._spread_frontier(seeds, spreading.SpreadingActivationOptions(**options))
+    assert boosted[0][0] == "berlin"
+    if spreading.np is not None:
+        csr = graph.compile()
+        assert csr is not None and csr.version == graph.version
+        assert graph._spread_csr(csr, seeds, spreading.SpreadingActivationOptions(**options))[0][0] == "berlin"
+
+def test_emgas_decay_is_lazy_and_prune_pops_only_expired_nodes() -> None:
+    import math
+    import tempfile
+    import time
+    from pathlib import Path
+
+    _install_stubs(types.SimpleNamespace(MEMORY_ENGINE="emgas"))
+    spreading = importlib.import_module("nekro_plugin_mem0.emgas_spreading")
+    emgas = importlib.import_module("nekro_plugin_mem0.memory_engine_emgas")
+
+    graph = spreading.EMGASGraph(decay_rate=0.01, prune_threshold=0.05)
+    graph.add_memory("m1", "p1", ["alice", "paris"])
+    graph.add_memory("m2", "p2", ["bob"])
+    start = time.time()
+    reference = graph.nodes["bob"].last_accessed.timestamp()
+    # 读取时按经过时间计算衰减，存储值保持不变
+    assert abs(graph.activation("bob", now=reference + 100 * 3600) - 0.5 * math.exp(-1.0)) < 1e-12
+    assert abs(graph.nodes["bob"].base_activation - 0.5) < 1e-9
+
+    # 0.5 → 0.05 需要 ln(10) / 0.01 ≈ 230.3 小时
+    assert graph.prune(now=start + 229 * 3600) == []
+    assert len(graph.nodes) == 5
+
+    # 检索重新锚定命中的节点，到期时间随之后移，旧的堆条目被跳过
+    later = int((start + 200 * 3600) * 1_000_000)
+    for node_id in ("alice", "paris", "passage::p1"):
+        graph._anchor(graph._store.ids[node_id], later, floor=0.5)
+    removed = graph.prune(now=start + 232 * 3600)
+    assert sorted(removed) == ["bob", "passage::p2"]
+    assert set(graph.nodes) == {"alice", "paris", "passage::p1"}
+    assert graph.prune(now=start + 429 * 3600) == []
+    assert sorted(graph.prune(now=start + 432 * 3600)) == ["alice", "paris", "passage::p1"]
+
+    # 反复重新锚定时失效条目被压缩，堆大小有界
+    graph.add_memory("m3", "p3", ["carol"])
+    for _ in range(500):
+        graph.add_node("carol")
+    assert graph._expiry_entries <= 2 * len(graph.nodes) + 64
+    assert graph._expiry_entries == sum(len(bucket) for bucket in graph._expiry_buckets.values())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = types.SimpleNamespace(MEMORY_ID="decay-test", EMGAS_PRUNE_THRESHOLD=0.4)
+        engine = emgas.EMGASEngine(config)
+        engine.graph_path = Path(tmp) / "decay-test.json"
+        engine.add_memory("p1", {"memory": "m1", "concepts": ["alice"]})
+        engine.add_memory("p2", {"memory": "m2", "concepts": ["bob"]})
+        assert engine.run_maintenance() == []
+        engine.graph.set_activation("passage::p2", 0.1)
+        engine.graph.set_activation("bob", 0.1)
+        assert sorted(engine.run_maintenance()) == ["bob", "passage::p2"]
+        assert set(engine.passage_store) == {"p1"}
+        engine.close()
+
+def test_emgas_compact_store_reuses_slots_and_round_trips() -> None:
+    import dataclasses
+
+    _install_stubs(types.SimpleNamespace(MEMORY_ENGINE="emgas"))
+    spreading = importlib.import_module("nekro_plugin_mem0.emgas_spreading")
+    snapshot = importlib.import_module("nekro_plugin_mem0.emgas_snapshot")
+
+    graph = spreading.EMGASGraph()
+    graph.add_memory("m1", "p1", ["alice", "paris"])
+    graph.add_memory("m2", "p2", ["alice", "berlin"])
+    store = graph._store
+    # 节点属性存放在平行数组中，视图读写直接落到数组
+    node = graph.nodes["alice"]
+    node.base_activation = 0.75
+    assert store.activations[store.ids["alice"]] == 0.75
+    assert node.source_passage_ids == {"p1", "p2"}
+    assert graph.edges["alice"]["passage::p1"].weight == 1.0
+    try:
+        graph.edges["alice"]["passage::p1"].weight = 3.0  # type: ignore[misc]
+        raise AssertionError("边权快照应为只读")
+    except dataclasses.FrozenInstanceError:
+        pass
+
+    # 删除后的下标被新节点复用，旧视图失效
+    berlin_index = store.ids["berlin"]
+    graph.remove_memory("p2")
+    assert "berlin" not in graph.nodes and "p2" not in store.pid_ids
+    assert node.source_passage_ids == {"p1"}
+    try:
+        stale = spreading.EMGASNode(graph, "berlin")
+        _ = stale.base_activation
+        raise AssertionError("已删除节点的视图应抛出 KeyError")
+    except KeyError:
+        pass
+    graph.add_memory("m3", "p3", ["tokyo"])
+    assert store.ids["tokyo"] == berlin_index or store.ids["passage::p3"] == berlin_index
+    for row in store.out_targets:
+        assert row is None or list(row) == sorted(row)
+
+    reloaded = snapshot.decode_graph(snapshot.encode_graph(graph))
+    assert reloaded._store.names == store.names and reloaded._store.free == store.free
+    assert {k: v.weight for k, v in reloaded.edges["alice"].items()} == {k: v.weight for k, v in graph.edges["alice"].items()}
+    assert reloaded.nodes["alice"].base_activation == 0.75
+    assert reloaded.nodes["tokyo"].source_passage_ids == {"p3"}
+    assert dict(reloaded.passage_nodes) == dict(graph.passage_nodes)
+    reloaded.add_memory("m4", "p4", ["alice", "rome"])
+    assert reloaded.nodes["alice"].source_passage_ids == {"p1", "p4"}
+
+
+if __name__ == "__main__":
+    test_engine_registry_reuses_instance_for_same_config()
+    test_engine_registry_replaces_instance_when_config_changes()
+    test_engine_registry_retires_instances_when_engine_or_memory_id_changes()
+    test_route_search_runs_sync_engine_off_event_loop()
+    test_route_search_many_embeds_query_once()
+    test_embedding_cache_lru_ttl_and_disk_tier()
+    test_fusion_engine_drops_late_engine_and_fuses_ranks()
+    test_fusion_score_keeps_junk_from_a_lone_engine_below_threshold()
+    test_fusion_score_keeps_disjoint_hits_from_complementary_engines()
+    test_fusion_sync_search_from_executor_worker_does_not_starve()
+    test_priority_executor_keeps_interactive_ahead_of_maintenance()
+    test_write_pipeline_orders_coalesces_and_retries()
+    test_write_pipeline_coalesce_window_does_not_block_shard()
+    test_write_pipeline_retries_non_idempotent_adds_only_when_undelivered()
+    test_write_pipeline_hands_queued_writes_to_pipeline_on_new_loop()
+    test_embed_many_batches_cache_misses_into_one_request()
+    test_hippo_ppr_numpy_and_python_paths_agree_and_track_mutations()
+    test_hippo_alias_index_matches_full_consolidation_and_search_is_read_only()
+    test_hippo_remove_memory_reverses_cooccurrence_edges()
+    test_hippo_journal_replays_after_crash_and_compacts_to_snapshot()
+    test_hippo_partitions_isolate_scopes_and_evict_under_budget()
+    test_hippo_waits_for_releasing_partition_outside_engine_lock()
+    test_hippo_ppr_cache_hits_until_graph_version_changes()
+    test_hippo_push_ppr_approximates_power_iteration_locally()
+    test_hippo_triple_pipeline_batches_caches_and_applies_relation_edges()
+    test_hippo_entity_extraction_batch_is_memoized_and_matches_single()
+    test_hippo_passage_store_migrates_legacy_state_and_hydrates_only_results()
+    test_emgas_incremental_ppmi_matches_full_recount()
+    test_emgas_persistence_is_debounced_atomic_and_binary()
+    test_emgas_remove_memory_and_prune_use_reverse_index()
+    test_emgas_sparse_frontier_and_csr_spreading_agree()
+    test_emgas_decay_is_lazy_and_prune_pops_only_expired_nodes()
+    test_emgas_compact_store_reuses_slots_and_round_trips()
+    print("✅ test_memory_engines passed")
@@ -83,6 +83,12 @@ def _load_plugin_method_module():
 
             return _decorator
 
+        def mount_cleanup_method(self):
+            def _decorator(func):
+                return func
+
+            return _decorator
+
         def mount_sandbox_method(self, *args, **kwargs):
             def _decorator(func):
                 return func
@@ -207,7 +213,12 @@ def _load_plugin_method_module():
     async def _route_search_stub(*args, **kwargs):
         return []
 
+    async def _route_search_many_stub(query, scopes, **kwargs):
+        return [[] for _ in scopes]
+
     setattr(memory_router_stub, "route_search", _route_search_stub)
+    setattr(memory_router_stub, "route_search_many", _route_search_many_stub)
+    setattr(memory_router_stub, "close_all_engines", lambda: None)
     sys.modules[f"{package_name}.memory_engine_router"] = memory_router_stub
 
     utils_module = importlib.import_module("utils")
@@ -743,6 +754,284 @@ def test_build_scope_from_context_uses_resolve_fallback_fields() -> None:
     assert scope.run_id == plugin_method.get_preset_id("console-session-1")
 
 
+def test_add_memories_resolves_scope_once_and_reports_per_item_status() -> None:
+    plugin_method = _load_plugin_method_module()
+
+    class _Client:
+        def __init__(self):
+            self.added = []
+
+        def add(self, memory, **kwargs):
+            self.added.append((memory, kwargs))
+
+    async def _fake_get_mem0_client():
+        return client
+
+    client = _Client()
+    config = plugin_method.get_memory_config()
+    config.DEDUP_ENABLED = True
+    config.DEDUP_SIMHASH_THRESHOLD = 10
+    config.DEDUP_SIMILARITY_THRESHOLD = 0.8
+    setattr(plugin_method, "get_mem0_client", _fake_get_mem0_client)
+    setattr(plugin_method, "get_memory_config", lambda: config)
+
+    async def _run():
+        result = await plugin_method.add_memories(
+            None,
+            [
+                "用户喜欢猫",
+                "用户喜欢猫",
+                "  ",
+                {"memory": "用户下周出差上海", "importance": 9},
+            ],
+            user_id="u1",
+            scope_level="global",
+        )
+        await plugin_method.shutdown_write_pipeline()
+        return result
+
+    result = __import__("asyncio").run(_run())
+
+    assert result["submitted"] == 2
+    statuses = result["results"]
+    assert [item["ok"] for item in statuses] == [True, False, False, True]
+    assert statuses[1]["error"] == "记忆重复"
+    assert [memory for memory, _ in client.added] == ["用户喜欢猫", "用户下周出差上海"]
+    assert all(kwargs["user_id"] == "u1" for _, kwargs in client.added)
+    assert client.added[1][1]["metadata"]["importance"] == 9
+
+
+def test_add_memories_reuses_batched_embeddings_without_cache() -> None:
+    plugin_method = _load_plugin_method_module()
+    embedding = sys.modules["nekro_plugin_mem0.mem0_embedding"]
+    executor = sys.modules["nekro_plugin_mem0.mem0_executor"]
+
+    batches = []
+    single_calls = []
+
+    class _Embeddings:
+        def create(self, input, model, dimensions=None):
+            batches.append(list(input))
+            return types.SimpleNamespace(
+                data=[
+                    types.SimpleNamespace(index=i, embedding=[float(len(t))])
+                    for i, t in enumerate(input)
+                ]
+            )
+
+    class _OpenAIEmbedder:
+        def __init__(self):
+            self.client = types.SimpleNamespace(embeddings=_Embeddings())
+            self.config = types.SimpleNamespace(model="m", embedding_dims=1)
+
+        def embed(self, text, memory_action=None):
+            single_calls.append(text)
+            return [float(len(text))]
+
+    class _Client:
+        def __init__(self):
+            self.embedding_model = _OpenAIEmbedder()
+            self.added = []
+
+        def add(self, memory, **kwargs):
+            self.embedding_model.embed(memory, "add")
+            self.added.append(memory)
+
+    async def _fake_get_mem0_client():
+        return client
+
+    def _search(query):
+        client.embedding_model.embed(query, "search")
+        return []
+
+    async def _route_search(query, **kwargs):
+        return await executor.run_mem0_io(executor.PRIORITY_INTERACTIVE, _search, query)
+
+    client = _Client()
+    # 未启用嵌入缓存：批量预计算的向量只记在请求作用域内
+    embedding.install_shared_embedder(client, None)
+    config = plugin_method.get_memory_config()
+    config.DEDUP_ENABLED = True
+    config.DEDUP_SIMHASH_THRESHOLD = 10
+    config.DEDUP_SIMILARITY_THRESHOLD = 0.8
+    setattr(plugin_method, "get_mem0_client", _fake_get_mem0_client)
+    setattr(plugin_method, "get_memory_config", lambda: config)
+    setattr(plugin_method, "route_search", _route_search)
+
+    async def _run():
+        result = await plugin_method.add_memories(
+            None, ["用户喜欢猫", "用户下周出差上海"], user_id="u1", scope_level="global"
+        )
+        await plugin_method.shutdown_write_pipeline()
+        return result
+
+    result = __import__("asyncio").run(_run())
+
+    assert result["submitted"] == 2
+    assert client.added == ["用户喜欢猫", "用户下周出差上海"]
+    assert batches == [["用户喜欢猫", "用户下周出差上海"]]
+    assert single_calls == []
+
+
+def test_back_to_back_identical_adds_dedup_against_pending_writes() -> None:
+    import threading
+
+    plugin_method = _load_plugin_method_module()
+    release = threading.Event()
+
+    class _Client:
+        def __init__(self):
+            self.added = []
+
+        def add(self, memory, **kwargs):
+            release.wait(2.0)
+            self.added.append((memory, kwargs))
+
+    async def _fake_get_mem0_client():
+        return client
+
+    client = _Client()
+    config = plugin_method.get_memory_config()
+    config.DEDUP_ENABLED = True
+    config.DEDUP_SIMHASH_THRESHOLD = 10
+    config.DEDUP_SIMILARITY_THRESHOLD = 0.8
+    setattr(plugin_method, "get_mem0_client", _fake_get_mem0_client)
+    setattr(plugin_method, "get_memory_config", lambda: config)
+
+    async def _run():
+        first = await plugin_method.add_memory(None, "用户喜欢猫", user_id="u1", scope_level="global")
+        # 第一条仍在排队，检索不到；待写入叠加层中的同作用域新增也参与去重
+        second = await plugin_method.add_memory(None, "用户喜欢猫", user_id="u1", scope_level="global")
+        batch = await plugin_method.add_memories(
+            None, ["用户喜欢猫"], user_id="u1", scope_level="global"
+        )
+        other_scope = await plugin_method.add_memory(
+            None, "用户喜欢猫", user_id="u2", scope_level="global"
+        )
+        release.set()
+        await plugin_method.shutdown_write_pipeline()
+        return first, second, batch, other_scope
+
+    first, second, batch, other_scope = __import__("asyncio").run(_run())
+
+    assert first["ok"] is True
+    assert second["ok"] is False and second["error"] == "记忆重复" and second["pending"] is True
+    assert batch["submitted"] == 0 and batch["results"][0]["error"] == "记忆重复"
+    assert other_scope["ok"] is True
+    assert [(memory, kwargs["user_id"]) for memory, kwargs in client.added] == [
+        ("用户喜欢猫", "u1"),
+        ("用户喜欢猫", "u2"),
+    ]
+
+
+def test_reads_see_pending_adds_and_hide_pending_deletes() -> None:
+    import threading
+
+    plugin_method = _load_plugin_method_module()
+    release = threading.Event()
+
+    class _Client:
+        def __init__(self):
+            self.records = [
+                {"id": "m1", "memory": "用户喜欢狗", "user_id": "u1"},
+                {"id": "m2", "memory": "用户住在北京", "user_id": "u1"},
+            ]
+
+        def get_all(self, **kwargs):
+            return list(self.records)
+
+        def add(self, memory, **kwargs):
+            release.wait(2.0)
+            self.records.append({"id": "m3", "memory": memory, **kwargs})
+
+        def delete(self, memory_id):
+            release.wait(2.0)
+            self.records = [r for r in self.records if r["id"] != memory_id]
+
+    async def _fake_get_mem0_client():
+        return client
+
+    client = _Client()
+    config = plugin_method.get_memory_config()
+    config.LEGACY_SCOPE_FALLBACK_ENABLED = False
+    setattr(plugin_method, "get_mem0_client", _fake_get_mem0_client)
+    setattr(plugin_method, "get_memory_config", lambda: config)
+    layer_ids = {"layer": "global", "user_id": "u1", "agent_id": None, "run_id": None}
+
+    async def _read():
+        records, _ = await plugin_method._read_with_legacy_fallback(
+            client=client, layer_ids=layer_ids, plugin_config=config, op="get_all"
+        )
+        return sorted(str(r.get("memory")) for r in records)
+
+    async def _run():
+        await plugin_method.add_memory(None, "用户喜欢猫", user_id="u1", scope_level="global")
+        await plugin_method.delete_memory(None, "m1")
+        pending_view = await _read()
+        release.set()
+        await plugin_method.shutdown_write_pipeline()
+        return pending_view, await _read()
+
+    pending_view, settled_view = __import__("asyncio").run(_run())
+
+    assert pending_view == ["用户住在北京", "用户喜欢猫"]
+    assert settled_view == ["用户住在北京", "用户喜欢猫"]
+    assert plugin_method.get_write_overlay().pending_count() == 0
+
+
+def test_search_memory_embeds_query_once_across_layers() -> None:
+    import threading
+
+    plugin_method = _load_plugin_method_module()
+    embedding = sys.modules["nekro_plugin_mem0.mem0_embedding"]
+    executor = sys.modules["nekro_plugin_mem0.mem0_executor"]
+
+    calls = []
+    calls_lock = threading.Lock()
+
+    class _CountingEmbedder:
+        def embed(self, text, memory_action=None):
+            with calls_lock:
+                calls.append(text)
+            return [float(len(text))]
+
+    client = types.SimpleNamespace(embedding_model=_CountingEmbedder())
+    embedding.install_shared_embedder(client)
+
+    def _search(query, **scope):
+        client.embedding_model.embed(query, "search")
+        owner = "/".join(f"{key}={value}" for key, value in sorted(scope.items()))
+        return [{"id": owner, "memory": f"{owner} 记得{query}", "score": 0.95}]
+
+    async def _route_search_many(query, scopes, **kwargs):
+        with embedding.embedding_scope():
+            return await __import__("asyncio").gather(
+                *(
+                    executor.run_mem0_io(executor.PRIORITY_INTERACTIVE, _search, query, **scope)
+                    for scope in scopes
+                )
+            )
+
+    async def _fake_get_mem0_client():
+        return client
+
+    config = plugin_method.get_memory_config()
+    config.LEGACY_SCOPE_FALLBACK_ENABLED = False
+    setattr(plugin_method, "get_mem0_client", _fake_get_mem0_client)
+    setattr(plugin_method, "get_memory_config", lambda: config)
+    setattr(plugin_method, "route_search_many", _route_search_many)
+
+    result = __import__("asyncio").run(
+        plugin_method.search_memory(
+            None, "咖啡", user_id="u1", agent_id="a1", layers=["persona", "global"]
+        )
+    )
+
+    assert result["ok"] is True
+    assert [item["layer"] for item in result["results"]] == ["persona", "global"]
+    assert calls == ["咖啡"]
+
+
 if __name__ == "__main__":
     test_agent_scope_switch_disables_persona_layer()
     test_add_default_prefers_long_term_layer()
@@ -762,6 +1051,11 @@ if __name__ == "__main__":
     test_scan_records_from_registered_scopes_uses_scoped_get_all()
     test_cleanup_expired_memories_does_not_call_unscoped_get_all()
     test_delete_memory_rejects_blank_memory_id()
+    test_add_memories_resolves_scope_once_and_reports_per_item_status()
+    test_add_memories_reuses_batched_embeddings_without_cache()
+    test_back_to_back_identical_adds_dedup_against_pending_writes()
+    test_reads_see_pending_adds_and_hide_pending_deletes()
+    test_search_memory_embeds_query_once_across_layers()
     test_memory_command_cleanup_dispatches_to_cleanup_expired_memories()
     test_register_scope_context_does_not_register_persona_read_fallback()
     test_mem_command_group_requires_super_user()